@@ -0,0 +1,145 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import APIRouter
+from starlette.responses import JSONResponse
+
+router = APIRouter(tags=["metrics"])
+
+ADMISSION_CONTROL_ENABLED = True
+# (concurrent requests, queued requests, seconds a request may wait in the queue) per route class.
+# auth + write stay well under the threadpool size (40) so reads keep getting threads when writes saturate.
+ADMISSION_LIMITS = {
+    "auth": (4, 16, 2.0),      # bcrypt-bound: register and login
+    "write": (8, 64, 5.0),     # everything else that writes; SQLite has a single writer anyway
+    "read": (32, 256, 10.0),
+}
+# Long-polls and static media mostly wait on I/O rather than threads, so they are not counted
+ADMISSION_EXEMPT_PREFIXES = ("/changes", "/media", "/metrics", "/docs", "/openapi.json")
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# POST endpoints that only read; they take a body because their id lists do not fit in a query string
+READ_ONLY_POSTS = ("/listings/batch",)
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path.startswith(ADMISSION_EXEMPT_PREFIXES) or path == "/":
+        return None
+    if method == "POST" and path in ("/auth/login", "/auth/register"):
+        return "auth"
+    if method in SAFE_METHODS or (method == "POST" and path in READ_ONLY_POSTS):
+        return "read"
+    return "write"
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO queue and a deadline for queued requests."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._queue = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_wait = 0.0
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._queue:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self._retry_after())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(future)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except BaseException as exc:
+            # Timed out, or the client went away while queued
+            if future.done():
+                # Handed a slot just as we gave up; pass it to the next in line
+                self.release()
+            else:
+                self._queue.remove(future)
+                future.cancel()
+            if not isinstance(exc, asyncio.TimeoutError):
+                raise
+            self.timed_out += 1
+            raise Overloaded(self._retry_after())
+        self.max_wait = max(self.max_wait, time.monotonic() - started)
+        self.admitted += 1
+
+    def release(self) -> None:
+        # The slot passes straight to the oldest waiter, so active only drops when the queue is empty
+        while self._queue:
+            future = self._queue.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queued": len(self._queue),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+def build_limiters(limits: Dict[str, tuple] = None) -> Dict[str, AdmissionLimiter]:
+    return {name: AdmissionLimiter(name, *values) for name, values in (limits or ADMISSION_LIMITS).items()}
+
+admission_limiters = build_limiters()
+
+class AdmissionControlMiddleware:
+    """Sheds load with 503 + Retry-After once a route class has its slots and queue full."""
+
+    def __init__(self, app, limiters: Dict[str, AdmissionLimiter] = None):
+        self.app = app
+        self.limiters = admission_limiters if limiters is None else limiters
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_CONTROL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        limiter = self.limiters.get(name) if name else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limiter.acquire()
+        except Overloaded as exc:
+            response = JSONResponse(
+                {"detail": "Server busy, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+@router.get("/metrics")
+def read_metrics():
+    return {"admission": {name: limiter.stats() for name, limiter in admission_limiters.items()}}
@@ -0,0 +1,62 @@
+"""report counters and user stats
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 13:31:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('listing_report_counts',
+    sa.Column('listing_id', sa.Integer(), nullable=False),
+    sa.Column('reason_code', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['listing_id'], ['listings.id'], ),
+    sa.PrimaryKeyConstraint('listing_id', 'reason_code')
+    )
+    op.create_table('listing_report_summaries',
+    sa.Column('listing_id', sa.Integer(), nullable=False),
+    sa.Column('report_count', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('last_reported_at', sa.DateTime(), nullable=True),
+    sa.Column('auto_hidden_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['listing_id'], ['listings.id'], ),
+    sa.PrimaryKeyConstraint('listing_id')
+    )
+    with op.batch_alter_table('listing_report_summaries', schema=None) as batch_op:
+        batch_op.create_index('ix_listing_report_summaries_score', ['score', 'listing_id'], unique=False)
+
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('member_since', sa.DateTime(), nullable=True),
+    sa.Column('items_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue_sek', sa.Integer(), nullable=False),
+    sa.Column('items_bought', sa.Integer(), nullable=False),
+    sa.Column('spent_sek', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_stats')
+    with op.batch_alter_table('listing_report_summaries', schema=None) as batch_op:
+        batch_op.drop_index('ix_listing_report_summaries_score')
+
+    op.drop_table('listing_report_summaries')
+    op.drop_table('listing_report_counts')
@@ -0,0 +1,62 @@
+"""foreign key indexes used by the routers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 13:32:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_categories_parent_id'), ['parent_id'], unique=False)
+
+    with op.batch_alter_table('listings', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_listings_category_id'), ['category_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_listings_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('listing_images', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_listing_images_listing_id'), ['listing_id'], unique=False)
+
+    with op.batch_alter_table('listing_reports', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_listing_reports_listing_id'), ['listing_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_listing_reports_reporter_id'), ['reporter_id'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_orders_buyer_id'), ['buyer_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_orders_listing_id'), ['listing_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_orders_seller_id'), ['seller_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_orders_seller_id'))
+        batch_op.drop_index(batch_op.f('ix_orders_listing_id'))
+        batch_op.drop_index(batch_op.f('ix_orders_buyer_id'))
+
+    with op.batch_alter_table('listing_reports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_listing_reports_reporter_id'))
+        batch_op.drop_index(batch_op.f('ix_listing_reports_listing_id'))
+
+    with op.batch_alter_table('listing_images', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_listing_images_listing_id'))
+
+    with op.batch_alter_table('listings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_listings_user_id'))
+        batch_op.drop_index(batch_op.f('ix_listings_category_id'))
+
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_categories_parent_id'))
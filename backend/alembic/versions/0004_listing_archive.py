@@ -0,0 +1,83 @@
+"""listing archive tables and live-inventory partial indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('listings_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(length=120), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('price_sek', sa.Integer(), nullable=False),
+    sa.Column('condition', sa.String(), nullable=True),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('city', sa.String(), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('slug', sa.String(), nullable=True),
+    sa.Column('canonical_url', sa.String(), nullable=True),
+    sa.Column('published_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('listings_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_listings_archive_user_id'), ['user_id'], unique=False)
+
+    op.create_table('listing_images_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('listing_id', sa.Integer(), nullable=True),
+    sa.Column('url_full', sa.String(), nullable=True),
+    sa.Column('url_card', sa.String(), nullable=True),
+    sa.Column('url_thumb', sa.String(), nullable=True),
+    sa.Column('blurhash', sa.String(), nullable=True),
+    sa.Column('sort_order', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['listing_id'], ['listings_archive.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('listing_images_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_listing_images_archive_listing_id'), ['listing_id'], unique=False)
+
+    # Recreate listings with AUTOINCREMENT so ids of archived listings are never handed out again
+    with op.batch_alter_table('listings', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.create_index('ix_listings_published', ['id'], unique=False, sqlite_where=sa.text("status = 'published'"))
+        batch_op.create_index('ix_listings_published_category_price', ['category_id', 'price_sek'], unique=False, sqlite_where=sa.text("status = 'published'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('listings', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        batch_op.drop_index('ix_listings_published_category_price', sqlite_where=sa.text("status = 'published'"))
+        batch_op.drop_index('ix_listings_published', sqlite_where=sa.text("status = 'published'"))
+
+    with op.batch_alter_table('listing_images_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_listing_images_archive_listing_id'))
+
+    op.drop_table('listing_images_archive')
+    with op.batch_alter_table('listings_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_listings_archive_user_id'))
+
+    op.drop_table('listings_archive')
@@ -0,0 +1,44 @@
+"""minhash signatures and lsh buckets
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 15:48:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('listing_signatures',
+    sa.Column('listing_id', sa.Integer(), nullable=False),
+    sa.Column('signature', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('listing_id')
+    )
+    op.create_table('listing_lsh_buckets',
+    sa.Column('band', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('listing_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('band', 'bucket', 'listing_id')
+    )
+    with op.batch_alter_table('listing_lsh_buckets', schema=None) as batch_op:
+        batch_op.create_index('ix_listing_lsh_buckets_listing_id', ['listing_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('listing_lsh_buckets', schema=None) as batch_op:
+        batch_op.drop_index('ix_listing_lsh_buckets_listing_id')
+
+    op.drop_table('listing_lsh_buckets')
+    op.drop_table('listing_signatures')
@@ -0,0 +1,83 @@
+"""saved searches, anchors and alerts
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('saved_searches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('keywords', sa.String(), nullable=True),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('min_price', sa.Integer(), nullable=True),
+    sa.Column('max_price', sa.Integer(), nullable=True),
+    sa.Column('city', sa.String(), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('radius_km', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('saved_searches', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_saved_searches_user_id'), ['user_id'], unique=False)
+
+    op.create_table('saved_search_anchors',
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.Column('search_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['search_id'], ['saved_searches.id'], ),
+    sa.PrimaryKeyConstraint('kind', 'value', 'search_id')
+    )
+    with op.batch_alter_table('saved_search_anchors', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_saved_search_anchors_search_id'), ['search_id'], unique=False)
+
+    op.create_table('saved_search_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('search_id', sa.Integer(), nullable=False),
+    sa.Column('listing_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('seen_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['search_id'], ['saved_searches.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('saved_search_alerts', schema=None) as batch_op:
+        batch_op.create_index('ix_saved_search_alerts_user_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index('ux_saved_search_alerts_search_listing', ['search_id', 'listing_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('saved_search_alerts', schema=None) as batch_op:
+        batch_op.drop_index('ux_saved_search_alerts_search_listing')
+        batch_op.drop_index('ix_saved_search_alerts_user_id')
+
+    op.drop_table('saved_search_alerts')
+    with op.batch_alter_table('saved_search_anchors', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_saved_search_anchors_search_id'))
+
+    op.drop_table('saved_search_anchors')
+    with op.batch_alter_table('saved_searches', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_saved_searches_user_id'))
+
+    op.drop_table('saved_searches')
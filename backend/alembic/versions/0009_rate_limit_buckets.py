@@ -0,0 +1,39 @@
+"""rate limit buckets
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 19:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.Column('allowed', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('rate_limit_buckets', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rate_limit_buckets_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('rate_limit_buckets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_rate_limit_buckets_updated_at'))
+
+    op.drop_table('rate_limit_buckets')
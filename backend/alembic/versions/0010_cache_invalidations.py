@@ -0,0 +1,40 @@
+"""cache invalidation bus
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 20:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cache_invalidations',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('namespace', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('created_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('seq'),
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('cache_invalidations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_cache_invalidations_created_at'), ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('cache_invalidations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cache_invalidations_created_at'))
+
+    op.drop_table('cache_invalidations')
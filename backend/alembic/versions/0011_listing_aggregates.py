@@ -0,0 +1,60 @@
+"""listing price aggregates
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# listing_stats.PRICE_BUCKETS as of this revision; frozen here so later edits do not change this backfill
+PRICE_BUCKETS = (0, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('listing_aggregates',
+    sa.Column('dimension', sa.String(), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('price_min', sa.Integer(), nullable=False),
+    sa.Column('price_max', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'value', 'bucket')
+    )
+    # Backfill from published listings, grouped as listing_stats.compute_listing_aggregates does
+    bucket = "CASE " + " ".join(
+        f"WHEN price_sek >= {bound} THEN {index}" for index, bound in reversed(list(enumerate(PRICE_BUCKETS)))
+    ) + " ELSE 0 END"
+    op.execute(f"""
+        INSERT INTO listing_aggregates (dimension, value, bucket, count, price_min, price_max)
+        SELECT dimension, value, bucket, count(*), min(price_sek), max(price_sek) FROM (
+            SELECT 'all' AS dimension, '' AS value, {bucket} AS bucket, price_sek
+            FROM listings WHERE status = 'published'
+            UNION ALL
+            SELECT 'category', CAST(category_id AS TEXT), {bucket}, price_sek
+            FROM listings WHERE status = 'published' AND category_id IS NOT NULL
+            UNION ALL
+            SELECT 'city', city, {bucket}, price_sek
+            FROM listings WHERE status = 'published' AND city IS NOT NULL AND city != ''
+            UNION ALL
+            SELECT 'condition', condition, {bucket}, price_sek
+            FROM listings WHERE status = 'published' AND condition IS NOT NULL AND condition != ''
+        )
+        GROUP BY dimension, value, bucket
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('listing_aggregates')
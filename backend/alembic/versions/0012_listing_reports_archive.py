@@ -0,0 +1,45 @@
+"""archived listing reports
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('listing_reports_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('listing_id', sa.Integer(), nullable=True),
+    sa.Column('reporter_id', sa.Integer(), nullable=True),
+    sa.Column('reason_code', sa.String(), nullable=True),
+    sa.Column('note', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['listing_id'], ['listings_archive.id'], ),
+    sa.ForeignKeyConstraint(['reporter_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('listing_reports_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_listing_reports_archive_listing_id'), ['listing_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_listing_reports_archive_reporter_id'), ['reporter_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('listing_reports_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_listing_reports_archive_reporter_id'))
+        batch_op.drop_index(batch_op.f('ix_listing_reports_archive_listing_id'))
+
+    op.drop_table('listing_reports_archive')
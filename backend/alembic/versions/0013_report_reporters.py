@@ -0,0 +1,64 @@
+"""one report per reporter and listing; auto-hide score from signed-in reporters
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# reports.REPORT_REASON_WEIGHTS as of this revision; frozen here so later edits do not change this backfill
+REPORT_REASON_WEIGHTS = {
+    "scam": 3, "prohibited": 3, "offensive": 2, "counterfeit": 2, "duplicate": 1, "wrong_category": 1, "other": 1,
+}
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, Sequence[str], None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep each reporter's first report of a listing; anonymous reports (NULL reporter) are all kept
+    op.execute("""
+        DELETE FROM listing_reports WHERE reporter_id IS NOT NULL AND id NOT IN (
+            SELECT min(id) FROM listing_reports WHERE reporter_id IS NOT NULL GROUP BY listing_id, reporter_id
+        )
+    """)
+    with op.batch_alter_table('listing_reports', schema=None) as batch_op:
+        batch_op.create_index('ux_listing_reports_listing_reporter', ['listing_id', 'reporter_id'], unique=True)
+    with op.batch_alter_table('listing_report_summaries', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hide_score', sa.Integer(), server_default='0', nullable=False))
+
+    # Recount the counters from the reports that are left
+    weight = "CASE reason_code " + " ".join(
+        f"WHEN '{code}' THEN {value}" for code, value in REPORT_REASON_WEIGHTS.items()
+    ) + " ELSE 0 END"
+    op.execute("DELETE FROM listing_report_counts")
+    op.execute("""
+        INSERT INTO listing_report_counts (listing_id, reason_code, count)
+        SELECT listing_id, reason_code, count(*) FROM listing_reports GROUP BY listing_id, reason_code
+    """)
+    op.execute(f"""
+        UPDATE listing_report_summaries SET
+            report_count = (SELECT count(*) FROM listing_reports r
+                            WHERE r.listing_id = listing_report_summaries.listing_id),
+            score = (SELECT coalesce(sum({weight}), 0) FROM listing_reports r
+                     WHERE r.listing_id = listing_report_summaries.listing_id),
+            hide_score = (SELECT coalesce(sum({weight}), 0) FROM listing_reports r
+                          WHERE r.listing_id = listing_report_summaries.listing_id AND r.reporter_id IS NOT NULL)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('listing_report_summaries', schema=None) as batch_op:
+        batch_op.drop_column('hide_score')
+    with op.batch_alter_table('listing_reports', schema=None) as batch_op:
+        batch_op.drop_index('ux_listing_reports_listing_reporter')
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import argparse
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from backend.models import (
+    Listing, ListingImage, ArchivedListing, ArchivedListingImage, ArchivedListingReport, ListingSignature,
+    ListingLshBucket, ListingReport, ListingReportCount, ListingReportSummary, ListingSimilar,
+)
+
+ARCHIVE_STATUSES = ("sold", "expired")
+# Recently sold listings stay hot so order pages and "sold" badges keep reading one table
+ARCHIVE_AFTER_DAYS = 14
+ARCHIVE_BATCH_SIZE = 500
+
+LISTING_COLUMNS = [column.name for column in Listing.__table__.columns]
+IMAGE_COLUMNS = [column.name for column in ListingImage.__table__.columns]
+REPORT_COLUMNS = [column.name for column in ListingReport.__table__.columns]
+
+def archive_listings(db: Session, batch_size: int = ARCHIVE_BATCH_SIZE, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                     max_batches: Optional[int] = None) -> int:
+    """Move sold/expired listings, their images and reports to the cold tables, one transaction per batch.
+
+    Orders keep their listing_id; Order.listed_item finds the listing in either table. Returns the number
+    of listings moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    last_activity = func.coalesce(Listing.updated_at, Listing.published_at, Listing.created_at)
+    listings, images, reports = Listing.__table__, ListingImage.__table__, ListingReport.__table__
+    moved = 0
+    batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        # Keyset pagination on the primary key keeps each batch from rescanning earlier rows
+        ids = db.execute(
+            select(Listing.id)
+            .where(Listing.id > last_id, Listing.status.in_(ARCHIVE_STATUSES), last_activity < cutoff)
+            .order_by(Listing.id)
+            .limit(batch_size)
+        ).scalars().all()
+        # A sharded session returns each shard's batch in turn; the lowest ids are the global batch.
+        # The INSERT ... SELECTs below then run on every shard, each moving its own rows.
+        ids = sorted(ids)[:batch_size]
+        if not ids:
+            break
+        db.execute(insert(ArchivedListing).from_select(
+            LISTING_COLUMNS, select(*[listings.c[name] for name in LISTING_COLUMNS]).where(listings.c.id.in_(ids))
+        ))
+        db.execute(insert(ArchivedListingImage).from_select(
+            IMAGE_COLUMNS, select(*[images.c[name] for name in IMAGE_COLUMNS]).where(images.c.listing_id.in_(ids))
+        ))
+        # Reports are moderation evidence against the seller, so they move with the listing
+        db.execute(insert(ArchivedListingReport).from_select(
+            REPORT_COLUMNS, select(*[reports.c[name] for name in REPORT_COLUMNS]).where(reports.c.listing_id.in_(ids))
+        ))
+        db.execute(delete(ListingImage).where(ListingImage.listing_id.in_(ids)), execution_options={"synchronize_session": False})
+        db.execute(delete(ListingReport).where(ListingReport.listing_id.in_(ids)), execution_options={"synchronize_session": False})
+        # Sold listings are never duplicate candidates, so their signatures go rather than move
+        db.execute(delete(ListingLshBucket).where(ListingLshBucket.listing_id.in_(ids)))
+        db.execute(delete(ListingSignature).where(ListingSignature.listing_id.in_(ids)))
+        # Likewise the report counters, which the archived reports can rebuild, and similar-listing rows
+        # in either direction
+        db.execute(delete(ListingReportCount).where(ListingReportCount.listing_id.in_(ids)))
+        db.execute(delete(ListingReportSummary).where(ListingReportSummary.listing_id.in_(ids)))
+        db.execute(delete(ListingSimilar).where(or_(ListingSimilar.listing_id.in_(ids), ListingSimilar.neighbor_id.in_(ids))))
+        db.execute(delete(Listing).where(Listing.id.in_(ids)), execution_options={"synchronize_session": False})
+        db.commit()
+        moved += len(ids)
+        last_id = ids[-1]
+        batches += 1
+    return moved
+
+def main():
+    from backend.database import open_session
+
+    parser = argparse.ArgumentParser(description="Move sold and expired listings to the archive tables.")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    db = open_session()
+    try:
+        moved = archive_listings(db, args.batch_size, args.older_than_days, args.max_batches)
+    finally:
+        db.close()
+    print(f"Archived {moved} listing(s).")
+
+if __name__ == "__main__":
+    main()
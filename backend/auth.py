@@ -1,15 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
 from backend.models import User, Base
 from backend.database import get_db
+from backend.user_stats import init_user_stats
+from backend.write_coalescer import write_unit
+from backend.rate_limit import check_login_rate
 from datetime import datetime, timedelta
+from functools import lru_cache
 import secrets
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib and its bcrypt handler are imported by the first password check, not at startup
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def __getattr__(name):
+    if name == "pwd_context":
+        return get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # In-memory store for email verification tokens (replace with persistent store in production)
 verification_tokens = {}
@@ -39,11 +51,16 @@ class ForgotPasswordRequest(BaseModel):
 def register(data: RegisterRequest, db: Session = Depends(get_db)):
     if db.query(User).filter(User.email == data.email).first():
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_pw = pwd_context.hash(data.password)
+    hashed_pw = get_pwd_context().hash(data.password)
     user = User(email=data.email, password_hash=hashed_pw, name=data.name, city=data.city)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+
+    def insert_user(session: Session) -> int:
+        session.add(user)
+        session.flush()
+        init_user_stats(session, user)
+        return user.id
+
+    write_unit(db, insert_user)
     # Generate and store verification token
     token = secrets.token_urlsafe(32)
     verification_tokens[data.email] = token
@@ -51,9 +68,15 @@ def register(data: RegisterRequest, db: Session = Depends(get_db)):
     return {"msg": "User registered. Please verify your email.", "verification_token": token}
 
 @router.post("/login", response_model=TokenResponse)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
+def login(data: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    # Throttled before any query or bcrypt work
+    check_login_rate(request.client.host if request.client else "unknown", data.email, db)
     user = db.query(User).filter(User.email == data.email).first()
-    if not user or not pwd_context.verify(data.password, user.password_hash):
+    if not user:
+        # Same bcrypt cost as a real check, so unknown emails are not answered faster
+        get_pwd_context().dummy_verify()
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not get_pwd_context().verify(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if not user.email_verified:
         raise HTTPException(status_code=403, detail="Email not verified")
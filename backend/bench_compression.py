@@ -0,0 +1,79 @@
+"""Compare response size and compression CPU across gzip levels and brotli qualities, and cached bodies.
+
+Usage: python -m backend.bench_compression --repeat 200
+"""
+import argparse
+import gzip
+import random
+import time
+
+from fastapi.responses import JSONResponse
+
+from backend import compression
+from backend.listing_cache import ListingCache
+
+WORDS = ("soffa", "bord", "stol", "cykel", "barnvagn", "lampa", "fint", "skick", "hämtas", "i", "Malmö", "Lund",
+         "nästan", "ny", "oanvänd", "med", "kvitto", "säljes", "pga", "flytt", "repor", "grått", "tyg", "ek")
+
+def listing_payload(listing_id: int, rng: random.Random) -> dict:
+    # Shaped like listings._listing_payload: a long free-text description and three image URL sets
+    return {
+        "id": listing_id, "user_id": rng.randint(1, 5000), "title": " ".join(rng.choices(WORDS, k=4)).capitalize(),
+        "description": " ".join(rng.choices(WORDS, k=rng.randint(40, 400))), "price_sek": rng.randint(50, 20000),
+        "condition": rng.choice(["new", "good", "fair"]), "category_id": rng.randint(1, 40),
+        "city": rng.choice(["Malmö", "Lund", "Göteborg"]), "latitude": 55.6 + rng.random(), "longitude": 13 + rng.random(),
+        "status": "published", "slug": f"listing-{listing_id}", "canonical_url": None,
+        "published_at": None, "created_at": "2026-10-19T12:00:00", "updated_at": None,
+        "images": [
+            {"url_full": f"/media/{listing_id}/{n}.jpg", "url_card": f"/media/{listing_id}/{n}.card.jpg",
+             "url_thumb": f"/media/{listing_id}/{n}.thumb.jpg", "blurhash": "LEHV6nWB2yk8pyo0adR*.7kCMdnj"}
+            for n in range(3)
+        ],
+    }
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(45)
+    bodies = {
+        "one listing": JSONResponse(listing_payload(1, rng)).body,
+        "page of 20": JSONResponse([listing_payload(i, rng) for i in range(20)]).body,
+        "page of 100": JSONResponse([listing_payload(i, rng) for i in range(100)]).body,
+    }
+    settings = [("gzip", level) for level in (1, 4, 6, 9)]
+    if compression.brotli is not None:
+        settings += [("br", quality) for quality in (1, 4, 6, 11)]
+    else:
+        print("brotli is not installed; gzip only")
+
+    for name, body in bodies.items():
+        print(f"{name}: {len(body) / 1024:.1f} KiB")
+        for encoding, level in settings:
+            if encoding == "br":
+                compress = lambda: compression.brotli.compress(body, quality=level)
+            else:
+                compress = lambda: gzip.compress(body, compresslevel=level, mtime=0)
+            size = len(compress())
+            micros = timed(compress, args.repeat)
+            print(f"  {encoding} {level:>2}: {size / 1024:6.1f} KiB ({size / len(body):5.1%})  {micros:8.0f} us  "
+                  f"{len(body) / micros:6.1f} MB/s")
+
+    # A hot GET /listings/{id}: compress per request, as the middleware would, against the cached gzip body
+    cache = ListingCache()
+    payload = listing_payload(1, rng)
+    cache.put(1, payload)
+    cache.get_body(1, "gzip")
+    per_request = timed(lambda: compression.encode_body(JSONResponse(payload).body, "gzip"), args.repeat)
+    cached = timed(lambda: cache.get_body(1, "gzip"), args.repeat)
+    print(f"hot listing at gzip {compression.GZIP_LEVEL}: render and compress {per_request:.0f} us, cached body {cached:.1f} us")
+
+if __name__ == "__main__":
+    main()
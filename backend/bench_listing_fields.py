@@ -0,0 +1,81 @@
+"""Compare payload size and latency of GET /listings/ in full, card and ?fields= modes.
+
+Usage: python -m backend.bench_listing_fields --rows 100000 --limit 40
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.main import app
+from backend.models import Base, User, Listing, ListingImage
+from backend.database import get_db
+from backend.bench_listing_index import timed
+
+MODES = {
+    "full": "",
+    "card": "&view=card",
+    "fields": "&fields=title,price_sek,city",
+}
+
+def seed(db, rows: int, images_per_listing: int, seed_value: int = 37) -> None:
+    rng = random.Random(seed_value)
+    db.add(User(email="bench@example.com", password_hash="x", name="Bench"))
+    db.commit()
+    listings, images = [], []
+    for i in range(1, rows + 1):
+        listings.append({
+            "id": i,
+            "user_id": 1,
+            "title": f"Listing {i}",
+            # Descriptions run up to the 4000 character limit
+            "description": "lorem ipsum " * rng.randint(20, 333),
+            "price_sek": rng.randint(10, 20000),
+            "condition": "good",
+            "city": rng.choice(["Stockholm", "Göteborg", "Malmö", "Uppsala"]),
+            "status": "published",
+        })
+        images.extend({
+            "listing_id": i, "url_full": f"/media/{i}-{n}.jpg", "url_card": f"/media/{i}-{n}.card.jpg",
+            "url_thumb": f"/media/{i}-{n}.thumb.jpg", "blurhash": "LEHV6nWB2yk8pyo0adR*.7kCMdnj", "sort_order": n,
+        } for n in range(images_per_listing))
+        if len(listings) == 20_000:
+            db.execute(insert(Listing), listings)
+            db.execute(insert(ListingImage), images)
+            listings, images = [], []
+    if listings:
+        db.execute(insert(Listing), listings)
+        db.execute(insert(ListingImage), images)
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=40)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.rows, args.images)
+
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+    print(f"{'mode':<8}{'bytes':>10}{'p50':>10}{'p95':>10}")
+    for name, params in MODES.items():
+        # Pages deep enough to miss SQLite's page cache warm-up on the first request
+        url = f"/listings/?skip=1000&limit={args.limit}{params}"
+        size = len(client.get(url).content)
+        p50, p95 = timed(lambda: client.get(url), args.repeat)
+        print(f"{name:<8}{size:>10}{p50:>8.2f}ms{p95:>8.2f}ms")
+    app.dependency_overrides = {}
+
+if __name__ == "__main__":
+    main()
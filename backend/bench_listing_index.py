@@ -0,0 +1,94 @@
+"""Compare GET /listings/ filtering on the SQL path against the NumPy column index.
+
+Usage: python -m backend.bench_listing_index --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.models import Base, User, Category, Listing
+from backend.listings import ListingFilters, _browse_query
+from backend.listing_index import ListingColumnIndex
+
+CONDITIONS = ["new", "like_new", "good", "used"]
+STATUSES = ["published"] * 8 + ["sold", "draft"]
+
+QUERIES = {
+    "newest": dict(),
+    "category+price": dict(category_id=3, min_price=500, max_price=2000, sort="price_asc"),
+    "condition": dict(condition="good", sort="price_desc"),
+    "radius": dict(lat=59.33, lon=18.07, radius_km=10),
+    "nearest": dict(lat=57.71, lon=11.97, sort="distance", category_id=5),
+}
+
+def seed(db, rows: int, seed_value: int = 31) -> None:
+    rng = random.Random(seed_value)
+    db.add(User(email="bench@example.com", password_hash="x", name="Bench"))
+    db.add_all([Category(name=f"Category {i}", slug=f"category-{i}", sort_order=i) for i in range(1, 21)])
+    db.commit()
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "user_id": 1,
+            "title": f"Listing {i}",
+            "description": "",
+            "price_sek": rng.randint(10, 20000),
+            "condition": rng.choice(CONDITIONS),
+            "category_id": rng.randint(1, 20),
+            "latitude": rng.uniform(55.3, 65.0),
+            "longitude": rng.uniform(11.0, 23.0),
+            "status": rng.choice(STATUSES),
+        })
+        if len(batch) == 50_000:
+            db.execute(insert(Listing), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Listing), batch)
+    db.commit()
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    start = time.perf_counter()
+    seed(db, args.rows)
+    print(f"seeded {args.rows} listings in {time.perf_counter() - start:.1f}s")
+    index = ListingColumnIndex()
+    start = time.perf_counter()
+    index.load(db)
+    print(f"loaded {len(index)} published listings into the index in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'query':<16}{'sql p50':>10}{'sql p95':>10}{'index p50':>11}{'index p95':>11}")
+    for name, params in QUERIES.items():
+        filters = ListingFilters(**params)
+        sql_ids = [row.id for row in _browse_query(db, filters).limit(args.limit)]
+        assert index.search(**params, limit=args.limit) == sql_ids, name
+        sql = timed(lambda: _browse_query(db, filters).with_entities(Listing.id).limit(args.limit).all(), args.repeat)
+        indexed = timed(lambda: index.search(**params, limit=args.limit), args.repeat)
+        print(f"{name:<16}{sql[0]:>9.2f}ms{sql[1]:>8.2f}ms{indexed[0]:>9.2f}ms{indexed[1]:>9.2f}ms")
+
+if __name__ == "__main__":
+    main()
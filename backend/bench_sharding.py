@@ -0,0 +1,56 @@
+"""Compare listing write throughput as the same writers spread over one, two and four region shards.
+
+Usage: python -m backend.bench_sharding --threads 16 --writes 4000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from backend.bench_write_coalescer import run_threads
+from backend.models import Base, Listing
+from backend.sharding import ShardRouter, SHARD_REGIONS
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=4000)
+    # Time each write holds its shard's lock before committing, standing in for fsync on slower disks.
+    # At 0 a single process is CPU-bound and the shard count barely shows.
+    parser.add_argument("--hold-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # A city per region; the listing's city alone picks its shard
+    cities = [cities[0] for cities in SHARD_REGIONS.values()]
+    baseline = None
+    for shards in (1, 2, 4):
+        directory = Path(tempfile.mkdtemp())
+        main_engine = create_engine(f"sqlite:///{directory / 'main.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=main_engine)
+        router = ShardRouter(main_engine, directory)
+
+        timeouts = []
+
+        def write(i):
+            with router.session() as db:
+                db.add(Listing(user_id=1, title=f"Listing {i}", description="d", price_sek=i,
+                               city=cities[i % shards], status="published"))
+                try:
+                    db.flush()
+                    if args.hold_ms:
+                        time.sleep(args.hold_ms / 1000)
+                    db.commit()
+                except OperationalError:
+                    # "database is locked": the writer waited out SQLite's busy timeout
+                    timeouts.append(i)
+
+        rate = run_threads(args.threads, args.writes, write)
+        rate *= 1 - len(timeouts) / args.writes
+        baseline = baseline or rate
+        print(f"{shards} shard(s): {rate:8.0f} writes/s  ({rate / baseline:.1f}x)  {len(timeouts)} lock timeouts")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure worker startup: importing the app, then its startup handlers and first request, in fresh interpreters.
+
+Usage: python -m backend.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATABASE = Path(__file__).resolve().parent / "marketplace.db"
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+# Budgets the startup test enforces on the best of a few runs; loose enough for slow CI machines,
+# while the DEFERRED_MODULES check catches a heavy import creeping back in exactly
+IMPORT_BUDGET_MS = 2000
+FIRST_REQUEST_BUDGET_MS = 1000
+# Imported on first use, never at startup; these submodules only exist once the package really ran
+DEFERRED_MODULES = ("numpy.linalg", "scipy.sparse._base", "passlib.context")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from backend.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client_ready = time.perf_counter()
+with TestClient(app) as client:
+    client.get("/")
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (served - client_ready) * 1000,
+    "deferred_loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (DEFERRED_MODULES,)
+
+def _migrate(database: Path) -> None:
+    # The checked-in database predates the migrations; bring the copy to head the way the README does
+    engine = create_engine(f"sqlite:///{database}")
+    try:
+        with engine.begin() as connection:
+            config = Config(str(ALEMBIC_INI))
+            config.attributes["connection"] = connection
+            command.stamp(config, "0001")
+            command.upgrade(config, "head")
+    finally:
+        engine.dispose()
+
+def measure_startup() -> dict:
+    """Start the app once in a new interpreter, on a migrated copy of the checked-in database, and return its timings."""
+    with tempfile.TemporaryDirectory() as directory:
+        database = Path(directory) / "marketplace.db"
+        shutil.copyfile(DATABASE, database)
+        _migrate(database)
+        env = {**os.environ, "MARKETPLACE_DATABASE_URL": f"sqlite:///{database}"}
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure_startup() for _ in range(args.runs)]
+    for key in ("import_ms", "first_request_ms"):
+        samples = sorted(run[key] for run in runs)
+        print(f"{key}: min {samples[0]:.0f}  median {statistics.median(samples):.0f}  max {samples[-1]:.0f}")
+    loaded = sorted({name for run in runs for name in run["deferred_loaded"]})
+    print(f"deferred modules loaded at startup: {', '.join(loaded) or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Measure /listings/suggest lookup latency on a synthetic title corpus.
+
+Usage: python -m backend.bench_suggest --titles 1000000
+"""
+import argparse
+import random
+import string
+import time
+
+from backend.suggest import TitlePrefixIndex
+
+def synthetic_titles(count: int, vocabulary: int, seed_value: int = 32):
+    rng = random.Random(seed_value)
+    words = ["".join(rng.choices(string.ascii_lowercase + "åäö", k=rng.randint(3, 10))) for _ in range(vocabulary)]
+    for _ in range(count):
+        # Half the words come from a heavy head ("iphone", "soffa"), the rest from a long tail
+        yield " ".join(
+            words[min(int(rng.paretovariate(1.1)) - 1, vocabulary - 1)] if rng.random() < 0.5 else rng.choice(words)
+            for _ in range(rng.randint(2, 6))
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    index = TitlePrefixIndex()
+    start = time.perf_counter()
+    index.load_titles(synthetic_titles(args.titles, args.vocabulary))
+    print(f"indexed {len(index)} terms from {args.titles} titles in {time.perf_counter() - start:.1f}s, "
+          f"~{index.memory_bytes / 2**20:.1f} MiB, {index.evicted} evicted")
+
+    rng = random.Random(7)
+    terms = index._terms
+    prefixes = []
+    for _ in range(args.lookups):
+        term = rng.choice(terms)
+        prefixes.append(term[:rng.randint(1, len(term))])
+
+    samples = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix, 10)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    print(f"lookups: p50 {pick(0.5):.3f}ms  p99 {pick(0.99):.3f}ms  max {samples[-1]:.3f}ms")
+
+    new_titles = list(synthetic_titles(1000, args.vocabulary, seed_value=99))
+    start = time.perf_counter()
+    for title in new_titles:
+        index.update(None, title)
+    print(f"incremental update: {time.perf_counter() - start:.3f}ms per listing (1000 listings)")
+
+if __name__ == "__main__":
+    main()
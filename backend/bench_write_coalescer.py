@@ -0,0 +1,72 @@
+"""Compare write throughput of a commit per request against the group-commit coalescer.
+
+Usage: python -m backend.bench_write_coalescer --threads 32 --writes 4000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.models import Base, Listing
+from backend.write_coalescer import WriteCoalescer
+
+def _listing(i: int) -> Listing:
+    return Listing(user_id=1, title=f"Listing {i}", description="d", price_sek=i, status="published")
+
+def _insert(i: int):
+    def unit(session):
+        session.add(_listing(i))
+        session.flush()
+    return unit
+
+def run_threads(threads: int, writes: int, write) -> float:
+    per_thread = writes // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for i in range(per_thread):
+            write(offset + i)
+
+    pool = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=4000)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    for name in ("per-request", "coalesced"):
+        engine = create_engine(f"sqlite:///{os.path.join(directory, name)}.db",
+                               connect_args={"check_same_thread": False, "timeout": 60})
+        Base.metadata.create_all(bind=engine)
+        if name == "per-request":
+            def write(i):
+                with Session(bind=engine) as db:
+                    db.add(_listing(i))
+                    db.commit()
+            rate = run_threads(args.threads, args.writes, write)
+            print(f"{name:<12}{rate:>10.0f} writes/s")
+        else:
+            coalescer = WriteCoalescer(engine, max_batch=args.max_batch, max_delay=args.max_delay_ms / 1000)
+            rate = run_threads(args.threads, args.writes, lambda i: coalescer.run(_insert(i)))
+            coalescer.close()
+            print(f"{name:<12}{rate:>10.0f} writes/s  ({coalescer.units / coalescer.batches:.1f} writes per commit)")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
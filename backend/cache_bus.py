@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from backend.models import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+# Off for single-process deployments, where write paths already invalidate their own caches
+CACHE_BUS_ENABLED = False
+# Each worker reads new invalidations this often; an empty poll is one primary key probe
+CACHE_BUS_POLL_INTERVAL = 0.02
+CACHE_BUS_BATCH_SIZE = 1000
+# Workers that fall further behind than this resync by flushing whole namespaces
+CACHE_BUS_RETENTION_SECONDS = 300.0
+CACHE_BUS_PRUNE_INTERVAL = 60.0
+
+class CacheBus:
+    """Invalidation messages between worker processes over an SQLite table.
+
+    publish() adds a message in the writer's transaction, so it is only seen once the write commits.
+    Every worker polls for messages after its cursor and calls the namespace's subscribers with the
+    key, or with None when messages were pruned before this worker read them. Caches keep their TTL
+    as the fallback for anything the bus cannot deliver, such as a worker whose poller is stuck.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._cursor = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.delivered = 0
+        self.resyncs = 0
+
+    def subscribe(self, namespace: str, callback: Callable[[Optional[str]], None]) -> None:
+        self._subscribers[namespace].append(callback)
+
+    def publish(self, db: Session, namespace: str, key=None) -> None:
+        if CACHE_BUS_ENABLED:
+            db.add(CacheInvalidation(namespace=namespace, key=None if key is None else str(key), created_at=time.time()))
+
+    def poll(self, db: Session) -> int:
+        """Deliver invalidations committed since the last poll; returns how many were delivered."""
+        with self._lock:
+            if self._cursor is None:
+                # Caches start empty, so earlier messages are irrelevant to this worker
+                self._cursor = db.query(func.max(CacheInvalidation.seq)).scalar() or 0
+                return 0
+            rows = (
+                db.query(CacheInvalidation.seq, CacheInvalidation.namespace, CacheInvalidation.key)
+                .filter(CacheInvalidation.seq > self._cursor)
+                .order_by(CacheInvalidation.seq)
+                .limit(CACHE_BUS_BATCH_SIZE)
+                .all()
+            )
+            if not rows:
+                return 0
+            if rows[0].seq > self._cursor + 1:
+                # Sequence numbers are never reused, so a gap means messages were pruned unread
+                self.resyncs += 1
+                for callbacks in self._subscribers.values():
+                    for callback in callbacks:
+                        callback(None)
+            for row in rows:
+                for callback in self._subscribers.get(row.namespace, ()):
+                    callback(row.key)
+            self._cursor = rows[-1].seq
+            self.delivered += len(rows)
+            return len(rows)
+
+    def prune(self, db: Session, older_than: float = CACHE_BUS_RETENTION_SECONDS) -> int:
+        deleted = db.execute(
+            delete(CacheInvalidation).where(CacheInvalidation.created_at < time.time() - older_than)
+        ).rowcount
+        db.commit()
+        return deleted
+
+    def start(self, bind) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(bind,), name="cache-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, bind) -> None:
+        next_prune = time.monotonic() + CACHE_BUS_PRUNE_INTERVAL
+        while not self._stop.is_set():
+            try:
+                with Session(bind=bind) as db:
+                    # Keep draining while a backlog is coming in full batches
+                    while self.poll(db) == CACHE_BUS_BATCH_SIZE:
+                        pass
+                    if time.monotonic() >= next_prune:
+                        next_prune = time.monotonic() + CACHE_BUS_PRUNE_INTERVAL
+                        self.prune(db)
+            except Exception as exc:
+                # A locked or briefly unavailable database only delays delivery; the cursor is kept
+                logger.warning("Cache bus poll failed: %s", exc)
+            self._stop.wait(CACHE_BUS_POLL_INTERVAL)
+
+cache_bus = CacheBus()
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from backend.models import ListingChange
+from backend.database import get_db
+from backend.cache_bus import cache_bus
+
+router = APIRouter(tags=["changes"])
+
+CHANGES_PAGE_SIZE = 100
+MAX_CHANGES_PAGE_SIZE = 1000
+# Upper bound for ?wait=; long polls are answered empty after this many seconds
+MAX_WAIT_SECONDS = 30.0
+# Writes from other processes do not wake this one, so waiting requests re-check this often
+CHANGES_POLL_INTERVAL = 1.0
+CHANGE_RETENTION_DAYS = 30
+
+class ChangeOut(BaseModel):
+    seq: int
+    listing_id: int
+    op: str
+    status: Optional[str]
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ChangesPage(BaseModel):
+    changes: List[ChangeOut]
+    # Pass as ?since= on the next request
+    next_since: int
+    # True when changes after ?since= were already pruned; the consumer has to resync in full
+    truncated: bool = False
+
+def record_change(db: Session, listing_id: int, op: str, status: Optional[str]) -> None:
+    """Append a change in the caller's transaction; call change_notifier.notify() after the commit."""
+    db.add(ListingChange(listing_id=listing_id, op=op, status=status))
+    # Other workers drop their cached copy once this commits
+    cache_bus.publish(db, "listings", listing_id)
+
+class ChangeNotifier:
+    """Wakes long-polling requests in this process when a change is committed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = []
+        self.version = 0
+
+    def notify(self) -> None:
+        # Called from the threadpool after commits, so waiters are woken on their own loop
+        with self._lock:
+            self.version += 1
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    async def wait(self, version: int, timeout: float) -> None:
+        """Return once notify() has been called since version was read, or after timeout."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self.version != version:
+                return
+            self._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+
+def _resolve(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+change_notifier = ChangeNotifier()
+
+def changes_since(db: Session, since: int, limit: int) -> ChangesPage:
+    rows = (
+        db.query(ListingChange)
+        .filter(ListingChange.seq > since)
+        .order_by(ListingChange.seq)
+        .limit(limit)
+        .all()
+    )
+    truncated = False
+    if rows and rows[0].seq > since + 1 and since > 0:
+        # Sequence numbers are never reused, so a gap right after the cursor means it was pruned
+        oldest = db.query(func.min(ListingChange.seq)).scalar()
+        truncated = oldest == rows[0].seq
+    changes = [ChangeOut.model_validate(row) for row in rows]
+    return ChangesPage(changes=changes, next_since=changes[-1].seq if changes else since, truncated=truncated)
+
+def _poll_changes(db: Session, since: int, limit: int) -> ChangesPage:
+    try:
+        return changes_since(db, since, limit)
+    finally:
+        # Ends the read transaction, so the pooled connection goes back before the request waits
+        db.rollback()
+
+@router.get("/changes", response_model=ChangesPage)
+async def read_changes(since: int = Query(0, ge=0), limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=MAX_CHANGES_PAGE_SIZE),
+                       wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS), db: Session = Depends(get_db)):
+    deadline = time.monotonic() + wait
+    while True:
+        version = change_notifier.version
+        page = await run_in_threadpool(_poll_changes, db, since, limit)
+        remaining = deadline - time.monotonic()
+        if page.changes or remaining <= 0:
+            return page
+        await change_notifier.wait(version, min(remaining, CHANGES_POLL_INTERVAL))
+
+def prune_changes(db: Session, older_than_days: int = CHANGE_RETENTION_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    # created_at grows with seq, so walking the primary key stops at the first change to keep
+    first_kept = (
+        db.query(ListingChange.seq)
+        .filter(ListingChange.created_at >= cutoff)
+        .order_by(ListingChange.seq)
+        .limit(1)
+        .scalar()
+    )
+    stmt = delete(ListingChange)
+    if first_kept is not None:
+        stmt = stmt.where(ListingChange.seq < first_kept)
+    deleted = db.execute(stmt).rowcount
+    db.commit()
+    return deleted
+
+def main():
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Delete listing changes older than the retention period.")
+    parser.add_argument("--older-than-days", type=int, default=CHANGE_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        deleted = prune_changes(db, args.older_than_days)
+    finally:
+        db.close()
+    print(f"Pruned {deleted} change(s).")
+
+if __name__ == "__main__":
+    main()
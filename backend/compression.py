@@ -0,0 +1,160 @@
+import gzip
+import zlib
+from typing import Optional, Tuple
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from backend.lazy_imports import lazy_import
+
+# Optional; without it only gzip is offered
+brotli = lazy_import("brotli")
+
+COMPRESSION_ENABLED = True
+# Smaller bodies go out as they are; a few hundred bytes saved do not pay for the CPU and the header
+COMPRESSION_MIN_SIZE = 1024
+# zlib level (1-9) and brotli quality (0-11); python -m backend.bench_compression shows the trade-off.
+# On listing pages gzip 6 costs three times the CPU of 4 for about 10% fewer bytes.
+GZIP_LEVEL = 4
+BROTLI_QUALITY = 4
+# Larger bodies are compressed in a worker thread rather than on the event loop
+COMPRESSION_THREAD_MIN_SIZE = 128 * 1024
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best of br (when brotli is installed) and gzip by the client's q-values; None for identity."""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    offered = ("br", "gzip") if brotli is not None else ("gzip",)
+    # On equal weights the first offered wins
+    best = max(offered, key=lambda encoding: weights.get(encoding, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (media_type.startswith("text/") and media_type != "text/event-stream") or media_type in COMPRESSIBLE_TYPES
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def encode_body(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """The body as sent to a client that negotiated encoding, and the Content-Encoding it went out with."""
+    if encoding is None or len(body) < COMPRESSION_MIN_SIZE:
+        return body, None
+    return compress(body, encoding), encoding
+
+def encoded_response(body: bytes, encoding: Optional[str], media_type: str = "application/json") -> Response:
+    """A response for a body from encode_body; CompressionMiddleware passes it through untouched."""
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=media_type, headers=headers)
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes, more_body: bool) -> bytes:
+        # Each chunk is flushed, so a streamed response reaches the client as it is produced
+        if self._brotli is not None:
+            data = self._brotli.process(chunk)
+            return data + (self._brotli.flush() if more_body else self._brotli.finish())
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+class CompressionMiddleware:
+    """Compresses text and JSON responses for clients that accept br or gzip.
+
+    Bodies under COMPRESSION_MIN_SIZE, other media types, partial content, responses sent through ASGI
+    extensions such as zero-copy, and responses that already have a Content-Encoding, such as
+    precompressed cache hits, go out unchanged.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+        passthrough = False
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, passthrough, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if ("content-encoding" in headers or message["status"] == 206
+                        or not is_compressible(headers.get("content-type", ""))):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk decides the headers
+                    start = message
+                return
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                # Zero-copy, pathsend and other extensions carry no body to re-encode; the held headers go out as they are
+                passthrough = True
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < COMPRESSION_MIN_SIZE:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                # The encoded bytes are a different representation: byte ranges no longer apply and
+                # the upstream ETag only stays valid as a weak one
+                del headers["Accept-Ranges"]
+                etag = headers.get("ETag")
+                if etag is not None and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if more_body:
+                    del headers["Content-Length"]
+                    compressor = _StreamCompressor(encoding)
+                    body = compressor.compress(body, more_body)
+                else:
+                    if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                        body = await anyio.to_thread.run_sync(compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+                await send({**message, "body": body})
+                return
+            await send({**message, "body": compressor.compress(body, more_body)})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,10 @@
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# TestClient startups create tables in the app's database; keep them off the checked-in backend/marketplace.db
+_directory = tempfile.mkdtemp(prefix="marketplace-tests-")
+atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+os.environ.setdefault("MARKETPLACE_DATABASE_URL", f"sqlite:///{Path(_directory) / 'app.db'}")
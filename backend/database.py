@@ -1,17 +1,65 @@
+import os
+from pathlib import Path
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///backend/marketplace.db"
+# Anchored to this directory like alembic.ini's url, so the app finds it from the repo root and from backend/.
+# MARKETPLACE_DATABASE_URL points it elsewhere; the tests and bench_startup use that to keep off this file.
+SQLALCHEMY_DATABASE_URL = os.environ.get(
+    "MARKETPLACE_DATABASE_URL", f"sqlite:///{Path(__file__).resolve().parent / 'marketplace.db'}"
+)
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def open_session():
+    """A session on the main database, or with sharding on one that routes listing storage to its region's shard."""
+    # Imported here: backend.sharding builds its routing on top of this module
+    from backend import sharding
+    if sharding.SHARDING_ENABLED:
+        return sharding.get_router().session()
+    return SessionLocal()
+
 def get_db():
-    db = SessionLocal()
+    db = open_session()
     try:
         yield db
     finally:
         db.close()
+
+def ensure_schema(bind, metadata, revision: str) -> bool:
+    """Create the schema on an empty database; otherwise check alembic has it at this revision.
+
+    A migrated database costs two catalog reads instead of create_all's per-table reflection on every
+    worker start. An empty database gets create_all and is stamped at the revision, as alembic's cookbook
+    does. Any other database is refused: one alembic has at another revision needs `upgrade head`, and one
+    that predates the migrations needs `stamp 0001` first. Tables created here would make those
+    migrations fail, and stamping it would skip their backfills. Returns whether DDL ran.
+    """
+    with bind.connect() as connection:
+        tables = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars())
+        if "alembic_version" in tables:
+            current = connection.exec_driver_sql("SELECT version_num FROM alembic_version").scalar()
+            if current == revision:
+                return False
+            raise RuntimeError(
+                f"Database is at alembic revision {current}, the code needs {revision}: "
+                "run alembic -c backend/alembic.ini upgrade head"
+            )
+    if tables - {"sqlite_sequence"}:
+        raise RuntimeError(
+            "Database predates the migrations: run alembic -c backend/alembic.ini stamp 0001, "
+            "then alembic -c backend/alembic.ini upgrade head"
+        )
+    metadata.create_all(bind=bind)
+    with bind.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL, "
+            "CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num))"
+        )
+        connection.exec_driver_sql("INSERT INTO alembic_version (version_num) VALUES (?)", (revision,))
+    return True
@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import random
+import struct
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, or_, select
+from sqlalchemy.orm import Session
+
+from backend.lazy_imports import lazy_import
+from backend.sharding import insert_rows
+from backend.models import Listing, ListingSignature, ListingLshBucket
+from backend.reports import record_report
+from backend.suggest import TERM_RE
+
+# Signatures are computed in pure Python without numpy, with identical results
+np = lazy_import("numpy")
+
+# What create_listing does with a near-duplicate: "reject" (409), "flag" (file a report) or "allow"
+DUPLICATE_ACTION = "flag"
+# Estimated Jaccard similarity of the listings' shingles at which they count as duplicates
+DUPLICATE_SIMILARITY = 0.8
+# Listings a new one is compared against; relisting something that sold is fine
+DUPLICATE_CANDIDATE_STATUSES = ("published", "draft", "hidden")
+MINHASH_PERMUTATIONS = 64
+# 16 bands of 4 rows: pairs above ~0.5 similarity share a bucket with high probability
+LSH_BANDS = 16
+SHINGLE_WORDS = 2
+MINHASH_SEED = 34
+BACKFILL_BATCH_SIZE = 1000
+
+_MASK64 = (1 << 64) - 1
+_rng = random.Random(MINHASH_SEED)
+# Multiply-shift hash family: h(x) = ((a * x + b) mod 2^64) >> 32 with odd a
+_A = [_rng.getrandbits(64) | 1 for _ in range(MINHASH_PERMUTATIONS)]
+_B = [_rng.getrandbits(64) for _ in range(MINHASH_PERMUTATIONS)]
+_ROWS_PER_BAND = MINHASH_PERMUTATIONS // LSH_BANDS
+_SIGNATURE_FORMAT = f"<{MINHASH_PERMUTATIONS}I"
+
+def shingles(title: Optional[str], description: Optional[str]) -> set:
+    tokens = TERM_RE.findall(f"{title or ''} {description or ''}".casefold())
+    if len(tokens) < SHINGLE_WORDS:
+        return set(tokens)
+    return {" ".join(tokens[i:i + SHINGLE_WORDS]) for i in range(len(tokens) - SHINGLE_WORDS + 1)}
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "little")
+
+def minhash(shingle_set: set) -> Optional[bytes]:
+    """Packed MinHash signature of a shingle set, or None for an empty one."""
+    if not shingle_set:
+        return None
+    hashes = [_shingle_hash(shingle) for shingle in shingle_set]
+    if np is not None:
+        x = np.array(hashes, dtype=np.uint64)
+        a = np.array(_A, dtype=np.uint64)[:, None]
+        b = np.array(_B, dtype=np.uint64)[:, None]
+        with np.errstate(over="ignore"):
+            values = ((a * x + b) >> np.uint64(32)).min(axis=1)
+        return values.astype("<u4").tobytes()
+    values = [min(((a * x + b) & _MASK64) >> 32 for x in hashes) for a, b in zip(_A, _B)]
+    return struct.pack(_SIGNATURE_FORMAT, *values)
+
+def listing_signature(title: Optional[str], description: Optional[str]) -> Optional[bytes]:
+    return minhash(shingles(title, description))
+
+def band_buckets(signature: bytes) -> List[Tuple[int, int]]:
+    """(band, bucket) keys of a signature; two listings are candidates if they share any."""
+    width = _ROWS_PER_BAND * 4
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(signature[band * width:(band + 1) * width], digest_size=8).digest(), "little"
+        ) >> 1)  # SQLite integers are signed 64-bit
+        for band in range(LSH_BANDS)
+    ]
+
+def estimate_similarity(first: bytes, second: bytes) -> float:
+    matches = sum(x == y for x, y in zip(struct.unpack(_SIGNATURE_FORMAT, first), struct.unpack(_SIGNATURE_FORMAT, second)))
+    return matches / MINHASH_PERMUTATIONS
+
+def _duplicate_candidates_statement():
+    # Built once: the band numbers are fixed, only the buckets are bound per lookup. An OR of
+    # equalities lets SQLite probe the primary key per band; a row-value IN scans the whole table.
+    candidates = (
+        select(ListingLshBucket.listing_id)
+        .where(or_(*(
+            and_(ListingLshBucket.band == band, ListingLshBucket.bucket == bindparam(f"bucket_{band}"))
+            for band in range(LSH_BANDS)
+        )))
+        .distinct()
+    )
+    return (
+        select(ListingSignature.listing_id, ListingSignature.signature)
+        .join(Listing, Listing.id == ListingSignature.listing_id)
+        .where(ListingSignature.listing_id.in_(candidates.scalar_subquery()),
+               Listing.status.in_(DUPLICATE_CANDIDATE_STATUSES))
+    )
+
+_DUPLICATE_CANDIDATES = _duplicate_candidates_statement()
+
+def find_duplicates(db: Session, signature: Optional[bytes], exclude_id: Optional[int] = None,
+                    threshold: float = DUPLICATE_SIMILARITY) -> List[Tuple[int, float]]:
+    """Live listings whose signature is at least threshold similar, as (listing id, similarity), best first."""
+    if signature is None:
+        return []
+    params = {f"bucket_{band}": bucket for band, bucket in band_buckets(signature)}
+    rows = db.execute(_DUPLICATE_CANDIDATES, params).all()
+    matches = [
+        (listing_id, estimate_similarity(signature, other))
+        for listing_id, other in rows if listing_id != exclude_id
+    ]
+    return sorted((match for match in matches if match[1] >= threshold), key=lambda match: (-match[1], match[0]))
+
+def store_signature(db: Session, listing_id: int, signature: Optional[bytes]) -> None:
+    """Replace a listing's signature and buckets without committing."""
+    drop_signature(db, listing_id)
+    if signature is None:
+        return
+    db.add(ListingSignature(listing_id=listing_id, signature=signature))
+    insert_rows(db, ListingLshBucket, [
+        {"band": band, "bucket": bucket, "listing_id": listing_id} for band, bucket in band_buckets(signature)
+    ])
+
+def drop_signature(db: Session, listing_id: int) -> None:
+    db.execute(delete(ListingLshBucket).where(ListingLshBucket.listing_id == listing_id))
+    db.execute(delete(ListingSignature).where(ListingSignature.listing_id == listing_id))
+
+def flag_duplicate(db: Session, listing: Listing, duplicates: List[Tuple[int, float]]) -> None:
+    duplicate_id, similarity = duplicates[0]
+    record_report(db, listing, "duplicate", note=f"Near-duplicate of listing {duplicate_id} (similarity {similarity:.2f})")
+
+def backfill_signatures(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Compute signatures for listings that have none, one transaction per batch; returns the count."""
+    done = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.query(Listing.id, Listing.title, Listing.description)
+            .outerjoin(ListingSignature, ListingSignature.listing_id == Listing.id)
+            .filter(Listing.id > last_id, ListingSignature.listing_id.is_(None))
+            .order_by(Listing.id)
+            .limit(batch_size)
+            .all()
+        )
+        # A sharded session returns each shard's batch in turn; the lowest ids are the global batch
+        rows = sorted(rows)[:batch_size]
+        if not rows:
+            return done
+        for listing_id, title, description in rows:
+            store_signature(db, listing_id, listing_signature(title, description))
+        db.commit()
+        done += len(rows)
+        last_id = rows[-1][0]
+
+def main():
+    from backend.database import open_session
+
+    parser = argparse.ArgumentParser(description="Compute MinHash signatures for listings that have none.")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = open_session()
+    try:
+        done = backfill_signatures(db, args.batch_size)
+    finally:
+        db.close()
+    print(f"Signed {done} listing(s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import os
+import re
+import stat
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import Response
+
+router = APIRouter(tags=["images"])
+
+# Image derivatives (url_full / url_card / url_thumb) are stored below MEDIA_ROOT
+# and referenced as MEDIA_URL_PREFIX + relative path, e.g. /media/listings/12/3f9a2c1be0d4.card.webp
+MEDIA_ROOT = Path(__file__).resolve().parent / "media"
+MEDIA_URL_PREFIX = "/media"
+
+OPEN_FILE_CACHE_SIZE = 512
+# Files without a content hash in their name may be replaced in place, so their cached
+# stat result is re-validated after this many seconds. Hashed files are never re-validated.
+STAT_REVALIDATE_SECONDS = 2.0
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "public, max-age=300"
+READ_CHUNK_SIZE = 256 * 1024
+
+# "<anything>.<hex digest>.<ext>" or "<hex digest>.<ext>", digest at least 8 hex chars
+HASHED_NAME_RE = re.compile(r"(?:^|[._-])[0-9a-f]{8,64}(?:\.[a-z0-9]+)+$")
+
+
+class OpenFile:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb", buffering=0)
+        st = os.fstat(self.file.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            self.file.close()
+            raise FileNotFoundError(path)
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+        self.etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        self.last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.content_type = guess_type(path)[0] or "application/octet-stream"
+        self.immutable = HASHED_NAME_RE.search(os.path.basename(path)) is not None
+        self.validated_at = time.monotonic()
+        self._refs = 0
+        self._evicted = False
+        self._lock = threading.Lock()
+
+    @property
+    def fd(self) -> int:
+        return self.file.fileno()
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._refs += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._refs -= 1
+            close = self._evicted and self._refs == 0
+        if close:
+            self.file.close()
+
+    def evict(self) -> None:
+        # An evicted descriptor may still be mid-transfer, so it is closed by the last release.
+        with self._lock:
+            self._evicted = True
+            close = self._refs == 0
+        if close:
+            self.file.close()
+
+    def is_stale(self) -> bool:
+        if self.immutable or time.monotonic() - self.validated_at < STAT_REVALIDATE_SECONDS:
+            return False
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return True
+        if (st.st_ino, st.st_size, st.st_mtime_ns) != self.identity:
+            return True
+        self.validated_at = time.monotonic()
+        return False
+
+
+class OpenFileCache:
+    """LRU of open descriptors and stat results for served media files."""
+
+    def __init__(self, maxsize: int = OPEN_FILE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, OpenFile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, path: str) -> Optional[OpenFile]:
+        """Return an acquired entry without touching the filesystem, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            self._entries.move_to_end(path)
+            entry.acquire()
+        if entry.is_stale():
+            self.invalidate(path)
+            entry.release()
+            return None
+        self.hits += 1
+        return entry
+
+    def open(self, path: str) -> OpenFile:
+        """Open and cache path (blocking), returning an acquired entry."""
+        entry = OpenFile(path)
+        entry.acquire()
+        evicted = []
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                evicted.append(previous)
+            self._entries[path] = entry
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for old in evicted:
+            old.evict()
+        return entry
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(path, None)
+        if entry is not None:
+            entry.evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+file_cache = OpenFileCache()
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=" range into [start, end). Returns None to ignore the header.
+
+    Raises ValueError when the range is well-formed but not satisfiable.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        # Multipart ranges are not worth it for images; RFC 9110 allows serving the full body.
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first + last).isdigit():
+        return None
+    if size == 0:
+        # No byte of an empty file can be addressed, suffix ranges included
+        raise ValueError("empty file")
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        return max(size - suffix, 0), size
+    start = int(first)
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    end = int(last) + 1 if last else size
+    if end <= start:
+        return None
+    return start, min(end, size)
+
+
+def _not_modified(request: Request, entry: OpenFile) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(entry.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class CachedFileResponse(Response):
+    """Streams a cached OpenFile, preferring the ASGI zero-copy and pathsend extensions."""
+
+    def __init__(self, entry: OpenFile, status_code: int = 200, start: int = 0, end: Optional[int] = None,
+                 headers: Optional[dict] = None, head: bool = False):
+        self.entry = entry
+        self.start = start
+        self.end = entry.size if end is None else end
+        self.head = head
+        super().__init__(status_code=status_code, headers=headers, media_type=entry.content_type)
+        if status_code != 304:
+            self.headers["content-length"] = str(self.end - self.start)
+
+    def init_headers(self, headers=None) -> None:
+        super().init_headers(headers)
+        # Response.init_headers computes content-length from an empty body; ours comes from the file.
+        self.raw_headers = [(k, v) for k, v in self.raw_headers if k != b"content-length"]
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            extensions = scope.get("extensions") or {}
+            count = self.end - self.start
+            if self.head or count == 0 or self.status_code == 304:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif "http.response.zerocopy" in extensions:
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": self.entry.file,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+            elif "http.response.pathsend" in extensions and count == self.entry.size:
+                await send({"type": "http.response.pathsend", "path": self.entry.path})
+            else:
+                # pread() does not move a shared file offset, so the cached descriptor
+                # can serve concurrent requests without reopening the file.
+                offset = self.start
+                while offset < self.end:
+                    length = min(READ_CHUNK_SIZE, self.end - offset)
+                    chunk = await anyio.to_thread.run_sync(os.pread, self.entry.fd, length, offset)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": offset < self.end})
+                if offset < self.end:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.entry.release()
+
+
+def _resolve_media_path(file_path: str) -> str:
+    parts = file_path.split("/")
+    if not file_path or any(part in ("", ".", "..") or part.startswith(".") for part in parts):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return os.path.join(str(MEDIA_ROOT), *parts)
+
+
+@router.api_route(MEDIA_URL_PREFIX + "/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_image(file_path: str, request: Request):
+    path = _resolve_media_path(file_path)
+    entry = file_cache.lookup(path)
+    if entry is None:
+        try:
+            entry = await anyio.to_thread.run_sync(file_cache.open, path)
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            raise HTTPException(status_code=404, detail="Image not found")
+
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": entry.etag,
+        "last-modified": entry.last_modified,
+        "cache-control": IMMUTABLE_CACHE_CONTROL if entry.immutable else MUTABLE_CACHE_CONTROL,
+    }
+    head = request.method == "HEAD"
+    try:
+        if _not_modified(request, entry):
+            return CachedFileResponse(entry, status_code=304, end=0, headers=headers, head=True)
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range in (entry.etag, entry.last_modified)):
+            try:
+                byte_range = _parse_range(range_header, entry.size)
+            except ValueError:
+                headers["content-range"] = f"bytes */{entry.size}"
+                return CachedFileResponse(entry, status_code=416, end=0, headers=headers, head=True)
+            if byte_range is not None:
+                start, end = byte_range
+                headers["content-range"] = f"bytes {start}-{end - 1}/{entry.size}"
+                return CachedFileResponse(entry, status_code=206, start=start, end=end, headers=headers, head=head)
+
+        return CachedFileResponse(entry, headers=headers, head=head)
+    except BaseException:
+        entry.release()
+        raise
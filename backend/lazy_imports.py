@@ -0,0 +1,29 @@
+import importlib.machinery
+import importlib.util
+import sys
+
+def lazy_import(name: str):
+    """Return module name, executed on first attribute access instead of now; None if not installed.
+
+    For optional heavy dependencies that only some code paths use, so worker startup does not pay
+    for them. A module that was already imported is returned as is.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    package, _, _ = name.rpartition(".")
+    if package:
+        # Look a submodule up without importing its package, which may be the expensive part
+        package_spec = importlib.util.find_spec(package)
+        if package_spec is None or package_spec.submodule_search_locations is None:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, package_spec.submodule_search_locations)
+    else:
+        spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
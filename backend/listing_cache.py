@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from backend.cache_bus import cache_bus
+from backend.compression import encode_body
+
+LISTING_CACHE_ENABLED = True
+LISTING_CACHE_SIZE = 10_000
+# Writes the cache bus does not deliver (scripts, a stalled poller) become visible after this long
+LISTING_CACHE_TTL_SECONDS = 60.0
+
+class ListingCache:
+    """LRU of serialized ListingOut payloads keyed by listing id, with their response bodies.
+
+    Write paths in this process call invalidate() after their commit, other workers hear about it
+    through the cache bus, and the TTL bounds staleness for the rest.
+    """
+
+    def __init__(self, max_entries: int = LISTING_CACHE_SIZE, ttl: float = LISTING_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation; see put()
+        self.generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, listing_ids: Iterable[int]) -> Dict[int, dict]:
+        if not LISTING_CACHE_ENABLED:
+            return {}
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for listing_id in listing_ids:
+                entry = self._entries.get(listing_id)
+                if entry is None or entry[0] <= now:
+                    if entry is not None:
+                        del self._entries[listing_id]
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(listing_id)
+                found[listing_id] = entry[1]
+                self.hits += 1
+        return found
+
+    def get(self, listing_id: int) -> Optional[dict]:
+        return self.get_many([listing_id]).get(listing_id)
+
+    def get_body(self, listing_id: int, encoding: Optional[str]) -> Optional[Tuple[bytes, Optional[str]]]:
+        """The cached payload as a JSON body for a client that negotiated encoding, from encode_body.
+
+        Each entry renders and compresses once per encoding, so hot listings are not recompressed per request.
+        """
+        if not LISTING_CACHE_ENABLED:
+            return None
+        with self._lock:
+            entry = self._entries.get(listing_id)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[listing_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(listing_id)
+            self.hits += 1
+        bodies = entry[2]
+        body = bodies.get(encoding)
+        if body is None:
+            # Concurrent misses may both encode; either result is the same
+            identity = bodies.get(None)
+            if identity is None:
+                identity = bodies[None] = (JSONResponse(entry[1]).body, None)
+            body = bodies[encoding] = encode_body(identity[0], encoding)
+        return body
+
+    def put(self, listing_id: int, payload: dict, generation: Optional[int] = None) -> None:
+        """Cache a payload. Pass the generation read before loading it, so a payload loaded before
+        an invalidation that arrived mid-read is not cached."""
+        if not LISTING_CACHE_ENABLED:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            # (expiry, payload, encoding -> (body, Content-Encoding))
+            self._entries[listing_id] = (time.monotonic() + self.ttl, payload, {})
+            self._entries.move_to_end(listing_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, listing_id: int) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(listing_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+listing_cache = ListingCache()
+
+def _invalidate_from_bus(key: Optional[str]) -> None:
+    if key is None:
+        listing_cache.clear()
+    else:
+        listing_cache.invalidate(int(key))
+
+cache_bus.subscribe("listings", _invalidate_from_bus)
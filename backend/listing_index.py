@@ -0,0 +1,232 @@
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.lazy_imports import lazy_import
+from backend.models import Listing
+
+# The index is optional; browse falls back to SQL without numpy
+np = lazy_import("numpy")
+
+# Serve GET /listings/ filters from the in-process column index (requires numpy)
+LISTING_INDEX_ENABLED = False
+
+SORT_OPTIONS = ("newest", "price_asc", "price_desc", "distance")
+# Equirectangular approximation, accurate to well under 1% at city scale; the SQL path uses the same formula
+KM_PER_DEGREE = 111.195
+# Compact when more than this share of slots are tombstones
+COMPACT_RATIO = 0.25
+INITIAL_CAPACITY = 1024
+
+IndexRow = Tuple[int, int, Optional[int], Optional[str], Optional[float], Optional[float]]
+
+def listing_row(listing) -> IndexRow:
+    return (listing.id, listing.price_sek, listing.category_id, listing.condition, listing.latitude, listing.longitude)
+
+class ListingColumnIndex:
+    """Published listings held as contiguous NumPy columns for vectorized browse filtering.
+
+    Rows live in slots; removal leaves a tombstone that is compacted away once they pile up.
+    All methods are thread-safe.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._lock = threading.RLock()
+        self._slots: Dict[int, int] = {}
+        self._conditions: Dict[str, int] = {}
+        self._size = 0
+        # Columns are allocated by the first load or write, so creating the index does not import numpy
+        self._allocated = False
+
+    def _allocate(self, capacity: int) -> None:
+        if np is None:
+            return
+        self._allocated = True
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.int64)
+        self.category = np.full(capacity, -1, dtype=np.int64)
+        self.condition = np.full(capacity, -1, dtype=np.int32)
+        self.lat = np.full(capacity, np.nan, dtype=np.float64)
+        self.lon = np.full(capacity, np.nan, dtype=np.float64)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def _columns(self):
+        return ("ids", "price", "category", "condition", "lat", "lon", "alive")
+
+    def _grow(self, needed: int) -> None:
+        if not self._allocated:
+            self._allocate(max(needed, INITIAL_CAPACITY))
+            return
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, INITIAL_CAPACITY)
+        for name in self._columns():
+            old = getattr(self, name)
+            new = np.empty(new_capacity, dtype=old.dtype)
+            new[:capacity] = old
+            if name == "alive":
+                new[capacity:] = False
+            setattr(self, name, new)
+
+    def _condition_code(self, condition: Optional[str]) -> int:
+        if condition is None:
+            return -1
+        code = self._conditions.get(condition)
+        if code is None:
+            code = self._conditions[condition] = len(self._conditions)
+        return code
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def load_rows(self, rows: Iterable[IndexRow]) -> None:
+        """Replace the index contents with rows of (id, price_sek, category_id, condition, latitude, longitude)."""
+        rows = list(rows)
+        with self._lock:
+            self._slots = {}
+            self._conditions = {}
+            self._size = 0
+            self._allocate(max(INITIAL_CAPACITY, len(rows) * 5 // 4))
+            if rows:
+                n = len(rows)
+                ids, price, category, condition, lat, lon = zip(*rows)
+                self.ids[:n] = ids
+                self.price[:n] = price
+                self.category[:n] = [-1 if value is None else value for value in category]
+                self.condition[:n] = [self._condition_code(value) for value in condition]
+                self.lat[:n] = [np.nan if value is None else value for value in lat]
+                self.lon[:n] = [np.nan if value is None else value for value in lon]
+                self.alive[:n] = True
+                self._slots = {listing_id: slot for slot, listing_id in enumerate(ids)}
+                self._size = n
+            self.ready = True
+
+    def clear(self) -> None:
+        """Empty the index and stop serving from it until the next load."""
+        with self._lock:
+            self.ready = False
+            self._slots = {}
+            self._conditions = {}
+            self._size = 0
+            self._allocate(INITIAL_CAPACITY)
+
+    def load(self, db: Session) -> None:
+        if np is None:
+            raise RuntimeError("numpy is required for the listing index")
+        query = (
+            db.query(Listing.id, Listing.price_sek, Listing.category_id, Listing.condition,
+                     Listing.latitude, Listing.longitude)
+            .filter(Listing.status == "published")
+            .yield_per(10_000)
+        )
+        self.load_rows(tuple(row) for row in query)
+
+    def sync(self, listing) -> None:
+        """Mirror a committed listing write: index it if published, drop it otherwise."""
+        if not self.ready:
+            return
+        if listing.status == "published":
+            self.upsert(listing_row(listing))
+        else:
+            self.remove(listing.id)
+
+    def upsert(self, row: IndexRow) -> None:
+        listing_id, price, category, condition, lat, lon = row
+        with self._lock:
+            slot = self._slots.get(listing_id)
+            if slot is None:
+                self._grow(self._size + 1)
+                slot = self._size
+                self._size += 1
+                self._slots[listing_id] = slot
+            self.ids[slot] = listing_id
+            self.price[slot] = price
+            self.category[slot] = -1 if category is None else category
+            self.condition[slot] = self._condition_code(condition)
+            self.lat[slot] = np.nan if lat is None else lat
+            self.lon[slot] = np.nan if lon is None else lon
+            self.alive[slot] = True
+
+    def remove(self, listing_id: int) -> None:
+        with self._lock:
+            slot = self._slots.pop(listing_id, None)
+            if slot is None:
+                return
+            self.alive[slot] = False
+            if self._size - len(self._slots) > COMPACT_RATIO * max(self._size, INITIAL_CAPACITY):
+                self._compact()
+
+    def _compact(self) -> None:
+        live = np.flatnonzero(self.alive[:self._size])
+        n = len(live)
+        for name in self._columns():
+            column = getattr(self, name)
+            column[:n] = column[live]
+        self.alive[n:self._size] = False
+        self._size = n
+        self._slots = {int(listing_id): slot for slot, listing_id in enumerate(self.ids[:n])}
+
+    def search(self, category_id: Optional[int] = None, min_price: Optional[int] = None,
+               max_price: Optional[int] = None, condition: Optional[str] = None, lat: Optional[float] = None,
+               lon: Optional[float] = None, radius_km: Optional[float] = None, sort: str = "newest",
+               skip: int = 0, limit: int = 20) -> List[int]:
+        """Return the ids of one page of matching listings, in the same order as the SQL path."""
+        k = skip + limit
+        with self._lock:
+            n = self._size
+            mask = self.alive[:n].copy()
+            if category_id is not None:
+                mask &= self.category[:n] == category_id
+            if min_price is not None:
+                mask &= self.price[:n] >= min_price
+            if max_price is not None:
+                mask &= self.price[:n] <= max_price
+            if condition is not None:
+                code = self._conditions.get(condition)
+                if code is None:
+                    return []
+                mask &= self.condition[:n] == code
+            distance = None
+            if lat is not None and lon is not None and (radius_km is not None or sort == "distance"):
+                distance = squared_distance_km(self.lat[:n], self.lon[:n], lat, lon)
+                if radius_km is not None:
+                    # NaN coordinates compare False and drop out here
+                    mask &= distance <= radius_km * radius_km
+                else:
+                    mask &= ~np.isnan(distance)
+            candidates = np.flatnonzero(mask)
+            ids = self.ids[candidates]
+            if sort == "price_asc":
+                key = self.price[candidates]
+            elif sort == "price_desc":
+                key = -self.price[candidates]
+            elif sort == "distance" and distance is not None:
+                key = distance[candidates]
+            else:
+                key = -ids
+        if k <= 0 or len(candidates) == 0:
+            return []
+        if len(candidates) > k:
+            # O(n) selection of the k best keys; ties at the boundary are resolved below by id
+            kth = np.partition(key, k - 1)[k - 1]
+            keep = np.flatnonzero(key <= kth)
+            key, ids = key[keep], ids[keep]
+        order = np.lexsort((-ids, key))[:k]
+        return ids[order][skip:].tolist()
+
+def squared_distance_km(lat, lon, lat0: float, lon0: float):
+    """Squared equirectangular distance in km²; works on scalars, NumPy arrays and SQL expressions."""
+    cos_lat0 = math.cos(math.radians(lat0))
+    dlat = (lat - lat0) * KM_PER_DEGREE
+    dlon = (lon - lon0) * (KM_PER_DEGREE * cos_lat0)
+    return dlat * dlat + dlon * dlon
+
+def order_by_ids(rows: Sequence, ids: Sequence[int]) -> list:
+    by_id = {row.id: row for row in rows}
+    return [by_id[listing_id] for listing_id in ids if listing_id in by_id]
+
+listing_index = ListingColumnIndex()
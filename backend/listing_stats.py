@@ -0,0 +1,204 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+import argparse
+
+from pydantic import BaseModel
+from sqlalchemy import case, delete, event, func, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.models import Listing, ListingAggregate
+
+# Lower bounds in SEK of the fixed price buckets; the last bucket is open-ended
+PRICE_BUCKETS = (0, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+
+# Session.info key set when a decrement finds no count to take from: the table was never filled for that
+# group, e.g. it was created outside the migration that backfills it. The whole table is recounted at commit.
+RECOUNT_AGGREGATES = "recount_listing_aggregates"
+
+# (price_sek, category_id, city, condition) of a published listing
+Facets = Tuple[int, Optional[int], Optional[str], Optional[str]]
+
+class PriceBucketOut(BaseModel):
+    min_price: int
+    # Exclusive; None for the last bucket
+    max_price: Optional[int]
+    count: int
+
+class ListingStatsOut(BaseModel):
+    dimension: str
+    value: Optional[str]
+    count: int
+    min_price: Optional[int]
+    max_price: Optional[int]
+    buckets: List[PriceBucketOut]
+
+class AggregateDrift(BaseModel):
+    dimension: str
+    value: str
+    bucket: int
+    # [count, price_min, price_max]
+    stored: List[int]
+    actual: List[int]
+
+def price_bucket(price: int) -> int:
+    return max(bisect_right(PRICE_BUCKETS, price) - 1, 0)
+
+def listing_facets(listing) -> Optional[Facets]:
+    """What a listing contributes to the aggregates; None unless it is published."""
+    if listing is None or listing.status != "published":
+        return None
+    return listing.price_sek, listing.category_id, listing.city, listing.condition
+
+def _groups(facets: Facets):
+    _, category_id, city, condition = facets
+    yield "all", ""
+    if category_id is not None:
+        yield "category", str(category_id)
+    if city:
+        yield "city", city
+    if condition:
+        yield "condition", condition
+
+def _bump(db: Session, dimension: str, value: str, price: int, delta: int) -> None:
+    key = (ListingAggregate.dimension == dimension, ListingAggregate.value == value,
+           ListingAggregate.bucket == price_bucket(price))
+    if delta < 0:
+        taken = db.execute(
+            update(ListingAggregate).where(*key, ListingAggregate.count >= -delta)
+            .values(count=ListingAggregate.count + delta),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        if not taken:
+            db.info[RECOUNT_AGGREGATES] = True
+        return
+    # A bucket that was empty keeps the bounds of listings that have left it
+    was_empty = ListingAggregate.count <= 0
+    db.execute(
+        sqlite_insert(ListingAggregate)
+        .values(dimension=dimension, value=value, bucket=price_bucket(price), count=delta,
+                price_min=price, price_max=price)
+        .on_conflict_do_update(
+            index_elements=[ListingAggregate.dimension, ListingAggregate.value, ListingAggregate.bucket],
+            set_={
+                "count": ListingAggregate.count + delta,
+                "price_min": case((was_empty, price), else_=func.min(ListingAggregate.price_min, price)),
+                "price_max": case((was_empty, price), else_=func.max(ListingAggregate.price_max, price)),
+            },
+        )
+    )
+
+def apply_listing_change(db: Session, old: Optional[Facets], new: Optional[Facets]) -> None:
+    """Call in the transaction that creates, edits, deletes or changes the status of a listing, with its
+    listing_facets() from before and after the write.
+
+    Counts are exact: a decrement with no count to take from marks the session, and the table is
+    recounted from the listings just before it commits. Bucket bounds only widen while the bucket has listings, so after the cheapest or
+    dearest listing leaves, min_price and max_price can be looser than the real ones, by less than a
+    bucket, until reconcile_listing_aggregates(fix=True) runs.
+    """
+    if old == new:
+        return
+    if old is not None:
+        for dimension, value in _groups(old):
+            _bump(db, dimension, value, old[0], -1)
+    if new is not None:
+        for dimension, value in _groups(new):
+            _bump(db, dimension, value, new[0], 1)
+
+def read_listing_stats(db: Session, dimension: str = "all", value: str = "") -> ListingStatsOut:
+    # One primary key range of at most len(PRICE_BUCKETS) rows
+    rows = (
+        db.query(ListingAggregate.bucket, ListingAggregate.count, ListingAggregate.price_min, ListingAggregate.price_max)
+        .filter(ListingAggregate.dimension == dimension, ListingAggregate.value == value, ListingAggregate.count > 0)
+        .order_by(ListingAggregate.bucket)
+        .all()
+    )
+    counts = {row.bucket: row.count for row in rows}
+    return ListingStatsOut(
+        dimension=dimension,
+        value=value if dimension != "all" else None,
+        count=sum(counts.values()),
+        min_price=rows[0].price_min if rows else None,
+        max_price=rows[-1].price_max if rows else None,
+        buckets=[
+            PriceBucketOut(
+                min_price=low,
+                max_price=PRICE_BUCKETS[bucket + 1] if bucket + 1 < len(PRICE_BUCKETS) else None,
+                count=counts.get(bucket, 0),
+            )
+            for bucket, low in enumerate(PRICE_BUCKETS)
+        ],
+    )
+
+def compute_listing_aggregates(db: Session) -> Dict[Tuple[str, str, int], List[int]]:
+    """Recompute every group's buckets as [count, price_min, price_max] from published listings."""
+    actual: Dict[Tuple[str, str, int], List[int]] = {}
+    query = (
+        db.query(Listing.price_sek, Listing.category_id, Listing.city, Listing.condition)
+        .filter(Listing.status == "published")
+        .yield_per(10_000)
+    )
+    for facets in query:
+        price = facets[0]
+        bucket = price_bucket(price)
+        for dimension, value in _groups(tuple(facets)):
+            entry = actual.setdefault((dimension, value, bucket), [0, price, price])
+            entry[0] += 1
+            entry[1] = min(entry[1], price)
+            entry[2] = max(entry[2], price)
+    return actual
+
+def reconcile_listing_aggregates(db: Session, fix: bool = False) -> List[AggregateDrift]:
+    """Compare stored aggregates with a full recomputation; optionally rewrite the table."""
+    actual = compute_listing_aggregates(db)
+    stored = {
+        (row.dimension, row.value, row.bucket): [row.count, row.price_min, row.price_max]
+        for row in db.query(ListingAggregate).filter(ListingAggregate.count != 0)
+    }
+    empty = [0, 0, 0]
+    drift = [
+        AggregateDrift(dimension=key[0], value=key[1], bucket=key[2], stored=stored.get(key, empty),
+                       actual=actual.get(key, empty))
+        for key in sorted(stored.keys() | actual.keys())
+        if stored.get(key) != actual.get(key)
+    ]
+    if fix:
+        _rewrite_aggregates(db, actual)
+        db.commit()
+    return drift
+
+def _rewrite_aggregates(db: Session, actual: Dict[Tuple[str, str, int], List[int]]) -> None:
+    db.execute(delete(ListingAggregate))
+    if actual:
+        db.execute(insert(ListingAggregate), [
+            {"dimension": dimension, "value": value, "bucket": bucket,
+             "count": count, "price_min": price_min, "price_max": price_max}
+            for (dimension, value, bucket), (count, price_min, price_max) in actual.items()
+        ])
+
+@event.listens_for(Session, "before_commit")
+def _recount_marked_sessions(session: Session) -> None:
+    if session.info.pop(RECOUNT_AGGREGATES, False):
+        # Flushed first, so the recount sees the listing writes this transaction made after the decrement
+        session.flush()
+        _rewrite_aggregates(session, compute_listing_aggregates(session))
+
+def main():
+    from backend.database import open_session
+
+    parser = argparse.ArgumentParser(description="Recompute listing price aggregates and report drift.")
+    parser.add_argument("--fix", action="store_true", help="rewrite the aggregates from the listings table")
+    args = parser.parse_args()
+
+    db = open_session()
+    try:
+        drift = reconcile_listing_aggregates(db, fix=args.fix)
+    finally:
+        db.close()
+    for item in drift:
+        print(f"{item.dimension}={item.value!r} bucket {item.bucket}: stored={item.stored} actual={item.actual}")
+    print(f"{len(drift)} drifted bucket(s){' fixed' if args.fix and drift else ''}.")
+
+if __name__ == "__main__":
+    main()
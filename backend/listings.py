@@ -1,10 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
-from backend.models import Listing, ListingImage
+from backend.models import Listing, ListingImage, ArchivedListing
 from backend.database import get_db
+from backend.user_stats import apply_listing_status_change
+from backend.listing_stats import ListingStatsOut, apply_listing_change, listing_facets, read_listing_stats
+from backend.listing_index import listing_index, squared_distance_km, order_by_ids, SORT_OPTIONS
+from backend.suggest import title_suggest, published_title, TERM_RE
+from backend.similar import refresh_listing_neighbours
+from backend import dedupe
+from backend.saved_searches import percolate_listing
+from backend.changes import record_change, change_notifier
+from backend.listing_cache import listing_cache
+from backend.compression import choose_encoding, encoded_response
+from backend.write_coalescer import write_unit
+from backend import sharding
 
 # Pydantic schemas (should ideally be in a separate schemas.py, but kept here for now)
 class ListingImageOut(BaseModel):
@@ -46,37 +60,308 @@ class ListingOut(ListingBase):
     class Config:
         from_attributes = True
 
+class ListingFilters(BaseModel):
+    category_id: Optional[int] = None
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    condition: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    radius_km: Optional[float] = Field(None, gt=0)
+    sort: str = "newest"
+
+class SuggestionOut(BaseModel):
+    text: str
+    count: int
+
+class ListingBatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class ListingBatchItem(BaseModel):
+    id: int
+    found: bool
+    listing: Optional[ListingOut] = None
+
 router = APIRouter(prefix="/listings", tags=["listings"])
 
+# Columns that can be picked with ?fields=; "images" loads every image, "image" only the first one
+PROJECTABLE_COLUMNS = [name for name in ListingOut.model_fields if name != "images"]
+PROJECTABLE_FIELDS = PROJECTABLE_COLUMNS + ["image", "images"]
+# ?view=card: what a grid card renders
+CARD_FIELDS = ["id", "title", "price_sek", "city", "image"]
+VIEWS = ("full", "card")
+# GET /listings/batch keeps ids in the URL; longer lists go through POST
+MAX_BATCH_IDS_GET = 100
+
+def _parse_fields(fields: Optional[str], view: Optional[str]) -> Optional[List[str]]:
+    """The fields to return, or None for the full ListingOut. ?fields= takes precedence over ?view=."""
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in PROJECTABLE_FIELDS]
+        if unknown or not names:
+            raise HTTPException(status_code=400, detail=f"fields must be a comma-separated subset of {', '.join(PROJECTABLE_FIELDS)}")
+        return list(dict.fromkeys(["id"] + names))
+    if view is not None and view not in VIEWS:
+        raise HTTPException(status_code=400, detail=f"view must be one of {', '.join(VIEWS)}")
+    return CARD_FIELDS if view == "card" else None
+
+def _project(query, names: List[str]):
+    """Restrict a Listing query to the requested columns."""
+    query = query.options(load_only(*[getattr(Listing, name) for name in names if name in PROJECTABLE_COLUMNS]))
+    if "images" in names:
+        query = query.options(selectinload(Listing.images))
+    return query
+
+def _first_images(db: Session, ids: List[int]) -> dict:
+    # One correlated subquery per listing picks its first image; run after paging so skipped rows cost nothing
+    first_image_id = (
+        select(ListingImage.id)
+        .where(ListingImage.listing_id == Listing.id)
+        .order_by(ListingImage.sort_order, ListingImage.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    rows = (
+        db.query(ListingImage.listing_id, ListingImage.url_card, ListingImage.url_thumb, ListingImage.blurhash)
+        .filter(ListingImage.id.in_(select(first_image_id).where(Listing.id.in_(ids))))
+        .all()
+    )
+    return {row.listing_id: {"url_card": row.url_card, "url_thumb": row.url_thumb, "blurhash": row.blurhash} for row in rows}
+
+def _projected_rows(db: Session, listings, names: List[str]) -> List[dict]:
+    columns = [name for name in names if name in PROJECTABLE_COLUMNS]
+    images = _first_images(db, [listing.id for listing in listings]) if "image" in names and listings else {}
+    result = []
+    for listing in listings:
+        item = {}
+        for name in columns:
+            value = getattr(listing, name)
+            item[name] = value.isoformat() if isinstance(value, datetime) else value
+        if "image" in names:
+            item["image"] = images.get(listing.id)
+        if "images" in names:
+            item["images"] = [ListingImageOut.model_validate(image).model_dump() for image in listing.images]
+        result.append(item)
+    return result
+
+def _listing_payload(listing) -> dict:
+    return ListingOut.model_validate(listing).model_dump(mode="json")
+
+def _load_listings(db: Session, listing_ids: List[int]) -> dict:
+    """Payloads for the given ids from the cache, then the hot table, then the archive. Missing ids are left out."""
+    generation = listing_cache.generation
+    payloads = listing_cache.get_many(listing_ids)
+    for model in (Listing, ArchivedListing):
+        missing = [listing_id for listing_id in set(listing_ids) if listing_id not in payloads]
+        if not missing:
+            break
+        for listing in db.query(model).options(selectinload(model.images)).filter(model.id.in_(missing)):
+            payloads[listing.id] = _listing_payload(listing)
+            listing_cache.put(listing.id, payloads[listing.id], generation)
+    return payloads
+
+def _batch_response(db: Session, listing_ids: List[int]) -> JSONResponse:
+    payloads = _load_listings(db, listing_ids)
+    return JSONResponse([
+        {"id": listing_id, "found": listing_id in payloads, "listing": payloads.get(listing_id)}
+        for listing_id in listing_ids
+    ])
+
+def _browse_query(db: Session, filters: ListingFilters):
+    # Only live inventory is browsable; the status filter matches the partial ix_listings_published* indexes
+    query = db.query(Listing).filter(Listing.status == "published")
+    if filters.category_id is not None:
+        query = query.filter(Listing.category_id == filters.category_id)
+    if filters.min_price is not None:
+        query = query.filter(Listing.price_sek >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(Listing.price_sek <= filters.max_price)
+    if filters.condition is not None:
+        query = query.filter(Listing.condition == filters.condition)
+    distance = None
+    if filters.lat is not None and filters.lon is not None and (filters.radius_km is not None or filters.sort == "distance"):
+        distance = squared_distance_km(Listing.latitude, Listing.longitude, filters.lat, filters.lon)
+        query = query.filter(Listing.latitude.isnot(None), Listing.longitude.isnot(None))
+        if filters.radius_km is not None:
+            query = query.filter(distance <= filters.radius_km * filters.radius_km)
+    if filters.sort == "price_asc":
+        query = query.order_by(Listing.price_sek.asc(), Listing.id.desc())
+    elif filters.sort == "price_desc":
+        query = query.order_by(Listing.price_sek.desc(), Listing.id.desc())
+    elif filters.sort == "distance" and distance is not None:
+        query = query.order_by(distance.asc(), Listing.id.desc())
+    else:
+        query = query.order_by(Listing.id.desc())
+    return query
+
+def _browse_merge_key(filters: ListingFilters):
+    # The order of _browse_query, for merging pages from several shards. Ids only ascend within a shard,
+    # so newest compares creation times across them.
+    if filters.sort == "price_asc":
+        return lambda row: (row.price_sek, -row.id)
+    if filters.sort == "price_desc":
+        return lambda row: (-row.price_sek, -row.id)
+    if filters.sort == "distance" and filters.lat is not None and filters.lon is not None:
+        return lambda row: (squared_distance_km(row.latitude, row.longitude, filters.lat, filters.lon), -row.id)
+    return lambda row: (-row.created_at.timestamp() if row.created_at else 0.0, -row.id)
+
+def _browse_shards(router: sharding.ShardRouter, filters: ListingFilters, skip: int, limit: int) -> List[int]:
+    # Every shard returns its own first skip + limit matches; the merge keeps the global first skip + limit
+    columns = (Listing.id, Listing.created_at, Listing.price_sek, Listing.latitude, Listing.longitude)
+    rows = router.scatter_gather(
+        lambda session: _browse_query(session, filters).with_entities(*columns).limit(skip + limit).all(),
+        key=_browse_merge_key(filters), limit=skip + limit,
+    )
+    return [row.id for row in rows[skip:]]
+
 @router.get("/", response_model=List[ListingOut])
-def read_listings(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
-    listings = db.query(Listing).options(joinedload(Listing.images)).offset(skip).limit(limit).all()
-    return listings
+def read_listings(skip: int = 0, limit: int = 20, filters: ListingFilters = Depends(),
+                  fields: Optional[str] = None, view: Optional[str] = None, db: Session = Depends(get_db)):
+    if filters.sort not in SORT_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_OPTIONS)}")
+    if (filters.sort == "distance" or filters.radius_km is not None) and (filters.lat is None or filters.lon is None):
+        raise HTTPException(status_code=400, detail="lat and lon are required for distance filtering")
+    names = _parse_fields(fields, view)
+
+    shard_router = sharding.router_for(db)
+    if listing_index.ready or shard_router is not None:
+        # Filter, distance and top-k run over in-memory columns, or on every shard in parallel with the
+        # pages merged here; the DB only loads the winning page
+        if listing_index.ready:
+            ids = listing_index.search(skip=skip, limit=limit, **filters.model_dump())
+        else:
+            ids = _browse_shards(shard_router, filters, skip, limit)
+        if not ids:
+            return []
+        if names is None:
+            rows = db.query(Listing).options(selectinload(Listing.images)).filter(Listing.id.in_(ids)).all()
+            return order_by_ids(rows, ids)
+        rows = _project(db.query(Listing), names).filter(Listing.id.in_(ids)).all()
+        return JSONResponse(_projected_rows(db, order_by_ids(rows, ids), names))
+
+    if names is None:
+        return _browse_query(db, filters).options(joinedload(Listing.images)).offset(skip).limit(limit).all()
+    # Projected pages skip response_model validation; the dicts are already JSON-ready
+    rows = _project(_browse_query(db, filters), names).offset(skip).limit(limit).all()
+    return JSONResponse(_projected_rows(db, rows, names))
+
+@router.get("/suggest", response_model=List[SuggestionOut])
+def suggest_titles(prefix: str = Query(..., min_length=1, max_length=60), limit: int = Query(10, ge=1, le=20)):
+    # Served from memory only; keystroke traffic never reaches the database
+    words = list(TERM_RE.finditer(prefix))
+    if not words or words[-1].end() != len(prefix):
+        return []
+    head = prefix[:words[-1].start()]
+    return [
+        SuggestionOut(text=head + term, count=count)
+        for term, count in title_suggest.suggest(words[-1].group(), limit)
+    ]
+
+@router.get("/stats", response_model=ListingStatsOut)
+def listing_stats(category_id: Optional[int] = None, city: Optional[str] = None, condition: Optional[str] = None,
+                  db: Session = Depends(get_db)):
+    # Aggregates are kept per single filter, not for combinations of them
+    given = [
+        (dimension, str(value))
+        for dimension, value in (("category", category_id), ("city", city), ("condition", condition))
+        if value is not None
+    ]
+    if len(given) > 1:
+        raise HTTPException(status_code=400, detail="Pass at most one of category_id, city and condition")
+    return read_listing_stats(db, *(given[0] if given else ("all", "")))
+
+@router.get("/batch", response_model=List[ListingBatchItem])
+def read_listings_batch(ids: str = Query(..., min_length=1), db: Session = Depends(get_db)):
+    # Results follow the order of ?ids=; unknown ids come back with found=false
+    try:
+        listing_ids = [int(value) for value in ids.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(listing_ids) > MAX_BATCH_IDS_GET:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS_GET} ids; POST /listings/batch takes more")
+    return _batch_response(db, listing_ids)
+
+@router.post("/batch", response_model=List[ListingBatchItem])
+def read_listings_batch_post(data: ListingBatchRequest, db: Session = Depends(get_db)):
+    return _batch_response(db, data.ids)
 
 @router.get("/{listing_id}", response_model=ListingOut)
-def read_listing(listing_id: int, db: Session = Depends(get_db)):
+def read_listing(listing_id: int, request: Request, db: Session = Depends(get_db)):
+    generation = listing_cache.generation
+    # Hits go out precompressed; CompressionMiddleware handles everything else
+    cached = listing_cache.get_body(listing_id, choose_encoding(request.headers.get("accept-encoding")))
+    if cached is not None:
+        return encoded_response(*cached)
     listing = db.query(Listing).options(joinedload(Listing.images)).filter(Listing.id == listing_id).first()
+    if not listing:
+        # Sold and expired listings are moved to the cold store by backend.archive
+        listing = (
+            db.query(ArchivedListing)
+            .options(selectinload(ArchivedListing.images))
+            .filter(ArchivedListing.id == listing_id)
+            .first()
+        )
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
-    return listing
+    payload = _listing_payload(listing)
+    listing_cache.put(listing_id, payload, generation)
+    return JSONResponse(payload)
 
 @router.post("/", response_model=ListingOut, status_code=201)
-def create_listing(listing: ListingCreate, db: Session = Depends(get_db)):
-    db_listing = Listing(**listing.dict())
-    db.add(db_listing)
-    db.commit()
-    db.refresh(db_listing)
+def create_listing(listing: ListingCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    signature = dedupe.listing_signature(listing.title, listing.description)
+    duplicates = dedupe.find_duplicates(db, signature) if dedupe.DUPLICATE_ACTION != "allow" else []
+    if duplicates and dedupe.DUPLICATE_ACTION == "reject":
+        raise HTTPException(status_code=409, detail=f"Listing duplicates listing {duplicates[0][0]}")
+
+    def insert_listing(session: Session) -> int:
+        db_listing = Listing(**listing.dict())
+        session.add(db_listing)
+        session.flush()
+        apply_listing_change(session, None, listing_facets(db_listing))
+        dedupe.store_signature(session, db_listing.id, signature)
+        if duplicates:
+            dedupe.flag_duplicate(session, db_listing, duplicates)
+        record_change(session, db_listing.id, "create", db_listing.status)
+        return db_listing.id
+
+    listing_id = write_unit(db, insert_listing)
+    change_notifier.notify()
+    db_listing = db.get(Listing, listing_id, populate_existing=True)
+    listing_index.sync(db_listing)
+    title_suggest.update(None, published_title(db_listing))
+    background_tasks.add_task(refresh_listing_neighbours, db.get_bind(), db_listing.id)
+    background_tasks.add_task(percolate_listing, db.get_bind(), db_listing.id)
     return db_listing
 
 @router.put("/{listing_id}", response_model=ListingOut)
-def update_listing(listing_id: int, listing: ListingUpdate, db: Session = Depends(get_db)):
-    db_listing = db.query(Listing).filter(Listing.id == listing_id).first()
-    if not db_listing:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    for key, value in listing.dict(exclude_unset=True).items():
-        setattr(db_listing, key, value)
-    db.commit()
-    db.refresh(db_listing)
+def update_listing(listing_id: int, listing: ListingUpdate, background_tasks: BackgroundTasks,
+                   db: Session = Depends(get_db)):
+    def apply_update(session: Session) -> Optional[str]:
+        db_listing = session.query(Listing).filter(Listing.id == listing_id).first()
+        if not db_listing:
+            raise HTTPException(status_code=404, detail="Listing not found")
+        old_status = db_listing.status
+        old_facets = listing_facets(db_listing)
+        old_title = published_title(db_listing)
+        old_text = (db_listing.title, db_listing.description)
+        for key, value in listing.dict(exclude_unset=True).items():
+            setattr(db_listing, key, value)
+        apply_listing_status_change(session, db_listing.user_id, old_status, db_listing.status)
+        apply_listing_change(session, old_facets, listing_facets(db_listing))
+        if (db_listing.title, db_listing.description) != old_text:
+            dedupe.store_signature(session, db_listing.id, dedupe.listing_signature(db_listing.title, db_listing.description))
+        record_change(session, db_listing.id, "update", db_listing.status)
+        return old_title
+
+    old_title = write_unit(db, apply_update)
+    change_notifier.notify()
+    listing_cache.invalidate(listing_id)
+    db_listing = db.get(Listing, listing_id, populate_existing=True)
+    listing_index.sync(db_listing)
+    title_suggest.update(old_title, published_title(db_listing))
+    background_tasks.add_task(refresh_listing_neighbours, db.get_bind(), db_listing.id)
+    background_tasks.add_task(percolate_listing, db.get_bind(), db_listing.id)
     return db_listing
 
 @router.delete("/{listing_id}", status_code=204)
@@ -84,5 +369,14 @@ def delete_listing(listing_id: int, db: Session = Depends(get_db)):
     db_listing = db.query(Listing).filter(Listing.id == listing_id).first()
     if not db_listing:
         raise HTTPException(status_code=404, detail="Listing not found")
+    old_title = published_title(db_listing)
+    apply_listing_status_change(db, db_listing.user_id, db_listing.status, None)
+    apply_listing_change(db, listing_facets(db_listing), None)
+    dedupe.drop_signature(db, listing_id)
+    record_change(db, listing_id, "delete", None)
     db.delete(db_listing)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    change_notifier.notify()
+    listing_cache.invalidate(listing_id)
+    listing_index.remove(listing_id)
+    title_suggest.update(old_title, None)
\ No newline at end of file
@@ -1,20 +1,33 @@
 from fastapi import FastAPI
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 
-from backend.models import Base
+from backend import database
+from backend.models import Base, SCHEMA_REVISION
 from backend.listings import router as listings_router
 from backend.auth import router as auth_router
 from backend.marketplace import router as marketplace_router
-
-DATABASE_URL = "sqlite:///marketplace.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
+from backend.images import router as images_router
+from backend.reports import router as reports_router
+from backend.user_stats import router as user_stats_router
+from backend.similar import router as similar_router
+from backend.saved_searches import router as saved_searches_router
+from backend.changes import router as changes_router
+from backend.listing_index import listing_index, LISTING_INDEX_ENABLED
+from backend.suggest import title_suggest, TITLE_SUGGEST_ENABLED
+from backend.listing_cache import listing_cache
+from backend.listing_stats import reconcile_listing_aggregates
+from backend.cache_bus import cache_bus, CACHE_BUS_ENABLED
+from backend.rate_limit import login_ip_limiter, login_email_limiter
+from backend.admission import AdmissionControlMiddleware, router as metrics_router
+from backend.compression import CompressionMiddleware
 
 app = FastAPI()
 
+# Innermost, so compression runs inside the request's admission slot
+app.add_middleware(CompressionMiddleware)
+# Added before CORS so shed responses still carry CORS headers
+app.add_middleware(AdmissionControlMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -27,6 +40,13 @@ app.add_middleware(
 app.include_router(listings_router)
 app.include_router(auth_router)
 app.include_router(marketplace_router)
+app.include_router(images_router)
+app.include_router(reports_router)
+app.include_router(user_stats_router)
+app.include_router(similar_router)
+app.include_router(saved_searches_router)
+app.include_router(changes_router)
+app.include_router(metrics_router)
 
 @app.get("/", response_class=HTMLResponse)
 def root():
@@ -42,4 +62,28 @@ def root():
 
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    if database.ensure_schema(database.engine, Base.metadata, SCHEMA_REVISION):
+        # listing_aggregates came from create_all, not from the migration that backfills it
+        db = database.open_session()
+        try:
+            reconcile_listing_aggregates(db, fix=True)
+        finally:
+            db.close()
+    listing_cache.clear()
+    login_ip_limiter.clear()
+    login_email_limiter.clear()
+    if CACHE_BUS_ENABLED:
+        cache_bus.start(database.engine)
+    if LISTING_INDEX_ENABLED or TITLE_SUGGEST_ENABLED:
+        db = database.open_session()
+        try:
+            if LISTING_INDEX_ENABLED:
+                listing_index.load(db)
+            if TITLE_SUGGEST_ENABLED:
+                title_suggest.load(db)
+        finally:
+            db.close()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    cache_bus.stop()
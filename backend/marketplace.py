@@ -7,6 +7,13 @@ from typing import Optional
 
 from backend.models import User, Category, Listing, ListingImage, ListingReport, Order
 from backend.database import get_db
+from backend.user_stats import apply_order_paid, apply_order_unpaid, apply_listing_status_change
+from backend.listing_stats import apply_listing_change, listing_facets
+from backend.listing_index import listing_index
+from backend.suggest import title_suggest, published_title
+from backend.changes import record_change, change_notifier
+from backend.listing_cache import listing_cache
+from backend.write_coalescer import write_unit
 
 router = APIRouter(prefix="/marketplace", tags=["marketplace"])
 
@@ -72,34 +79,68 @@ def checkout(request_data: CheckoutRequest, db: Session = Depends(get_db)):
         status='created',
         created_at=datetime.now(timezone.utc)
     )
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+
+    def insert_order(session: Session) -> int:
+        session.add(new_order)
+        session.flush()
+        return new_order.id
+
+    order_id = write_unit(db, insert_order)
 
     payment_intent_secret = str(uuid.uuid4())
 
-    return CheckoutResponse(payment_intent_secret=payment_intent_secret, order_id=new_order.id)
+    return CheckoutResponse(payment_intent_secret=payment_intent_secret, order_id=order_id)
 
 @router.post("/payments/webhook", status_code=status.HTTP_200_OK)
 def payments_webhook(request_data: PaymentWebhookRequest, db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.id == request_data.order_id).first()
-    if not order:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
-
-    if request_data.payment_status == 'succeeded':
-        order.status = 'paid'
-        if AUTO_FLIP_LISTING_TO_SOLD:
-            listing = db.query(Listing).filter(Listing.id == order.listing_id).first()
-            if listing:
-                listing.status = 'sold'
-        print(f"Simulating receipt email for order {order.id} to buyer {order.buyer_id}")
-    elif request_data.payment_status == 'failed':
-        order.status = 'canceled'
-    
-    db.commit()
-    db.refresh(order)
-
-    return {"message": f"Order {order.id} status updated to {order.status}"}
+    def apply_payment(session: Session):
+        order = session.query(Order).filter(Order.id == request_data.order_id).first()
+        if not order:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+
+        listing = None
+        old_title = None
+        if request_data.payment_status == 'succeeded':
+            if order.status != 'paid':
+                apply_order_paid(session, order)
+            order.status = 'paid'
+            if AUTO_FLIP_LISTING_TO_SOLD:
+                listing = session.query(Listing).filter(Listing.id == order.listing_id).first()
+                if listing:
+                    old_title = published_title(listing)
+                    apply_listing_status_change(session, listing.user_id, listing.status, 'sold')
+                    if listing.status != 'sold':
+                        record_change(session, listing.id, "update", 'sold')
+                    apply_listing_change(session, listing_facets(listing), None)
+                    listing.status = 'sold'
+            print(f"Simulating receipt email for order {order.id} to buyer {order.buyer_id}")
+        elif request_data.payment_status == 'failed':
+            # A failure reported after success reverses what the success counted: revenue and spend, and
+            # the sale itself, by putting the listing it flipped to sold back on sale
+            if order.status == 'paid':
+                apply_order_unpaid(session, order)
+                if AUTO_FLIP_LISTING_TO_SOLD:
+                    listing = session.query(Listing).filter(Listing.id == order.listing_id).first()
+                    if listing and listing.status == 'sold':
+                        old_title = published_title(listing)
+                        apply_listing_status_change(session, listing.user_id, 'sold', 'published')
+                        listing.status = 'published'
+                        apply_listing_change(session, None, listing_facets(listing))
+                        record_change(session, listing.id, "update", 'published')
+                    else:
+                        listing = None
+            order.status = 'canceled'
+        return order.id, order.status, listing.id if listing else None, old_title
+
+    order_id, order_status, listing_id, old_title = write_unit(db, apply_payment)
+    change_notifier.notify()
+    if listing_id is not None:
+        listing_cache.invalidate(listing_id)
+        listing = db.get(Listing, listing_id, populate_existing=True)
+        listing_index.sync(listing)
+        title_suggest.update(old_title, published_title(listing))
+
+    return {"message": f"Order {order_id} status updated to {order_status}"}
 
 @router.get("/orders", response_model=list[OrderResponse], status_code=status.HTTP_200_OK)
 def get_orders(buyer_id: int, db: Session = Depends(get_db)):
@@ -1,11 +1,14 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Text, ForeignKey, DateTime, Float
+    Column, Integer, String, Boolean, Text, ForeignKey, DateTime, Float, Index, LargeBinary, text
 )
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# The alembic head revision; startup skips DDL on a database alembic has at it. Bump it with every migration.
+SCHEMA_REVISION = '0013'
+
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -21,11 +24,12 @@ class User(Base):
     reports = relationship('ListingReport', back_populates='reporter')
     orders_bought = relationship('Order', back_populates='buyer', foreign_keys='Order.buyer_id')
     orders_sold = relationship('Order', back_populates='seller', foreign_keys='Order.seller_id')
+    stats = relationship('UserStats', uselist=False, back_populates='user')
 
 class Category(Base):
     __tablename__ = 'categories'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    parent_id = Column(Integer, ForeignKey('categories.id'), nullable=True)
+    parent_id = Column(Integer, ForeignKey('categories.id'), nullable=True, index=True)
     name = Column(String)
     slug = Column(String)
     sort_order = Column(Integer)
@@ -37,12 +41,12 @@ class Category(Base):
 class Listing(Base):
     __tablename__ = 'listings'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     title = Column(String(120), nullable=False)
     description = Column(Text, nullable=False)
     price_sek = Column(Integer, nullable=False)
     condition = Column(String)
-    category_id = Column(Integer, ForeignKey('categories.id'))
+    category_id = Column(Integer, ForeignKey('categories.id'), index=True)
     city = Column(String)
     latitude = Column(Float)
     longitude = Column(Float)
@@ -59,10 +63,19 @@ class Listing(Base):
     reports = relationship('ListingReport', back_populates='listing')
     orders = relationship('Order', back_populates='listing')
 
+    __table_args__ = (
+        # Browse and search only ever read live inventory, so their indexes skip sold/archived rows
+        Index('ix_listings_published', 'id', sqlite_where=text("status = 'published'")),
+        Index('ix_listings_published_category_price', 'category_id', 'price_sek',
+              sqlite_where=text("status = 'published'")),
+        # Ids must never be reused: archived listings keep theirs in listings_archive
+        {'sqlite_autoincrement': True},
+    )
+
 class ListingImage(Base):
     __tablename__ = 'listing_images'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    listing_id = Column(Integer, ForeignKey('listings.id'))
+    listing_id = Column(Integer, ForeignKey('listings.id'), index=True)
     url_full = Column(String)
     url_card = Column(String)
     url_thumb = Column(String)
@@ -74,8 +87,8 @@ class ListingImage(Base):
 class ListingReport(Base):
     __tablename__ = 'listing_reports'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    listing_id = Column(Integer, ForeignKey('listings.id'))
-    reporter_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    listing_id = Column(Integer, ForeignKey('listings.id'), index=True)
+    reporter_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
     reason_code = Column(String)
     note = Column(String)
     created_at = Column(DateTime, server_default=func.now())
@@ -83,12 +96,156 @@ class ListingReport(Base):
     listing = relationship('Listing', back_populates='reports')
     reporter = relationship('User', back_populates='reports')
 
+    __table_args__ = (
+        # A signed-in user reports a listing once; SQLite lets anonymous (NULL) reporters repeat
+        Index('ux_listing_reports_listing_reporter', 'listing_id', 'reporter_id', unique=True),
+    )
+
+# Cold store for sold/expired listings, filled in batches by backend.archive
+class ArchivedListing(Base):
+    __tablename__ = 'listings_archive'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    title = Column(String(120), nullable=False)
+    description = Column(Text, nullable=False)
+    price_sek = Column(Integer, nullable=False)
+    condition = Column(String)
+    category_id = Column(Integer, ForeignKey('categories.id'))
+    city = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    status = Column(String)
+    slug = Column(String)
+    canonical_url = Column(String)
+    published_at = Column(DateTime)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, server_default=func.now())
+
+    images = relationship('ArchivedListingImage', back_populates='listing')
+
+class ArchivedListingImage(Base):
+    __tablename__ = 'listing_images_archive'
+    id = Column(Integer, primary_key=True)
+    listing_id = Column(Integer, ForeignKey('listings_archive.id'), index=True)
+    url_full = Column(String)
+    url_card = Column(String)
+    url_thumb = Column(String)
+    blurhash = Column(String)
+    sort_order = Column(Integer)
+
+    listing = relationship('ArchivedListing', back_populates='images')
+
+class ArchivedListingReport(Base):
+    __tablename__ = 'listing_reports_archive'
+    id = Column(Integer, primary_key=True)
+    listing_id = Column(Integer, ForeignKey('listings_archive.id'), index=True)
+    reporter_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
+    reason_code = Column(String)
+    note = Column(String)
+    created_at = Column(DateTime)
+
+# Materialized report counters, maintained in the same transaction as each ListingReport insert
+class ListingReportCount(Base):
+    __tablename__ = 'listing_report_counts'
+    listing_id = Column(Integer, ForeignKey('listings.id'), primary_key=True)
+    reason_code = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class ListingReportSummary(Base):
+    __tablename__ = 'listing_report_summaries'
+    listing_id = Column(Integer, ForeignKey('listings.id'), primary_key=True)
+    report_count = Column(Integer, nullable=False, default=0)
+    score = Column(Integer, nullable=False, default=0)
+    # The part of score from signed-in reporters; only this can auto-hide a listing
+    hide_score = Column(Integer, nullable=False, default=0, server_default='0')
+    last_reported_at = Column(DateTime)
+    auto_hidden_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_listing_report_summaries_score', 'score', 'listing_id'),
+    )
+
+# Precomputed "similar listings", rebuilt by backend.similar and topped up as listings are created
+class ListingSimilar(Base):
+    __tablename__ = 'listing_similar'
+    listing_id = Column(Integer, primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    neighbor_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+
+# MinHash signatures and their LSH band buckets, see backend.dedupe
+class ListingSignature(Base):
+    __tablename__ = 'listing_signatures'
+    listing_id = Column(Integer, primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class ListingLshBucket(Base):
+    __tablename__ = 'listing_lsh_buckets'
+    band = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    listing_id = Column(Integer, primary_key=True)
+
+    __table_args__ = (
+        # Lets an edit or delete drop a listing's buckets without scanning
+        Index('ix_listing_lsh_buckets_listing_id', 'listing_id'),
+    )
+
+# Saved searches are matched against new listings through their anchors, see backend.saved_searches
+class SavedSearch(Base):
+    __tablename__ = 'saved_searches'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    name = Column(String)
+    keywords = Column(String)
+    category_id = Column(Integer, ForeignKey('categories.id'))
+    min_price = Column(Integer)
+    max_price = Column(Integer)
+    city = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    radius_km = Column(Float)
+    created_at = Column(DateTime, server_default=func.now())
+
+class SavedSearchAnchor(Base):
+    __tablename__ = 'saved_search_anchors'
+    kind = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    search_id = Column(Integer, ForeignKey('saved_searches.id'), primary_key=True, index=True)
+
+class SavedSearchAlert(Base):
+    __tablename__ = 'saved_search_alerts'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    search_id = Column(Integer, ForeignKey('saved_searches.id'), nullable=False)
+    listing_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    seen_at = Column(DateTime)
+
+    __table_args__ = (
+        # One alert per search and listing, however often the listing is edited
+        Index('ux_saved_search_alerts_search_listing', 'search_id', 'listing_id', unique=True),
+        Index('ix_saved_search_alerts_user_id', 'user_id', 'id'),
+    )
+
+# Append-only log of listing writes, read by consumers through GET /changes, see backend.changes
+class ListingChange(Base):
+    __tablename__ = 'listing_changes'
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    listing_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    status = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+
+    # Pruned sequence numbers must never be handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
+
 class Order(Base):
     __tablename__ = 'orders'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    buyer_id = Column(Integer, ForeignKey('users.id'))
-    seller_id = Column(Integer, ForeignKey('users.id'))
-    listing_id = Column(Integer, ForeignKey('listings.id'))
+    buyer_id = Column(Integer, ForeignKey('users.id'), index=True)
+    seller_id = Column(Integer, ForeignKey('users.id'), index=True)
+    listing_id = Column(Integer, ForeignKey('listings.id'), index=True)
     amount_sek = Column(Integer)
     delivery_type = Column(String)
     delivery_address_line1 = Column(String)
@@ -101,3 +258,60 @@ class Order(Base):
     buyer = relationship('User', back_populates='orders_bought', foreign_keys=[buyer_id])
     seller = relationship('User', back_populates='orders_sold', foreign_keys=[seller_id])
     listing = relationship('Listing', back_populates='orders')
+    # Set instead of listing once backend.archive has moved a sold listing to the cold table
+    archived_listing = relationship('ArchivedListing', primaryjoin='foreign(Order.listing_id) == ArchivedListing.id',
+                                    viewonly=True)
+
+    @property
+    def listed_item(self):
+        """The ordered listing, from the hot table or the archive."""
+        return self.listing if self.listing is not None else self.archived_listing
+
+
+# Incrementally maintained profile counters, see backend.user_stats
+class UserStats(Base):
+    __tablename__ = 'user_stats'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    member_since = Column(DateTime)
+    items_sold = Column(Integer, nullable=False, default=0)
+    revenue_sek = Column(Integer, nullable=False, default=0)
+    items_bought = Column(Integer, nullable=False, default=0)
+    spent_sek = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    user = relationship('User', back_populates='stats')
+
+# Token buckets shared by all workers when backend.rate_limit uses the sqlite backend
+class RateLimitBucket(Base):
+    __tablename__ = 'rate_limit_buckets'
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Unix time of the last take; monotonic clocks are not shared between processes
+    updated_at = Column(Float, nullable=False, index=True)
+    # Outcome of the last take, read back through RETURNING
+    allowed = Column(Boolean, nullable=False)
+
+# Cross-worker cache invalidations, polled by every worker, see backend.cache_bus
+class CacheInvalidation(Base):
+    __tablename__ = 'cache_invalidations'
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    namespace = Column(String, nullable=False)
+    # None invalidates the whole namespace
+    key = Column(String)
+    created_at = Column(Float, nullable=False, index=True)
+
+    # A gap after a worker's cursor must mean pruned messages, never reused numbers
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Price histograms of published listings per category, city and condition, see backend.listing_stats
+class ListingAggregate(Base):
+    __tablename__ = 'listing_aggregates'
+    # "all" (value ""), "category", "city" or "condition"
+    dimension = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    # Index into listing_stats.PRICE_BUCKETS
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    # Price range of the bucket's listings; meaningless once count drops to 0
+    price_min = Column(Integer, nullable=False)
+    price_max = Column(Integer, nullable=False)
@@ -0,0 +1,116 @@
+import argparse
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.models import RateLimitBucket
+
+RATE_LIMIT_ENABLED = True
+# "memory": buckets per process; "sqlite": one set of buckets in rate_limit_buckets, shared by all workers
+RATE_LIMIT_BACKEND = "memory"
+# (burst, tokens refilled per second)
+LOGIN_IP_LIMIT = (20, 10 / 60)
+LOGIN_EMAIL_LIMIT = (5, 1 / 60)
+# Keys kept per in-memory limiter; least recently used go first, and an evicted bucket restarts full
+RATE_LIMIT_MAX_KEYS = 100_000
+
+class TokenBucketLimiter:
+    """Token bucket per key: each attempt takes a token, tokens refill at rate per second up to burst."""
+
+    def __init__(self, name: str, burst: int, rate: float, max_keys: int = RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.name = name
+        self.burst = burst
+        self.rate = rate
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (tokens, last update)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key: str, db: Optional[Session] = None) -> float:
+        """Take a token for key. Returns 0 when allowed, otherwise the seconds until the next token."""
+        if RATE_LIMIT_BACKEND == "sqlite" and db is not None:
+            return self._take_shared(db, key)
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def _take_shared(self, db: Session, key: str) -> float:
+        # Refill and take in one statement, so concurrent workers never both spend the last token
+        now = time.time()
+        refilled = func.min(self.burst, RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * self.rate)
+        stmt = (
+            sqlite_insert(RateLimitBucket)
+            .values(key=f"{self.name}:{key}", tokens=self.burst - 1, updated_at=now, allowed=True)
+            .on_conflict_do_update(
+                index_elements=[RateLimitBucket.key],
+                set_={
+                    "tokens": case((refilled >= 1, refilled - 1), else_=refilled),
+                    "updated_at": now,
+                    "allowed": refilled >= 1,
+                },
+            )
+            .returning(RateLimitBucket.tokens, RateLimitBucket.allowed)
+        )
+        tokens, allowed = db.execute(stmt).one()
+        db.commit()
+        return 0.0 if allowed else (1 - tokens) / self.rate
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+login_ip_limiter = TokenBucketLimiter("login_ip", *LOGIN_IP_LIMIT)
+login_email_limiter = TokenBucketLimiter("login_email", *LOGIN_EMAIL_LIMIT)
+
+def check_login_rate(ip: str, email: str, db: Optional[Session] = None) -> None:
+    """Raise 429 with Retry-After when this IP or this email has used up its login attempts."""
+    if not RATE_LIMIT_ENABLED:
+        return
+    for limiter, key in ((login_ip_limiter, ip), (login_email_limiter, email.casefold())):
+        wait = limiter.take(key, db)
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many login attempts, try again later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+def prune_shared_buckets(db: Session) -> int:
+    """Delete shared buckets idle long enough to have refilled; a missing bucket counts as full."""
+    idle = max(limiter.burst / limiter.rate for limiter in (login_ip_limiter, login_email_limiter))
+    deleted = db.execute(delete(RateLimitBucket).where(RateLimitBucket.updated_at < time.time() - idle)).rowcount
+    db.commit()
+    return deleted
+
+def main():
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Delete idle rows from the shared rate limit buckets.")
+    parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        deleted = prune_shared_buckets(db)
+    finally:
+        db.close()
+    print(f"Pruned {deleted} bucket(s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from pydantic import BaseModel, Field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from backend.models import Listing, ListingReport, ListingReportCount, ListingReportSummary
+from backend.database import get_db
+from backend.listing_index import listing_index
+from backend.suggest import title_suggest, published_title
+from backend.changes import record_change, change_notifier
+from backend.listing_cache import listing_cache
+from backend.listing_stats import apply_listing_change, listing_facets
+from backend.sharding import router_for
+
+router = APIRouter(tags=["reports"])
+
+# Score added to a listing per report, by reason code. Unknown codes are rejected.
+REPORT_REASON_WEIGHTS = {
+    "scam": 3,
+    "prohibited": 3,
+    "offensive": 2,
+    "counterfeit": 2,
+    "duplicate": 1,
+    "wrong_category": 1,
+    "other": 1,
+}
+# A published listing is hidden as soon as the score from signed-in reporters reaches this value.
+# Anonymous reports still rank the moderation queue but never hide a listing on their own.
+REPORT_AUTO_HIDE_THRESHOLD = 6
+HIDDEN_STATUS = "hidden"
+MODERATION_PAGE_SIZE = 50
+MAX_MODERATION_PAGE_SIZE = 200
+
+class ReportCreate(BaseModel):
+    reason_code: str
+    reporter_id: Optional[int] = None
+    note: Optional[str] = Field(None, max_length=1000)
+
+class ReportOut(BaseModel):
+    id: int
+    listing_id: int
+    reason_code: str
+    report_count: int
+    score: int
+    listing_status: Optional[str]
+
+class ModerationQueueItem(BaseModel):
+    listing_id: int
+    title: str
+    listing_status: Optional[str]
+    report_count: int
+    score: int
+    counts: Dict[str, int]
+    last_reported_at: Optional[datetime] = None
+    auto_hidden_at: Optional[datetime] = None
+
+def record_report(db: Session, listing: Listing, reason_code: str, reporter_id: Optional[int] = None,
+                  note: Optional[str] = None) -> ListingReport:
+    """Insert a report and bump the listing's counters without committing.
+
+    Raises IntegrityError, before any counter moves, if reporter_id has already reported the listing.
+    """
+    now = datetime.now(timezone.utc)
+    weight = REPORT_REASON_WEIGHTS[reason_code]
+    hide_weight = weight if reporter_id is not None else 0
+    report = ListingReport(listing_id=listing.id, reporter_id=reporter_id, reason_code=reason_code, note=note)
+    db.add(report)
+    db.flush()
+    db.execute(
+        sqlite_insert(ListingReportCount)
+        .values(listing_id=listing.id, reason_code=reason_code, count=1)
+        .on_conflict_do_update(
+            index_elements=[ListingReportCount.listing_id, ListingReportCount.reason_code],
+            set_={"count": ListingReportCount.count + 1},
+        )
+    )
+    summary_stmt = sqlite_insert(ListingReportSummary).values(
+        listing_id=listing.id, report_count=1, score=weight, hide_score=hide_weight, last_reported_at=now
+    )
+    hide_score = db.execute(
+        summary_stmt.on_conflict_do_update(
+            index_elements=[ListingReportSummary.listing_id],
+            set_={
+                "report_count": ListingReportSummary.report_count + 1,
+                "score": ListingReportSummary.score + weight,
+                "hide_score": ListingReportSummary.hide_score + hide_weight,
+                "last_reported_at": now,
+            },
+        ).returning(ListingReportSummary.hide_score)
+    ).scalar_one()
+    if hide_score >= REPORT_AUTO_HIDE_THRESHOLD and listing.status == "published":
+        apply_listing_change(db, listing_facets(listing), None)
+        listing.status = HIDDEN_STATUS
+        record_change(db, listing.id, "update", HIDDEN_STATUS)
+        db.query(ListingReportSummary).filter(ListingReportSummary.listing_id == listing.id).update(
+            {"auto_hidden_at": now}, synchronize_session=False
+        )
+    db.flush()
+    return report
+
+@router.post("/listings/{listing_id}/reports", response_model=ReportOut, status_code=status.HTTP_201_CREATED)
+def create_report(listing_id: int, data: ReportCreate, db: Session = Depends(get_db)):
+    if data.reason_code not in REPORT_REASON_WEIGHTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown reason code")
+    listing = db.query(Listing).filter(Listing.id == listing_id).first()
+    if not listing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Listing not found")
+
+    old_title = published_title(listing)
+    try:
+        report = record_report(db, listing, data.reason_code, data.reporter_id, data.note)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You have already reported this listing")
+    db.commit()
+    change_notifier.notify()
+    listing_cache.invalidate(listing_id)
+    listing_index.sync(listing)
+    title_suggest.update(old_title, published_title(listing))
+
+    summary = db.get(ListingReportSummary, listing_id, populate_existing=True)
+    return ReportOut(
+        id=report.id,
+        listing_id=listing_id,
+        reason_code=report.reason_code,
+        report_count=summary.report_count,
+        score=summary.score,
+        listing_status=listing.status,
+    )
+
+@router.get("/moderation/queue", response_model=List[ModerationQueueItem])
+def moderation_queue(limit: int = Query(MODERATION_PAGE_SIZE, ge=1, le=MAX_MODERATION_PAGE_SIZE), min_score: int = 1,
+                     before_score: Optional[int] = None, before_id: Optional[int] = None, db: Session = Depends(get_db)):
+    # Walks ix_listing_report_summaries_score backwards; only the page's counters are loaded.
+    # The next page starts after the last item's (score, listing_id).
+    if (before_score is None) != (before_id is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="before_score and before_id must be given together")
+
+    def page(session: Session) -> list:
+        query = (
+            session.query(ListingReportSummary, Listing.title, Listing.status)
+            .join(Listing, Listing.id == ListingReportSummary.listing_id)
+            .filter(ListingReportSummary.score >= min_score)
+        )
+        if before_score is not None:
+            query = query.filter(or_(
+                ListingReportSummary.score < before_score,
+                and_(ListingReportSummary.score == before_score, ListingReportSummary.listing_id < before_id),
+            ))
+        return (
+            query.order_by(ListingReportSummary.score.desc(), ListingReportSummary.listing_id.desc())
+            .limit(limit)
+            .all()
+        )
+
+    shard_router = router_for(db)
+    if shard_router is not None:
+        # Summaries live with their listing; each shard's page is merged into the global one
+        rows = shard_router.scatter_gather(page, key=lambda row: (-row[0].score, -row[0].listing_id), limit=limit)
+    else:
+        rows = page(db)
+    listing_ids = [summary.listing_id for summary, _, _ in rows]
+    counts: Dict[int, Dict[str, int]] = {listing_id: {} for listing_id in listing_ids}
+    if listing_ids:
+        for row in db.query(ListingReportCount).filter(ListingReportCount.listing_id.in_(listing_ids)):
+            counts[row.listing_id][row.reason_code] = row.count
+
+    return [
+        ModerationQueueItem(
+            listing_id=summary.listing_id,
+            title=title,
+            listing_status=listing_status,
+            report_count=summary.report_count,
+            score=summary.score,
+            counts=counts[summary.listing_id],
+            last_reported_at=summary.last_reported_at,
+            auto_hidden_at=summary.auto_hidden_at,
+        )
+        for summary, title, listing_status in rows
+    ]
@@ -0,0 +1,220 @@
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.models import User, Listing, SavedSearch, SavedSearchAnchor, SavedSearchAlert
+from backend.database import get_db
+from backend.listing_index import KM_PER_DEGREE, squared_distance_km
+from backend.sharding import router_for, session_on
+from backend.suggest import TERM_RE, title_terms
+
+router = APIRouter(prefix="/saved-searches", tags=["saved-searches"])
+
+# Grid used to anchor radius searches; a listing probes the one cell it falls in
+GEO_CELL_DEGREES = 0.1
+# Radius searches covering more cells than this are anchored on "all" instead
+MAX_GEO_CELLS = 100
+ALERTS_PAGE_SIZE = 50
+MAX_ALERTS_PAGE_SIZE = 200
+
+class SavedSearchCreate(BaseModel):
+    user_id: int
+    name: Optional[str] = Field(None, max_length=120)
+    keywords: Optional[str] = Field(None, max_length=200)
+    category_id: Optional[int] = None
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    city: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    radius_km: Optional[float] = Field(None, gt=0)
+
+class SavedSearchOut(SavedSearchCreate):
+    id: int
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class AlertOut(BaseModel):
+    id: int
+    search_id: int
+    search_name: Optional[str]
+    listing_id: int
+    title: Optional[str]
+    price_sek: Optional[int]
+    created_at: Optional[datetime] = None
+    seen_at: Optional[datetime] = None
+
+def _keyword_terms(keywords: Optional[str]) -> List[str]:
+    terms = []
+    for term in TERM_RE.findall((keywords or "").casefold()):
+        if len(term) >= 2 and term not in terms:
+            terms.append(term)
+    return terms
+
+def _geo_cell(latitude: float, longitude: float) -> str:
+    return f"{math.floor(latitude / GEO_CELL_DEGREES)}:{math.floor(longitude / GEO_CELL_DEGREES)}"
+
+def _geo_cells(latitude: float, longitude: float, radius_km: float) -> Optional[List[str]]:
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    lat_range = range(math.floor((latitude - dlat) / GEO_CELL_DEGREES), math.floor((latitude + dlat) / GEO_CELL_DEGREES) + 1)
+    lon_range = range(math.floor((longitude - dlon) / GEO_CELL_DEGREES), math.floor((longitude + dlon) / GEO_CELL_DEGREES) + 1)
+    if len(lat_range) * len(lon_range) > MAX_GEO_CELLS:
+        return None
+    return [f"{lat}:{lon}" for lat in lat_range for lon in lon_range]
+
+def search_anchors(search: SavedSearch) -> List[Tuple[str, str]]:
+    """The (kind, value) keys a search is filed under: its most selective predicate only.
+
+    A listing can only match if it has that key, so percolating a listing reads the searches
+    filed under the listing's keys instead of every saved search.
+    """
+    terms = _keyword_terms(search.keywords)
+    if terms:
+        # Longer words are rarer words; any one of them must be present for a match
+        return [("kw", max(terms, key=len))]
+    if search.radius_km is not None:
+        cells = _geo_cells(search.latitude, search.longitude, search.radius_km)
+        if cells is not None:
+            return [("geo", cell) for cell in cells]
+    if search.city:
+        return [("city", search.city.casefold())]
+    if search.category_id is not None:
+        return [("cat", str(search.category_id))]
+    return [("all", "")]
+
+def listing_keys(listing: Listing, terms: set) -> Dict[str, List[str]]:
+    keys = {"kw": sorted(terms), "all": [""]}
+    if listing.category_id is not None:
+        keys["cat"] = [str(listing.category_id)]
+    if listing.city:
+        keys["city"] = [listing.city.casefold()]
+    if listing.latitude is not None and listing.longitude is not None:
+        keys["geo"] = [_geo_cell(listing.latitude, listing.longitude)]
+    return keys
+
+def search_matches(search: SavedSearch, listing: Listing, terms: set) -> bool:
+    if search.category_id is not None and listing.category_id != search.category_id:
+        return False
+    if search.min_price is not None and listing.price_sek < search.min_price:
+        return False
+    if search.max_price is not None and listing.price_sek > search.max_price:
+        return False
+    if search.city and (listing.city or "").casefold() != search.city.casefold():
+        return False
+    if search.radius_km is not None:
+        if listing.latitude is None or listing.longitude is None:
+            return False
+        distance = squared_distance_km(listing.latitude, listing.longitude, search.latitude, search.longitude)
+        if distance > search.radius_km * search.radius_km:
+            return False
+    return all(term in terms for term in _keyword_terms(search.keywords))
+
+def percolate_listing(bind, listing_id: int) -> int:
+    """Record alerts for saved searches matching a published listing; runs as a background task.
+
+    Returns the number of new alerts. Searches already alerted for this listing are skipped.
+    """
+    with session_on(bind) as db:
+        listing = db.get(Listing, listing_id)
+        if listing is None or listing.status != "published":
+            return 0
+        terms = title_terms(listing.title) | title_terms(listing.description)
+        probes = [
+            and_(SavedSearchAnchor.kind == kind, SavedSearchAnchor.value.in_(values))
+            for kind, values in listing_keys(listing, terms).items() if values
+        ]
+        candidates = select(SavedSearchAnchor.search_id).where(or_(*probes)).distinct()
+        searches = db.query(SavedSearch).filter(SavedSearch.id.in_(candidates.scalar_subquery())).all()
+        matched = [
+            search for search in searches
+            if search.user_id != listing.user_id and search_matches(search, listing, terms)
+        ]
+        if not matched:
+            return 0
+        created = db.execute(
+            sqlite_insert(SavedSearchAlert)
+            .values([{"user_id": search.user_id, "search_id": search.id, "listing_id": listing.id} for search in matched])
+            .on_conflict_do_nothing(index_elements=[SavedSearchAlert.search_id, SavedSearchAlert.listing_id])
+            .returning(SavedSearchAlert.user_id)
+        ).scalars().all()
+        db.commit()
+        for user_id in created:
+            print(f"Simulating saved-search alert for listing {listing.id} to user {user_id}")
+        return len(created)
+
+@router.post("/", response_model=SavedSearchOut, status_code=status.HTTP_201_CREATED)
+def create_saved_search(data: SavedSearchCreate, db: Session = Depends(get_db)):
+    if data.radius_km is not None and (data.latitude is None or data.longitude is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="latitude and longitude are required with radius_km")
+    values = data.dict()
+    values["keywords"] = " ".join(_keyword_terms(data.keywords)) or None
+    filters = ("keywords", "category_id", "min_price", "max_price", "city", "radius_km")
+    if all(values[field] is None for field in filters):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A saved search needs at least one filter")
+    if not db.get(User, data.user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    search = SavedSearch(**values)
+    db.add(search)
+    db.flush()
+    db.add_all([SavedSearchAnchor(kind=kind, value=value, search_id=search.id) for kind, value in search_anchors(search)])
+    db.commit()
+    db.refresh(search)
+    return search
+
+@router.get("/", response_model=List[SavedSearchOut])
+def list_saved_searches(user_id: int, db: Session = Depends(get_db)):
+    return db.query(SavedSearch).filter(SavedSearch.user_id == user_id).order_by(SavedSearch.id).all()
+
+@router.get("/alerts", response_model=List[AlertOut])
+def list_alerts(user_id: int, before_id: Optional[int] = None,
+                limit: int = Query(ALERTS_PAGE_SIZE, ge=1, le=MAX_ALERTS_PAGE_SIZE), db: Session = Depends(get_db)):
+    query = (
+        db.query(SavedSearchAlert, SavedSearch.name, Listing.title, Listing.price_sek)
+        .join(SavedSearch, SavedSearch.id == SavedSearchAlert.search_id)
+        .outerjoin(Listing, Listing.id == SavedSearchAlert.listing_id)
+        .filter(SavedSearchAlert.user_id == user_id)
+    )
+    if before_id is not None:
+        query = query.filter(SavedSearchAlert.id < before_id)
+    rows = query.order_by(SavedSearchAlert.id.desc()).limit(limit).all()
+    if router_for(db) is not None and rows:
+        # The join only sees listings stored in the main database; the others are looked up by id
+        listings = {
+            listing_id: (title, price_sek) for listing_id, title, price_sek in
+            db.query(Listing.id, Listing.title, Listing.price_sek)
+            .filter(Listing.id.in_({alert.listing_id for alert, _, _, _ in rows}))
+        }
+        rows = [(alert, name, *listings.get(alert.listing_id, (None, None))) for alert, name, _, _ in rows]
+    return [
+        AlertOut(
+            id=alert.id,
+            search_id=alert.search_id,
+            search_name=name,
+            listing_id=alert.listing_id,
+            title=title,
+            price_sek=price_sek,
+            created_at=alert.created_at,
+            seen_at=alert.seen_at,
+        )
+        for alert, name, title, price_sek in rows
+    ]
+
+@router.delete("/{search_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_saved_search(search_id: int, db: Session = Depends(get_db)):
+    search = db.get(SavedSearch, search_id)
+    if not search:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Saved search not found")
+    db.execute(delete(SavedSearchAnchor).where(SavedSearchAnchor.search_id == search_id))
+    db.execute(delete(SavedSearchAlert).where(SavedSearchAlert.search_id == search_id))
+    db.delete(search)
+    db.commit()
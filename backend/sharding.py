@@ -0,0 +1,239 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+from backend import database
+from backend.models import Base, Listing, ArchivedListing
+
+SHARDING_ENABLED = False
+# One SQLite file per region next to marketplace.db; created on first use
+SHARD_DIR = Path(__file__).resolve().parent / "shards"
+MAIN_SHARD = "main"
+# A listing and every row that belongs to it live on the listing's shard, so joins between them stay on one
+# file; everything else stays in the main database. listing_similar rows belong to the listing whose list they are.
+SHARDED_TABLES = (
+    "listings", "listing_images", "listing_reports", "listing_report_counts", "listing_report_summaries",
+    "listing_signatures", "listing_lsh_buckets", "listing_similar", "listings_archive", "listing_images_archive",
+    "listing_reports_archive",
+)
+# Tables keyed by the listing id itself; the rest of SHARDED_TABLES carry it in listing_id
+LISTING_ID_TABLES = ("listings", "listings_archive")
+# Append only: a region's position is part of the ids of the listings stored on it
+SHARD_REGIONS = {
+    "south": ("malmö", "lund", "helsingborg", "landskrona", "trelleborg", "ystad", "kristianstad", "karlskrona",
+              "kalmar", "växjö", "jönköping"),
+    "west": ("göteborg", "gothenburg", "borås", "kungsbacka", "varberg", "halmstad", "trollhättan", "uddevalla",
+             "skövde", "karlstad"),
+    "east": ("stockholm", "uppsala", "södertälje", "västerås", "eskilstuna", "örebro", "nyköping", "norrköping",
+             "linköping"),
+    "north": ("gävle", "falun", "sundsvall", "östersund", "örnsköldsvik", "umeå", "skellefteå", "luleå", "kiruna"),
+}
+CITY_REGIONS = {city: region for region, cities in SHARD_REGIONS.items() for city in cities}
+# Listings with neither a known city nor coordinates
+DEFAULT_REGION = "east"
+# Each shard hands out listing ids from its own range: ids up to SHARD_ID_SPAN are the main database's,
+# region n (1-based) gets n * SHARD_ID_SPAN + 1 onwards. Well inside 2**53, so ids stay exact in JavaScript.
+SHARD_ID_SPAN = 10 ** 12
+
+_scatter_pool = ThreadPoolExecutor(max_workers=len(SHARD_REGIONS) + 1, thread_name_prefix="shard-scatter")
+
+def region_for(city: Optional[str], latitude: Optional[float] = None, longitude: Optional[float] = None) -> str:
+    """The region a new listing is stored in: by city, else by coordinates, else DEFAULT_REGION."""
+    region = CITY_REGIONS.get((city or "").strip().casefold())
+    if region is not None:
+        return region
+    if latitude is not None and longitude is not None:
+        if latitude >= 60.5:
+            return "north"
+        if latitude < 57.0:
+            return "south"
+        return "west" if longitude < 14.5 else "east"
+    return DEFAULT_REGION
+
+def shard_for_id(listing_id: int) -> str:
+    """The shard a listing id was allocated on; a listing never moves, even if its city changes."""
+    names = (MAIN_SHARD, *SHARD_REGIONS)
+    index = (listing_id - 1) // SHARD_ID_SPAN
+    return names[index] if 0 < index < len(names) else MAIN_SHARD
+
+def _conjuncts(clause) -> list:
+    if clause is None:
+        return []
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        return [item for part in clause.clauses for item in _conjuncts(part)]
+    return [clause]
+
+def _listing_key(table) -> str:
+    return "id" if table.name in LISTING_ID_TABLES else "listing_id"
+
+def _inserted_listing_ids(statement) -> Optional[Set[int]]:
+    # Only single-statement VALUES name their listing; INSERT ... SELECT runs wherever its SELECT's rows are
+    key = _listing_key(statement.table)
+    rows = statement._multi_values[0] if statement._multi_values else [statement._values or {}]
+    ids = set()
+    for row in rows:
+        for column, value in row.items():
+            if getattr(column, "key", column) == key:
+                ids.add(value.effective_value if isinstance(value, BindParameter) else value)
+    return ids or None
+
+def listing_ids_in(statement, parameters=None) -> Optional[Set[int]]:
+    """The listing ids a statement's WHERE (or an INSERT's VALUES) pins it to, or None if it may touch any listing.
+
+    Only top-level AND terms comparing a sharded table's listing id column with = or IN count;
+    anything under an OR could match other listings too. parameters are the execute-time values,
+    which is how Session.get binds the primary key.
+    """
+    if getattr(statement, "is_insert", False):
+        return _inserted_listing_ids(statement) if statement.table.name in SHARDED_TABLES else None
+    ids = None
+    for clause in _conjuncts(getattr(statement, "whereclause", None)):
+        if not isinstance(clause, BinaryExpression):
+            continue
+        # Lazy loads compare with the parameter on the left
+        column, bind = (clause.right, clause.left) if isinstance(clause.left, BindParameter) else (clause.left, clause.right)
+        if not isinstance(bind, BindParameter):
+            continue
+        table = getattr(column, "table", None)
+        if table is None or table.name not in SHARDED_TABLES or column.key != _listing_key(table):
+            continue
+        value = bind.effective_value
+        if isinstance(parameters, dict):
+            value = parameters.get(bind.key, value)
+        if clause.operator is operators.eq:
+            found = {value}
+        elif clause.operator is operators.in_op:
+            found = set(value)
+        else:
+            continue
+        ids = found if ids is None else ids & found
+    return ids
+
+def _prepare_shard(engine, index: int) -> None:
+    # Shards are not alembic-managed; they hold only the sharded tables, created from the models
+    Base.metadata.create_all(bind=engine, tables=[Base.metadata.tables[name] for name in SHARDED_TABLES])
+    with engine.begin() as connection:
+        # AUTOINCREMENT continues from here and never reuses ids, so the shard stays inside its range
+        connection.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) SELECT 'listings', :start "
+                 "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'listings')"),
+            {"start": index * SHARD_ID_SPAN},
+        )
+
+class RegionShardedSession(ShardedSession):
+    def get_bind(self, mapper=None, *, shard_id=None, instance=None, clause=None, **kw):
+        # Callers asking for the session's bind without naming a table (background tasks, the write
+        # coalescer) get the main database, which holds everything but listing storage
+        if shard_id is None and mapper is None and instance is None:
+            shard_id = MAIN_SHARD
+        return super().get_bind(mapper, shard_id=shard_id, instance=instance, clause=clause, **kw)
+
+class ShardRouter:
+    """The main database plus one SQLite file per region, and the rules routing each statement to them.
+
+    New listings go to their region's shard and get an id from that shard's range, so the id alone
+    finds the listing later. Statements pinned to listing ids go to those shards only; other listing
+    queries run on every shard. Tables outside SHARDED_TABLES always use the main database.
+    """
+
+    def __init__(self, main_engine, shard_dir: Path = SHARD_DIR):
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        _routers[main_engine] = self
+        self.engines = {MAIN_SHARD: main_engine}
+        for index, region in enumerate(SHARD_REGIONS, start=1):
+            engine = create_engine(f"sqlite:///{shard_dir / f'listings-{region}.db'}",
+                                   connect_args={"check_same_thread": False})
+            _prepare_shard(engine, index)
+            self.engines[region] = engine
+        self.session = sessionmaker(
+            class_=RegionShardedSession, autoflush=False, shards=self.engines, shard_chooser=self.choose_shard,
+            identity_chooser=self.identity_shards, execute_chooser=self.query_shards, info={"shard_router": self},
+        )
+
+    def choose_shard(self, mapper, instance, clause=None) -> str:
+        if mapper is None or mapper.local_table.name not in SHARDED_TABLES:
+            return MAIN_SHARD
+        if isinstance(instance, Listing) and instance.id is None:
+            return region_for(instance.city, instance.latitude, instance.longitude)
+        if isinstance(instance, (Listing, ArchivedListing)):
+            return shard_for_id(instance.id)
+        if instance is not None and instance.listing_id is not None:
+            return shard_for_id(instance.listing_id)
+        return MAIN_SHARD
+
+    def identity_shards(self, mapper, primary_key, **kw) -> List[str]:
+        if mapper.local_table.name in LISTING_ID_TABLES:
+            return [shard_for_id(primary_key[0])]
+        if mapper.local_table.name in SHARDED_TABLES:
+            return list(self.engines)
+        return [MAIN_SHARD]
+
+    def query_shards(self, orm_context) -> List[str]:
+        mapper = orm_context.bind_mapper
+        if mapper is None or mapper.local_table.name not in SHARDED_TABLES:
+            return [MAIN_SHARD]
+        ids = listing_ids_in(orm_context.statement, orm_context.parameters)
+        if ids is None:
+            return list(self.engines)
+        shards = {shard_for_id(listing_id) for listing_id in ids if listing_id is not None}
+        if orm_context.is_insert and len(shards) > 1:
+            # Every shard would get every row
+            raise ValueError("An insert into a sharded table must stay on one shard; use insert_rows")
+        return [name for name in self.engines if name in shards] or [MAIN_SHARD]
+
+    def scatter_gather(self, run: Callable[[Session], list], key: Callable, limit: int) -> list:
+        """Run a query on every shard in parallel and merge the first limit results.
+
+        Each shard's result must already be sorted by key, as a query ordered the same way and
+        limited to limit rows is; the merge then only walks the heads of the lists.
+        """
+        def on_shard(engine) -> list:
+            with Session(bind=engine) as session:
+                return run(session)
+
+        results = list(_scatter_pool.map(on_shard, self.engines.values()))
+        return list(islice(heapq.merge(*results, key=key), limit))
+
+_router: Optional[ShardRouter] = None
+# Each router by its main engine, for code that was handed a bind rather than a session
+_routers: Dict[object, ShardRouter] = {}
+
+def get_router() -> ShardRouter:
+    global _router
+    if _router is None:
+        _router = ShardRouter(database.engine)
+    return _router
+
+def router_for(db: Session) -> Optional[ShardRouter]:
+    """The router behind a session from ShardRouter.session, or None for an unsharded session."""
+    return db.info.get("shard_router")
+
+def session_on(bind) -> Session:
+    """A new session on bind, routed over the shards when bind is a router's main database.
+
+    Background tasks get the request session's get_bind(), which for a sharded session is the main engine.
+    """
+    router = _routers.get(bind)
+    return router.session() if router is not None else Session(bind=bind)
+
+def insert_rows(db: Session, model, rows: List[dict]) -> None:
+    """Insert rows of a table keyed by listing_id, as one executemany per shard the rows belong to.
+
+    A sharded session cannot run the ORM's bulk insert, and a Core insert would go to the main database.
+    """
+    if router_for(db) is None:
+        db.execute(insert(model), rows)
+        return
+    by_shard: Dict[str, List[dict]] = {}
+    for row in rows:
+        by_shard.setdefault(shard_for_id(row["listing_id"]), []).append(row)
+    for shard, shard_rows in by_shard.items():
+        db.connection(bind_arguments={"shard_id": shard}).execute(insert(model.__table__), shard_rows)
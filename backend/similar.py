@@ -0,0 +1,356 @@
+import argparse
+import math
+import os
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy.orm import Session, selectinload
+
+from backend.models import Listing, ArchivedListing, ListingSimilar
+from backend.database import get_db
+from backend.lazy_imports import lazy_import
+from backend.sharding import insert_rows, router_for, session_on
+from backend.suggest import TERM_RE
+
+# Recommendations are precomputed; serving them only needs the table
+np = lazy_import("numpy")
+sparse = lazy_import("scipy.sparse") if np is not None else None
+if sparse is None:
+    np = None
+
+router = APIRouter(tags=["similar"])
+
+SIMILAR_TOP_K = 12
+# Rows multiplied against the whole corpus per step of the batch job
+SIMILAR_BLOCK_ROWS = 1024
+SIMILAR_MODEL_PATH = os.path.join(os.path.dirname(__file__), "similar_model.npz")
+# Title terms count this many times more than description terms
+TITLE_TERM_WEIGHT = 2.0
+# Terms in fewer listings than this cannot link two listings; terms in more than the ratio are noise
+MIN_DF = 2
+MAX_DF_RATIO = 0.05
+MAX_DF_FLOOR = 100
+# Final score mix; text similarity gates the candidates, category and price only re-rank them
+TEXT_WEIGHT = 0.7
+CATEGORY_WEIGHT = 0.2
+PRICE_WEIGHT = 0.1
+# Listings whose prices differ by this factor or more get no price credit
+PRICE_RATIO_SPAN = 4.0
+# Vectors of listings added since the last batch are merged into the corpus matrix in chunks
+PENDING_MERGE_ROWS = 512
+
+class SimilarListingOut(BaseModel):
+    id: int
+    title: str
+    price_sek: int
+    condition: Optional[str]
+    city: Optional[str]
+    url_card: Optional[str]
+    score: float
+
+SimilarRow = Tuple[int, str, str, Optional[int], int]
+
+def similarity_row(listing) -> SimilarRow:
+    return (listing.id, listing.title, listing.description, listing.category_id, listing.price_sek)
+
+def _term_counts(title: Optional[str], description: Optional[str]) -> Counter:
+    counts: Counter = Counter()
+    for term in TERM_RE.findall((description or "").casefold()):
+        if len(term) >= 2:
+            counts[term] += 1.0
+    for term in TERM_RE.findall((title or "").casefold()):
+        if len(term) >= 2:
+            counts[term] += TITLE_TERM_WEIGHT
+    return counts
+
+class SimilarityModel:
+    """Row-normalized TF-IDF matrix of published listings plus their category and price.
+
+    Only the text part is stored as a sparse matrix: category and price are shared by far too
+    many listings to be sparse features, so they re-rank candidates that share text instead.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], idf, matrix, ids, categories, log_prices):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix
+        self.ids = ids
+        self.categories = categories
+        self.log_prices = log_prices
+        self._pending: List[tuple] = []
+        self._transposed = None
+        self._duplicates = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fit(cls, rows: Sequence[SimilarRow]) -> "SimilarityModel":
+        counts = [_term_counts(title, description) for _, title, description, _, _ in rows]
+        df: Counter = Counter()
+        for doc in counts:
+            df.update(doc.keys())
+        max_df = max(int(MAX_DF_RATIO * len(rows)), MAX_DF_FLOOR)
+        terms = sorted(term for term, count in df.items() if MIN_DF <= count <= max_df)
+        vocabulary = {term: column for column, term in enumerate(terms)}
+        n = len(rows)
+        idf = np.array([math.log((1 + n) / (1 + df[term])) + 1 for term in terms], dtype=np.float64)
+        model = cls(vocabulary, idf, None, None, None, None)
+        model.matrix = model._vectorize(counts)
+        model.ids, model.categories, model.log_prices = _row_features(rows)
+        return model
+
+    def _vectorize(self, counts: Sequence[Counter]):
+        indptr, indices, data = [0], [], []
+        for doc in counts:
+            for term, count in doc.items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    indices.append(column)
+                    data.append(1.0 + math.log(count))
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(counts), len(self.vocabulary)),
+        )
+        matrix = matrix.multiply(self.idf).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms) @ matrix
+
+    def transform(self, rows: Sequence[SimilarRow]):
+        return self._vectorize([_term_counts(title, description) for _, title, description, _, _ in rows])
+
+    def add(self, rows: Sequence[SimilarRow], matrix) -> None:
+        """Make freshly vectorized listings visible as neighbours of later queries."""
+        ids, categories, log_prices = _row_features(rows)
+        with self._lock:
+            if np.isin(ids, self.ids).any() or any(np.isin(ids, p[1]).any() for p in self._pending):
+                self._duplicates = True
+            self._pending.append((matrix, ids, categories, log_prices))
+            if sum(pending[0].shape[0] for pending in self._pending) >= PENDING_MERGE_ROWS:
+                self._merge()
+
+    def _merge(self) -> None:
+        if not self._pending:
+            return
+        self.matrix = sparse.vstack([self.matrix] + [p[0] for p in self._pending], format="csr")
+        self.ids = np.concatenate([self.ids] + [p[1] for p in self._pending])
+        self.categories = np.concatenate([self.categories] + [p[2] for p in self._pending])
+        self.log_prices = np.concatenate([self.log_prices] + [p[3] for p in self._pending])
+        self._pending = []
+        self._transposed = None
+
+    def top_neighbours(self, rows: Sequence[SimilarRow], matrix, k: int = SIMILAR_TOP_K) -> Dict[int, List[Tuple[int, float]]]:
+        """Top-k (neighbor id, score) per row, best first. Rows are vectorized with this model."""
+        ids, categories, log_prices = _row_features(rows)
+        with self._lock:
+            self._merge()
+            if self._transposed is None:
+                self._transposed = self.matrix.T.tocsr()
+            corpus_ids, corpus_categories, corpus_prices = self.ids, self.categories, self.log_prices
+            product = (matrix @ self._transposed).tocsr()
+            # An edited listing is in the corpus twice until the next rebuild
+            extra = k if self._duplicates else 1
+        product.sum_duplicates()
+        row_of = np.repeat(np.arange(product.shape[0]), np.diff(product.indptr))
+        columns = product.indices
+        score = TEXT_WEIGHT * product.data
+        same_category = (corpus_categories[columns] == categories[row_of]) & (categories[row_of] >= 0)
+        score += CATEGORY_WEIGHT * same_category
+        price_gap = np.abs(corpus_prices[columns] - log_prices[row_of])
+        score += PRICE_WEIGHT * np.clip(1.0 - price_gap / math.log(PRICE_RATIO_SPAN), 0.0, None)
+        neighbour_ids = corpus_ids[columns]
+        score[neighbour_ids == ids[row_of]] = -np.inf
+
+        result: Dict[int, List[Tuple[int, float]]] = {}
+        indptr = product.indptr
+        for row, listing_id in enumerate(ids.tolist()):
+            start, end = indptr[row], indptr[row + 1]
+            segment = score[start:end]
+            # argpartition per row is linear in the row's candidates; only the winners get sorted
+            wanted = k + extra
+            top = np.argpartition(-segment, wanted)[:wanted] if len(segment) > wanted else np.arange(len(segment))
+            top = top[np.lexsort((neighbour_ids[start:end][top], -segment[top]))]
+            ranked, seen = [], set()
+            for neighbour, value in zip(neighbour_ids[start:end][top].tolist(), segment[top].tolist()):
+                if value == -np.inf or neighbour in seen:
+                    continue
+                seen.add(neighbour)
+                ranked.append((neighbour, value))
+                if len(ranked) == k:
+                    break
+            result[listing_id] = ranked
+        return result
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            self._merge()
+            terms = np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=object)
+            np.savez(
+                path, terms=terms.astype(str), idf=self.idf, data=self.matrix.data, indices=self.matrix.indices,
+                indptr=self.matrix.indptr, shape=np.array(self.matrix.shape), ids=self.ids,
+                categories=self.categories, log_prices=self.log_prices,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityModel":
+        with np.load(path, allow_pickle=False) as stored:
+            vocabulary = {str(term): column for column, term in enumerate(stored["terms"])}
+            matrix = sparse.csr_matrix((stored["data"], stored["indices"], stored["indptr"]), shape=tuple(stored["shape"]))
+            return cls(vocabulary, stored["idf"], matrix, stored["ids"], stored["categories"], stored["log_prices"])
+
+def _row_features(rows: Sequence[SimilarRow]):
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    categories = np.array([-1 if row[3] is None else row[3] for row in rows], dtype=np.int64)
+    log_prices = np.log1p(np.array([max(row[4] or 0, 0) for row in rows], dtype=np.float64))
+    return ids, categories, log_prices
+
+_model: Optional[SimilarityModel] = None
+_model_lock = threading.Lock()
+
+def get_model(path: Optional[str] = None) -> Optional[SimilarityModel]:
+    """The model of the last batch run, loaded lazily; None until the batch job has run."""
+    global _model
+    if np is None:
+        return None
+    path = path or SIMILAR_MODEL_PATH
+    with _model_lock:
+        if _model is None and os.path.exists(path):
+            _model = SimilarityModel.load(path)
+        return _model
+
+def set_model(model: Optional[SimilarityModel]) -> None:
+    global _model
+    with _model_lock:
+        _model = model
+
+def _replace_neighbours(db: Session, neighbours: Dict[int, List[Tuple[int, float]]]) -> None:
+    db.execute(delete(ListingSimilar).where(ListingSimilar.listing_id.in_(list(neighbours))))
+    rows = [
+        {"listing_id": listing_id, "rank": rank, "neighbor_id": neighbour, "score": score}
+        for listing_id, ranked in neighbours.items()
+        for rank, (neighbour, score) in enumerate(ranked, start=1)
+    ]
+    if rows:
+        insert_rows(db, ListingSimilar, rows)
+
+def build_similar(db: Session, k: int = SIMILAR_TOP_K, block_rows: int = SIMILAR_BLOCK_ROWS,
+                  model_path: Optional[str] = "") -> int:
+    """Recompute the top-k table for every published listing; returns the number of listings covered."""
+    if np is None:
+        raise RuntimeError("numpy and scipy are required to build similar listings")
+    rows = [
+        tuple(row) for row in db.query(
+            Listing.id, Listing.title, Listing.description, Listing.category_id, Listing.price_sek
+        ).filter(Listing.status == "published").yield_per(10_000)
+    ]
+    model = SimilarityModel.fit(rows)
+    for start in range(0, len(rows), block_rows):
+        block = slice(start, start + block_rows)
+        _replace_neighbours(db, model.top_neighbours(rows[block], model.matrix[block], k))
+        db.commit()
+    # Drop lists of listings that were sold, hidden or deleted since the last run
+    published = db.query(Listing.id).filter(Listing.status == "published")
+    db.execute(delete(ListingSimilar).where(ListingSimilar.listing_id.not_in(published.scalar_subquery())))
+    db.commit()
+    # "" means the default location; None keeps the model in this process only
+    if model_path is not None:
+        model.save(model_path or SIMILAR_MODEL_PATH)
+    set_model(model)
+    return len(rows)
+
+def refresh_listing_neighbours(bind, listing_id: int, k: int = SIMILAR_TOP_K) -> None:
+    """Compute a new or edited listing's neighbours and offer it to theirs; runs as a background task."""
+    model = get_model()
+    if model is None:
+        return
+    with session_on(bind) as db:
+        listing = db.get(Listing, listing_id)
+        if listing is None or listing.status != "published":
+            return
+        row = similarity_row(listing)
+        vector = model.transform([row])
+        ranked = model.top_neighbours([row], vector, k)[listing_id]
+        model.add([row], vector)
+        neighbours = {listing_id: ranked}
+        existing: Dict[int, List[Tuple[int, float]]] = {neighbour: [] for neighbour, _ in ranked}
+        if existing:
+            for entry in (
+                db.query(ListingSimilar).filter(ListingSimilar.listing_id.in_(list(existing)))
+                .order_by(ListingSimilar.listing_id, ListingSimilar.rank)
+            ):
+                if entry.neighbor_id != listing_id:
+                    existing[entry.listing_id].append((entry.neighbor_id, entry.score))
+        # Similarity is symmetric, so the new listing may belong in its neighbours' lists too
+        for neighbour, score in ranked:
+            current = existing[neighbour]
+            if len(current) < k or score > current[-1][1]:
+                neighbours[neighbour] = sorted(current + [(listing_id, score)], key=lambda item: -item[1])[:k]
+        _replace_neighbours(db, neighbours)
+        db.commit()
+
+@router.get("/listings/{listing_id}/similar", response_model=List[SimilarListingOut])
+def similar_listings(listing_id: int, limit: int = Query(SIMILAR_TOP_K, ge=1, le=50), db: Session = Depends(get_db)):
+    exists = db.query(Listing.id).filter(Listing.id == listing_id).first() or \
+        db.query(ArchivedListing.id).filter(ArchivedListing.id == listing_id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    # Neighbours that were sold or removed since the last rebuild are skipped at read time
+    if router_for(db) is not None:
+        # Neighbours may live on other shards than the list, so they are loaded by id
+        ranked = (
+            db.query(ListingSimilar.neighbor_id, ListingSimilar.score)
+            .filter(ListingSimilar.listing_id == listing_id)
+            .order_by(ListingSimilar.rank)
+            .all()
+        )
+        scores = dict(ranked)
+        listings = {
+            listing.id: listing for listing in
+            db.query(Listing).options(selectinload(Listing.images))
+            .filter(Listing.id.in_(list(scores)), Listing.status == "published")
+        } if scores else {}
+        rows = [(listings[neighbour], score) for neighbour, score in ranked if neighbour in listings][:limit]
+    else:
+        rows = (
+            db.query(Listing, ListingSimilar.score)
+            .join(ListingSimilar, ListingSimilar.neighbor_id == Listing.id)
+            .options(selectinload(Listing.images))
+            .filter(ListingSimilar.listing_id == listing_id, Listing.status == "published")
+            .order_by(ListingSimilar.rank)
+            .limit(limit)
+            .all()
+        )
+    return [
+        SimilarListingOut(
+            id=listing.id,
+            title=listing.title,
+            price_sek=listing.price_sek,
+            condition=listing.condition,
+            city=listing.city,
+            url_card=min(listing.images, key=lambda image: image.sort_order or 0).url_card if listing.images else None,
+            score=round(score, 4),
+        )
+        for listing, score in rows
+    ]
+
+def main():
+    from backend.database import open_session
+
+    parser = argparse.ArgumentParser(description="Rebuild the precomputed similar-listings table.")
+    parser.add_argument("--top-k", type=int, default=SIMILAR_TOP_K)
+    parser.add_argument("--block-rows", type=int, default=SIMILAR_BLOCK_ROWS)
+    args = parser.parse_args()
+
+    db = open_session()
+    try:
+        covered = build_similar(db, args.top_k, args.block_rows)
+    finally:
+        db.close()
+    print(f"Computed similar listings for {covered} listing(s).")
+
+if __name__ == "__main__":
+    main()
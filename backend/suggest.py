@@ -0,0 +1,163 @@
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.models import Listing
+
+# Build the title suggestion index when the app starts
+TITLE_SUGGEST_ENABLED = True
+# Rough upper bound for the index; the least frequent terms are evicted beyond it
+SUGGEST_MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+# Approximate CPython cost of one term: str header, dict slot and list pointer
+TERM_OVERHEAD_BYTES = 120
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+# Prefixes this short match a large slice of the vocabulary, so their top terms are cached
+CACHED_PREFIX_LENGTH = 2
+CACHED_TOP_K = 20
+
+TERM_RE = re.compile(r"\w+")
+
+def title_terms(title: Optional[str]) -> set:
+    """Normalized, de-duplicated terms of a listing title."""
+    if not title:
+        return set()
+    return {
+        term for term in TERM_RE.findall(title.casefold())
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH
+    }
+
+def published_title(listing) -> Optional[str]:
+    """The title a listing contributes to suggestions, or None when it is not live."""
+    return listing.title if listing is not None and listing.status == "published" else None
+
+class TitlePrefixIndex:
+    """Title terms of published listings in a sorted array, weighted by how many listings use them.
+
+    Lookups bisect to the prefix range and take the heaviest terms in it. Writes keep the
+    array sorted in place; updates are passed as (old title, new title) so no per-listing
+    state is held.
+    """
+
+    def __init__(self, memory_budget: int = SUGGEST_MEMORY_BUDGET_BYTES):
+        self.ready = False
+        self.memory_budget = memory_budget
+        self._lock = threading.Lock()
+        self._terms: List[str] = []
+        self._weights: Dict[str, int] = {}
+        self._bytes = 0
+        self._top: Dict[str, List[Tuple[str, int]]] = {}
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._bytes
+
+    def load_titles(self, titles: Iterable[Optional[str]]) -> None:
+        weights: Dict[str, int] = {}
+        for title in titles:
+            for term in title_terms(title):
+                weights[term] = weights.get(term, 0) + 1
+        with self._lock:
+            self._weights = weights
+            self._terms = sorted(weights)
+            self._bytes = sum(_term_cost(term) for term in self._terms)
+            self._top = {}
+            self.evicted = 0
+            self._enforce_budget()
+            self.ready = True
+
+    def load(self, db: Session) -> None:
+        query = db.query(Listing.title).filter(Listing.status == "published").yield_per(10_000)
+        self.load_titles(title for (title,) in query)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.ready = False
+            self._terms = []
+            self._weights = {}
+            self._bytes = 0
+            self._top = {}
+
+    def update(self, old_title: Optional[str], new_title: Optional[str]) -> None:
+        """Apply a committed listing write; pass None for a side that is not published."""
+        if not self.ready:
+            return
+        old_terms, new_terms = title_terms(old_title), title_terms(new_title)
+        with self._lock:
+            for term in old_terms - new_terms:
+                self._adjust(term, -1)
+            for term in new_terms - old_terms:
+                self._adjust(term, 1)
+            self._enforce_budget()
+
+    def _adjust(self, term: str, delta: int) -> None:
+        weight = self._weights.get(term, 0) + delta
+        if weight > 0:
+            if term not in self._weights:
+                bisect.insort(self._terms, term)
+                self._bytes += _term_cost(term)
+            self._weights[term] = weight
+        elif term in self._weights:
+            # Also reached for terms that were evicted and came back with a lower count
+            self._drop(term)
+        for length in range(1, CACHED_PREFIX_LENGTH + 1):
+            self._top.pop(term[:length], None)
+
+    def _drop(self, term: str) -> None:
+        del self._weights[term]
+        del self._terms[bisect.bisect_left(self._terms, term)]
+        self._bytes -= _term_cost(term)
+
+    def _enforce_budget(self) -> None:
+        if self._bytes <= self.memory_budget:
+            return
+        # Evict down to 90% so a steady trickle of new terms does not trigger a pass per write
+        target = self.memory_budget * 9 // 10
+        by_weight = sorted(self._weights.items(), key=lambda item: item[1])
+        doomed = set()
+        for term, _ in by_weight:
+            if self._bytes <= target:
+                break
+            doomed.add(term)
+            del self._weights[term]
+            self._bytes -= _term_cost(term)
+        self._terms = [term for term in self._terms if term not in doomed]
+        self._top = {}
+        self.evicted += len(doomed)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Heaviest terms starting with prefix as (term, weight), ties broken alphabetically."""
+        prefix = prefix.casefold()
+        if not prefix or limit <= 0:
+            return []
+        with self._lock:
+            if len(prefix) <= CACHED_PREFIX_LENGTH and limit <= CACHED_TOP_K:
+                top = self._top.get(prefix)
+                if top is None:
+                    top = self._top[prefix] = self._scan(prefix, CACHED_TOP_K)
+                return top[:limit]
+            return self._scan(prefix, limit)
+
+    def _scan(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        start = bisect.bisect_left(self._terms, prefix)
+        # Every term with the prefix sorts below prefix + the highest code point
+        end = bisect.bisect_left(self._terms, prefix + "\U0010ffff", start)
+        weights = self._weights
+        return heapq.nsmallest(
+            limit,
+            ((term, weights[term]) for term in self._terms[start:end]),
+            key=lambda item: (-item[1], item[0]),
+        )
+
+def _term_cost(term: str) -> int:
+    return TERM_OVERHEAD_BYTES + len(term)
+
+title_suggest = TitlePrefixIndex()
@@ -0,0 +1,98 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.admission import AdmissionControlMiddleware, AdmissionLimiter, Overloaded, build_limiters, route_class
+
+def _run(coro):
+    return asyncio.run(coro)
+
+def test_route_classes():
+    assert route_class("POST", "/auth/login") == "auth"
+    assert route_class("POST", "/auth/forgot") == "write"
+    assert route_class("PUT", "/listings/1") == "write"
+    assert route_class("GET", "/listings/") == "read"
+    assert route_class("POST", "/listings/batch") == "read"
+    assert route_class("POST", "/listings/") == "write"
+    assert route_class("GET", "/changes") is None
+    assert route_class("GET", "/media/listings/a.jpg") is None
+
+def test_limiter_queues_then_rejects():
+    async def scenario():
+        limiter = AdmissionLimiter("write", limit=1, max_queue=1, queue_timeout=1.0)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire()
+        assert excinfo.value.retry_after == 1
+        limiter.release()
+        await waiter
+        assert limiter.stats()["active"] == 1
+        limiter.release()
+        return limiter.stats()
+
+    stats = _run(scenario())
+    assert (stats["active"], stats["queued"], stats["admitted"], stats["rejected"]) == (0, 0, 2, 1)
+
+def test_limiter_queue_deadline_and_cancellation():
+    async def scenario():
+        limiter = AdmissionLimiter("write", limit=1, max_queue=5, queue_timeout=0.05)
+        await limiter.acquire()
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        cancelled = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert limiter.stats()["queued"] == 0
+        limiter.release()
+        # Nothing leaked: the slot is free again
+        await limiter.acquire()
+        return limiter.stats()
+
+    stats = _run(scenario())
+    assert (stats["timed_out"], stats["active"]) == (1, 1)
+
+def test_saturated_writes_shed_while_reads_pass():
+    slow = FastAPI()
+    gate = {}
+
+    @slow.post("/listings/")
+    async def write():
+        await gate["event"].wait()
+        return {"ok": True}
+
+    @slow.get("/listings/")
+    async def read():
+        return {"ok": True}
+
+    limits = {"write": (2, 2, 5.0), "read": (4, 4, 5.0)}
+    wrapped = AdmissionControlMiddleware(slow, limiters=build_limiters(limits))
+
+    async def scenario():
+        gate["event"] = asyncio.Event()
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            writes = [asyncio.ensure_future(client.post("/listings/")) for _ in range(6)]
+            await asyncio.sleep(0.05)
+            read = await client.get("/listings/")
+            gate["event"].set()
+            return read, await asyncio.gather(*writes)
+
+    read, writes = _run(scenario())
+    assert read.status_code == 200
+    statuses = sorted(response.status_code for response in writes)
+    assert statuses == [200] * 4 + [503] * 2
+    shed = next(response for response in writes if response.status_code == 503)
+    assert shed.headers["Retry-After"] == "5"
+
+def test_metrics_endpoint():
+    with TestClient(app) as client:
+        client.get("/listings/suggest?prefix=ip")
+        admission = client.get("/metrics").json()["admission"]
+    assert set(admission) == {"auth", "write", "read"}
+    assert admission["read"]["admitted"] >= 1
+    assert admission["read"]["active"] == 0
@@ -0,0 +1,139 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import (
+    Base, User, Listing, ListingImage, ArchivedListing, ArchivedListingImage, ArchivedListingReport, UserStats, Order,
+    ListingReport, ListingReportCount, ListingReportSummary, ListingSimilar,
+)
+from backend.database import get_db
+from backend.archive import archive_listings
+from backend.user_stats import reconcile_user_stats
+from datetime import datetime, timedelta
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_archive.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def listings(override_get_db):
+    db = override_get_db
+    user = User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller", city="Visby")
+    db.add(user)
+    db.commit()
+    long_ago = datetime.utcnow() - timedelta(days=90)
+    rows = {
+        "old_sold": Listing(user_id=user.id, title="Old sold", description="d", price_sek=10, status="sold", updated_at=long_ago),
+        "old_expired": Listing(user_id=user.id, title="Old expired", description="d", price_sek=20, status="expired", updated_at=long_ago),
+        "recent_sold": Listing(user_id=user.id, title="Recent sold", description="d", price_sek=30, status="sold", updated_at=datetime.utcnow()),
+        "live": Listing(user_id=user.id, title="Live", description="d", price_sek=40, status="published", updated_at=long_ago),
+    }
+    db.add_all(rows.values())
+    db.commit()
+    db.add(ListingImage(listing_id=rows["old_sold"].id, url_full="/media/a.jpg", url_card="/media/a.card.jpg",
+                        url_thumb="/media/a.thumb.jpg", blurhash="", sort_order=1))
+    db.add(UserStats(user_id=user.id, items_sold=2))
+    db.commit()
+    return {name: listing.id for name, listing in rows.items()}
+
+def test_archive_moves_old_sold_and_expired(override_get_db, listings):
+    db = override_get_db
+    moved = archive_listings(db, batch_size=1)
+    assert moved == 2
+
+    hot_ids = {listing_id for (listing_id,) in db.query(Listing.id)}
+    assert hot_ids == {listings["recent_sold"], listings["live"]}
+    cold_ids = {listing_id for (listing_id,) in db.query(ArchivedListing.id)}
+    assert cold_ids == {listings["old_sold"], listings["old_expired"]}
+    assert db.query(ListingImage).count() == 0
+    assert db.query(ArchivedListingImage).filter(ArchivedListingImage.listing_id == listings["old_sold"]).count() == 1
+    assert archive_listings(db) == 0
+
+def test_read_listing_falls_through_to_archive(client, override_get_db, listings):
+    archive_listings(override_get_db)
+    response = client.get(f"/listings/{listings['old_sold']}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["title"] == "Old sold"
+    assert data["status"] == "sold"
+    assert data["images"][0]["url_card"] == "/media/a.card.jpg"
+
+def test_archived_listing_id_is_not_reused(client, override_get_db, listings):
+    db = override_get_db
+    # Archive the listing holding the highest id
+    db.query(Listing).filter(Listing.id == listings["live"]).update({"status": "expired"})
+    db.commit()
+    archive_listings(db, older_than_days=0)
+    response = client.post("/listings/", json={
+        "user_id": 1, "title": "New", "description": "d", "price_sek": 5, "condition": None, "category_id": None,
+        "city": None, "latitude": None, "longitude": None, "status": "published", "slug": None, "canonical_url": None,
+    })
+    assert response.status_code == 201
+    assert response.json()["id"] > listings["live"]
+
+def test_browse_only_returns_live_listings(client, listings):
+    response = client.get("/listings/")
+    assert [listing["id"] for listing in response.json()] == [listings["live"]]
+
+def test_user_stats_reconcile_counts_archived_sales(override_get_db, listings):
+    archive_listings(override_get_db)
+    assert reconcile_user_stats(override_get_db) == []
+
+def test_archive_moves_reports_and_drops_derived_rows(override_get_db, listings):
+    db = override_get_db
+    old, live = listings["old_sold"], listings["live"]
+    db.add(ListingReport(listing_id=old, reporter_id=1, reason_code="scam", note="Asked for payment upfront"))
+    db.add(ListingReportCount(listing_id=old, reason_code="scam", count=1))
+    db.add(ListingReportSummary(listing_id=old, report_count=1, score=3))
+    db.add(ListingReportSummary(listing_id=live, report_count=1, score=1))
+    db.add_all([
+        ListingSimilar(listing_id=old, rank=0, neighbor_id=live, score=0.9),
+        ListingSimilar(listing_id=live, rank=0, neighbor_id=old, score=0.9),
+        ListingSimilar(listing_id=live, rank=1, neighbor_id=listings["recent_sold"], score=0.5),
+    ])
+    db.commit()
+
+    archive_listings(db)
+    assert db.query(ListingReport).count() == 0
+    archived = db.query(ArchivedListingReport).one()
+    assert (archived.listing_id, archived.reporter_id, archived.note) == (old, 1, "Asked for payment upfront")
+    assert db.query(ListingReportCount).count() == 0
+    assert [summary.listing_id for summary in db.query(ListingReportSummary)] == [live]
+    assert [(row.listing_id, row.neighbor_id) for row in db.query(ListingSimilar)] == [(live, listings["recent_sold"])]
+
+def test_order_finds_its_archived_listing(client, override_get_db, listings):
+    db = override_get_db
+    order = Order(buyer_id=1, seller_id=1, listing_id=listings["old_sold"], amount_sek=10, delivery_type="pickup",
+                  status="paid")
+    db.add(order)
+    db.commit()
+    assert order.listed_item.title == "Old sold"
+
+    archive_listings(db)
+    db.expire_all()
+    assert order.listing is None
+    assert order.listed_item.title == "Old sold"
+    assert isinstance(order.listed_item, ArchivedListing)
+    response = client.get(f"/marketplace/orders/{order.id}")
+    assert response.status_code == 200
+    assert response.json()["listing_id"] == listings["old_sold"]
@@ -0,0 +1,114 @@
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing
+from backend.database import get_db
+from backend import cache_bus as cache_bus_module
+from backend.cache_bus import CacheBus
+from backend.listing_cache import ListingCache
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_cache_bus.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db(monkeypatch):
+    monkeypatch.setattr(cache_bus_module, "CACHE_BUS_ENABLED", True)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+def _subscribed_bus(db, namespace="listings"):
+    bus = CacheBus()
+    received = []
+    bus.subscribe(namespace, received.append)
+    bus.poll(db)
+    return bus, received
+
+def test_committed_messages_reach_other_workers(override_get_db):
+    db = override_get_db
+    worker, received = _subscribed_bus(db)
+    publisher = CacheBus()
+    publisher.publish(db, "listings", 7)
+    publisher.publish(db, "categories", 1)
+    assert worker.poll(TestingSessionLocal()) == 0  # not committed yet
+    db.commit()
+    assert worker.poll(db) == 2
+    assert received == ["7"]
+    assert worker.poll(db) == 0
+
+def test_pruned_messages_flush_the_namespace(override_get_db):
+    db = override_get_db
+    worker, received = _subscribed_bus(db)
+    bus = CacheBus()
+    for key in (1, 2, 3):
+        bus.publish(db, "listings", key)
+    db.commit()
+    assert bus.prune(db, older_than=-1) == 3
+    bus.publish(db, "listings", 4)
+    db.commit()
+    worker.poll(db)
+    assert received == [None, "4"]
+    assert worker.resyncs == 1
+
+def test_listing_writes_invalidate_other_workers_caches(client, override_get_db):
+    db = override_get_db
+    db.add(User(email="seller@example.com", password_hash="x", name="Seller"))
+    db.add(Listing(id=1, user_id=1, title="Soffa", description="d", price_sek=100, status="published"))
+    db.commit()
+    # A second worker's cache, fed by its own bus
+    other_cache = ListingCache()
+    other_bus = CacheBus()
+    other_bus.subscribe("listings", lambda key: other_cache.invalidate(int(key)) if key else other_cache.clear())
+    other_bus.poll(db)
+    other_cache.put(1, client.get("/listings/1").json())
+
+    payload = {"title": "Soffa", "description": "d", "price_sek": 90, "condition": None, "category_id": None, "city": None,
+               "latitude": None, "longitude": None, "status": "published", "slug": None, "canonical_url": None}
+    client.put("/listings/1", json=payload)
+    assert other_cache.get(1) is not None
+    other_bus.poll(db)
+    assert other_cache.get(1) is None
+
+def test_poller_thread_delivers_within_milliseconds(override_get_db):
+    bus = CacheBus()
+    arrived = threading.Event()
+    bus.subscribe("listings", lambda key: arrived.set())
+    bus.start(engine)
+    try:
+        deadline = time.monotonic() + 2
+        while bus._cursor is None and time.monotonic() < deadline:
+            time.sleep(0.005)
+        CacheBus().publish(override_get_db, "listings", 1)
+        override_get_db.commit()
+        started = time.monotonic()
+        assert arrived.wait(1)
+        assert time.monotonic() - started < 0.2
+    finally:
+        bus.stop()
+
+def test_stale_read_is_not_cached_after_invalidation():
+    cache = ListingCache()
+    generation = cache.generation
+    cache.invalidate(1)  # arrives while the request was reading the old row
+    cache.put(1, {"id": 1}, generation)
+    assert cache.get(1) is None
+    cache.put(1, {"id": 1}, cache.generation)
+    assert cache.get(1) == {"id": 1}
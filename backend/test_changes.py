@@ -0,0 +1,157 @@
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing, ListingChange, Order
+from backend.database import get_db
+from backend.changes import change_notifier, prune_changes, record_change
+from datetime import datetime, timedelta
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_changes.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def users(override_get_db):
+    db = override_get_db
+    db.add_all([
+        User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller"),
+        User(email="buyer@example.com", password_hash="hashed_pw", email_verified=True, name="Buyer"),
+    ])
+    db.commit()
+
+def _listing_payload(**overrides):
+    payload = {"user_id": 1, "title": "Cykel", "description": "Damcykel, 7 växlar", "price_sek": 900,
+               "condition": "good", "category_id": None, "city": None, "latitude": None, "longitude": None,
+               "status": "published", "slug": None, "canonical_url": None}
+    payload.update(overrides)
+    return payload
+
+def test_listing_writes_are_logged_in_order(client, users):
+    first = client.post("/listings/", json=_listing_payload()).json()
+    second = client.post("/listings/", json=_listing_payload(title="Barncykel", description="12 tum")).json()
+    client.put(f"/listings/{first['id']}", json=_listing_payload(price_sek=800))
+    client.delete(f"/listings/{second['id']}")
+
+    page = client.get("/changes").json()
+    assert [(c["listing_id"], c["op"], c["status"]) for c in page["changes"]] == [
+        (first["id"], "create", "published"),
+        (second["id"], "create", "published"),
+        (first["id"], "update", "published"),
+        (second["id"], "delete", None),
+    ]
+    assert page["next_since"] == page["changes"][-1]["seq"]
+    assert page["truncated"] is False
+
+    partial = client.get("/changes?since=1&limit=2").json()
+    assert [c["seq"] for c in partial["changes"]] == [2, 3]
+    assert client.get(f"/changes?since={page['next_since']}").json() == {
+        "changes": [], "next_since": page["next_since"], "truncated": False}
+
+def test_payment_flip_to_sold_is_logged(client, override_get_db, users):
+    listing = client.post("/listings/", json=_listing_payload()).json()
+    order = Order(buyer_id=2, seller_id=1, listing_id=listing["id"], amount_sek=900, delivery_type="pickup", status="created")
+    override_get_db.add(order)
+    override_get_db.commit()
+    since = client.get("/changes").json()["next_since"]
+
+    client.post("/marketplace/payments/webhook", json={"order_id": order.id, "payment_status": "succeeded"})
+    client.post("/marketplace/payments/webhook", json={"order_id": order.id, "payment_status": "succeeded"})
+    changes = client.get(f"/changes?since={since}").json()["changes"]
+    assert [(c["listing_id"], c["op"], c["status"]) for c in changes] == [(listing["id"], "update", "sold")]
+
+def test_long_poll_wakes_on_commit(client, users):
+    since = client.get("/changes").json()["next_since"]
+
+    def write_later():
+        time.sleep(0.2)
+        db = TestingSessionLocal()
+        db.add(Listing(id=50, user_id=1, title="Sen", description="d", price_sek=1, status="published"))
+        record_change(db, 50, "create", "published")
+        db.commit()
+        db.close()
+        change_notifier.notify()
+
+    writer = threading.Thread(target=write_later)
+    writer.start()
+    started = time.monotonic()
+    page = client.get(f"/changes?since={since}&wait=5").json()
+    writer.join()
+    # Woken by the notifier, well before the poll interval would have re-checked
+    assert time.monotonic() - started < 0.9
+    assert [c["listing_id"] for c in page["changes"]] == [50]
+
+def test_long_poll_times_out_empty(client, users):
+    started = time.monotonic()
+    page = client.get("/changes?since=0&wait=0.3").json()
+    assert page == {"changes": [], "next_since": 0, "truncated": False}
+    assert time.monotonic() - started >= 0.3
+
+def test_prune_marks_stale_cursors_truncated(client, override_get_db, users):
+    db = override_get_db
+    long_ago = datetime.utcnow() - timedelta(days=90)
+    db.add_all([ListingChange(listing_id=i, op="create", status="published", created_at=long_ago) for i in range(1, 4)])
+    db.add(ListingChange(listing_id=4, op="create", status="published"))
+    db.commit()
+    assert prune_changes(db) == 3
+    assert client.get("/changes?since=1").json()["truncated"] is True
+    assert client.get("/changes?since=3").json()["truncated"] is False
+    # Pruned sequence numbers are not handed out again
+    client.post("/listings/", json=_listing_payload())
+    assert client.get("/changes?since=4").json()["changes"][0]["seq"] == 5
+
+def test_waiting_polls_hold_no_connection(override_get_db, users):
+    # One pooled connection for four long polls and a plain read; before, the first poll kept it while waiting
+    small_engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+                                 pool_size=1, max_overflow=0, pool_timeout=1)
+    SmallSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=small_engine)
+
+    def get_small_db():
+        db = SmallSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_small_db
+    try:
+        with TestClient(app) as client:
+            statuses = []
+            pollers = [
+                threading.Thread(target=lambda: statuses.append(client.get("/changes?wait=2").status_code))
+                for _ in range(4)
+            ]
+            for poller in pollers:
+                poller.start()
+            time.sleep(0.3)
+            started = time.monotonic()
+            assert client.get("/changes").status_code == 200
+            assert time.monotonic() - started < 0.5
+            for poller in pollers:
+                poller.join()
+    finally:
+        app.dependency_overrides = {}
+        small_engine.dispose()
+    assert statuses == [200] * 4
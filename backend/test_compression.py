@@ -0,0 +1,134 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from backend.main import app
+from backend.models import Base, User, Listing
+from backend.database import get_db
+from backend import compression
+from backend.compression import CompressionMiddleware, choose_encoding
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_compression.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def seeded(override_get_db):
+    db = override_get_db
+    db.add(User(id=1, email="seller@example.com", password_hash="x", name="Seller"))
+    db.add_all([
+        Listing(id=i, user_id=1, title=f"Soffa {i}", description="Bekväm soffa i grått tyg. " * 80,
+                price_sek=1000 + i, status="published")
+        for i in range(1, 21)
+    ])
+    db.commit()
+
+def test_large_json_is_gzipped(client, seeded):
+    response = client.get("/listings/?limit=20", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()) == 20
+    assert response.num_bytes_downloaded * 10 < len(response.content)
+
+    plain = client.get("/listings/?limit=20", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == response.content
+
+def test_small_and_refused_responses_go_out_as_is(client, seeded):
+    small = client.get("/listings/999", headers={"Accept-Encoding": "gzip"})
+    assert small.status_code == 404
+    assert "content-encoding" not in small.headers
+    refused = client.get("/listings/?limit=20", headers={"Accept-Encoding": "gzip;q=0, deflate"})
+    assert "content-encoding" not in refused.headers
+
+def test_cached_listing_is_compressed_once(client, seeded, monkeypatch):
+    calls = []
+    original = compression.compress
+    monkeypatch.setattr(compression, "compress", lambda body, encoding: calls.append(encoding) or original(body, encoding))
+    bodies = [client.get("/listings/3", headers={"Accept-Encoding": "gzip"}) for _ in range(5)]
+    # The miss is compressed by the middleware, the first hit fills the cache entry's gzip body
+    assert calls == ["gzip", "gzip"]
+    assert all(response.headers["content-encoding"] == "gzip" for response in bodies)
+    assert all(response.json() == bodies[0].json() for response in bodies)
+    assert client.get("/listings/3", headers={"Accept-Encoding": "identity"}).content == bodies[0].content
+
+def test_negotiation(monkeypatch):
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding(None) is None
+    assert choose_encoding("*;q=0.1") == "gzip"
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br") is None
+
+def test_streamed_responses_are_compressed_per_chunk():
+    async def stream(request):
+        async def chunks():
+            for i in range(50):
+                yield f'{{"line": {i}, "text": "{"x" * 100}"}}\n'.encode()
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    streaming_app = CompressionMiddleware(Starlette(routes=[Route("/", stream)]))
+    with TestClient(streaming_app) as streaming_client:
+        response = streaming_client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.count("\n") == 50
+    assert response.num_bytes_downloaded < len(response.content)
+
+def test_reencoded_responses_drop_ranges_and_weaken_etag():
+    async def document(request):
+        return Response("<svg>" + "<g/>" * 1000 + "</svg>", media_type="image/svg+xml",
+                        headers={"ETag": '"abc"', "Accept-Ranges": "bytes"})
+
+    with TestClient(CompressionMiddleware(Starlette(routes=[Route("/", document)]))) as svg_client:
+        response = svg_client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert "accept-ranges" not in response.headers
+
+def test_extension_messages_follow_the_held_start():
+    # Like images.CachedFileResponse serving an SVG through the zero-copy extension
+    async def zerocopy_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"image/svg+xml"), (b"content-length", b"4096")]})
+        await send({"type": "http.response.zerocopy", "file": 3, "count": 4096})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": "/logo.svg", "headers": [(b"accept-encoding", b"gzip")],
+             "extensions": {"http.response.zerocopy": {}}}
+    asyncio.run(CompressionMiddleware(zerocopy_app)(scope, receive, send))
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.zerocopy"]
+    assert b"content-encoding" not in dict(sent[0]["headers"])
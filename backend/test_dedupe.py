@@ -0,0 +1,102 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing, ListingReport, ListingSignature, ListingLshBucket
+from backend.database import get_db
+from backend import dedupe
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_dedupe.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+DESCRIPTION = "Säljer min iPhone 13 Pro i mycket fint skick. Laddare och skal ingår, inga repor på skärmen."
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def users(override_get_db):
+    db = override_get_db
+    db.add_all([
+        User(email="spammer@example.com", password_hash="hashed_pw", email_verified=True, name="Spammer"),
+        User(email="other@example.com", password_hash="hashed_pw", email_verified=True, name="Other"),
+    ])
+    db.commit()
+
+def _listing_payload(**overrides):
+    payload = {"user_id": 1, "title": "iPhone 13 Pro 128GB", "description": DESCRIPTION, "price_sek": 6000,
+               "condition": "good", "category_id": None, "city": None, "latitude": None, "longitude": None,
+               "status": "published", "slug": None, "canonical_url": None}
+    payload.update(overrides)
+    return payload
+
+def test_repost_is_flagged(client, override_get_db, users):
+    first = client.post("/listings/", json=_listing_payload()).json()
+    response = client.post("/listings/", json=_listing_payload(user_id=2, description=DESCRIPTION + " Kan skickas."))
+    assert response.status_code == 201
+    report = override_get_db.query(ListingReport).filter(ListingReport.listing_id == response.json()["id"]).one()
+    assert report.reason_code == "duplicate"
+    assert f"listing {first['id']}" in report.note
+
+    unrelated = client.post("/listings/", json=_listing_payload(title="Grå soffa", description="Tre sits från Ikea"))
+    assert override_get_db.query(ListingReport).filter(ListingReport.listing_id == unrelated.json()["id"]).count() == 0
+
+def test_repost_is_rejected(client, users, monkeypatch):
+    monkeypatch.setattr(dedupe, "DUPLICATE_ACTION", "reject")
+    first = client.post("/listings/", json=_listing_payload()).json()
+    response = client.post("/listings/", json=_listing_payload())
+    assert response.status_code == 409
+    assert str(first["id"]) in response.json()["detail"]
+
+def test_sold_and_deleted_listings_are_not_candidates(client, override_get_db, users, monkeypatch):
+    monkeypatch.setattr(dedupe, "DUPLICATE_ACTION", "reject")
+    first = client.post("/listings/", json=_listing_payload()).json()
+    client.put(f"/listings/{first['id']}", json=_listing_payload(status="sold"))
+    second = client.post("/listings/", json=_listing_payload())
+    assert second.status_code == 201
+
+    client.delete(f"/listings/{second.json()['id']}")
+    assert override_get_db.query(ListingLshBucket).filter(ListingLshBucket.listing_id == second.json()["id"]).count() == 0
+    assert client.post("/listings/", json=_listing_payload()).status_code == 201
+
+def test_edit_updates_signature(client, override_get_db, users, monkeypatch):
+    monkeypatch.setattr(dedupe, "DUPLICATE_ACTION", "reject")
+    first = client.post("/listings/", json=_listing_payload(title="Grå soffa", description="Tre sits från Ikea")).json()
+    client.put(f"/listings/{first['id']}", json=_listing_payload())
+    assert client.post("/listings/", json=_listing_payload()).status_code == 409
+
+def test_backfill_signs_existing_rows(override_get_db, users):
+    db = override_get_db
+    db.add_all([Listing(user_id=1, title=f"Listing {i}", description=DESCRIPTION, price_sek=1, status="published")
+                for i in range(5)])
+    db.commit()
+    assert dedupe.backfill_signatures(db, batch_size=2) == 5
+    assert db.query(ListingSignature).count() == 5
+    assert db.query(ListingLshBucket).count() == 5 * dedupe.LSH_BANDS
+    assert dedupe.backfill_signatures(db) == 0
+    signature = dedupe.listing_signature("Listing 0", DESCRIPTION)
+    assert [listing_id for listing_id, _ in dedupe.find_duplicates(db, signature)][:1] == [1]
+
+def test_pure_python_signature_matches_numpy(monkeypatch):
+    pytest.importorskip("numpy")
+    expected = dedupe.listing_signature("iPhone 13 Pro", DESCRIPTION)
+    monkeypatch.setattr(dedupe, "np", None)
+    assert dedupe.listing_signature("iPhone 13 Pro", DESCRIPTION) == expected
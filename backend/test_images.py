@@ -0,0 +1,96 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend import images
+
+@pytest.fixture(scope="function")
+def media_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "MEDIA_ROOT", tmp_path)
+    images.file_cache.clear()
+    listing_dir = tmp_path / "listings" / "1"
+    listing_dir.mkdir(parents=True)
+    (listing_dir / "sofa.3f9a2c1be0d4.thumb.jpg").write_bytes(bytes(range(256)) * 4)
+    (listing_dir / "sofa.jpg").write_bytes(b"plain image bytes")
+    yield tmp_path
+    images.file_cache.clear()
+
+@pytest.fixture(scope="function")
+def client(media_root):
+    return TestClient(app)
+
+def test_serve_hashed_image_is_immutable(client):
+    response = client.get("/media/listings/1/sofa.3f9a2c1be0d4.thumb.jpg")
+    assert response.status_code == 200
+    assert response.content == bytes(range(256)) * 4
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["content-length"] == "1024"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "immutable" in response.headers["cache-control"]
+
+def test_serve_unhashed_image_is_revalidated(client):
+    response = client.get("/media/listings/1/sofa.jpg")
+    assert response.status_code == 200
+    assert response.content == b"plain image bytes"
+    assert "immutable" not in response.headers["cache-control"]
+
+def test_repeated_requests_reuse_open_file(client):
+    client.get("/media/listings/1/sofa.3f9a2c1be0d4.thumb.jpg")
+    misses = images.file_cache.misses
+    client.get("/media/listings/1/sofa.3f9a2c1be0d4.thumb.jpg")
+    assert images.file_cache.misses == misses
+    assert len(images.file_cache) == 1
+
+def test_range_request(client):
+    response = client.get("/media/listings/1/sofa.3f9a2c1be0d4.thumb.jpg", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == bytes(range(10, 20))
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+
+def test_suffix_range_request(client):
+    response = client.get("/media/listings/1/sofa.3f9a2c1be0d4.thumb.jpg", headers={"Range": "bytes=-4"})
+    assert response.status_code == 206
+    assert response.content == bytes(range(252, 256))
+
+def test_range_not_satisfiable(client):
+    response = client.get("/media/listings/1/sofa.jpg", headers={"Range": "bytes=500-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */17"
+
+def test_range_on_empty_file_not_satisfiable(client, media_root):
+    (media_root / "listings" / "1" / "empty.jpg").write_bytes(b"")
+    for spec in ("bytes=-4", "bytes=0-"):
+        response = client.get("/media/listings/1/empty.jpg", headers={"Range": spec})
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */0"
+
+def test_stale_if_range_serves_full_body(client):
+    response = client.get("/media/listings/1/sofa.jpg", headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == b"plain image bytes"
+
+def test_if_none_match_returns_not_modified(client):
+    etag = client.get("/media/listings/1/sofa.jpg").headers["etag"]
+    response = client.get("/media/listings/1/sofa.jpg", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+def test_if_modified_since_returns_not_modified(client):
+    last_modified = client.get("/media/listings/1/sofa.jpg").headers["last-modified"]
+    response = client.get("/media/listings/1/sofa.jpg", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+def test_head_request(client):
+    response = client.head("/media/listings/1/sofa.jpg")
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "17"
+    assert response.content == b""
+
+def test_missing_image(client):
+    response = client.get("/media/listings/1/missing.jpg")
+    assert response.status_code == 404
+
+def test_path_traversal_rejected(client):
+    response = client.get("/media/listings/../../models.py")
+    assert response.status_code == 404
+    response = client.get("/media/listings/%2e%2e/%2e%2e/models.py")
+    assert response.status_code == 404
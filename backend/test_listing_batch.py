@@ -0,0 +1,123 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing, ListingImage, Order
+from backend.database import get_db
+from backend.archive import archive_listings
+from backend.listing_cache import ListingCache, listing_cache
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_listing_batch.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def seeded(override_get_db):
+    db = override_get_db
+    db.add_all([
+        User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller"),
+        User(email="buyer@example.com", password_hash="hashed_pw", email_verified=True, name="Buyer"),
+    ])
+    db.commit()
+    for i in range(1, 6):
+        db.add(Listing(id=i, user_id=1, title=f"Listing {i}", description="d", price_sek=100 * i, status="published"))
+    db.commit()
+    db.add_all([ListingImage(listing_id=i, url_card=f"/media/{i}.card.jpg", sort_order=1) for i in (2, 4)])
+    db.commit()
+    return db
+
+def _count_statements(fn):
+    statements = []
+    capture = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return response, len(statements)
+
+def test_batch_preserves_order_and_marks_missing(client, seeded):
+    response, queries = _count_statements(lambda: client.get("/listings/batch?ids=4,99,1,4"))
+    assert response.status_code == 200
+    items = response.json()
+    assert [(item["id"], item["found"]) for item in items] == [(4, True), (99, False), (1, True), (4, True)]
+    assert items[0]["listing"]["images"][0]["url_card"] == "/media/4.card.jpg"
+    assert items[1]["listing"] is None
+    assert items[2]["listing"] == client.get("/listings/1").json()
+    # Listings, their images, then the archive for id 99
+    assert queries == 3
+
+def test_post_batch_and_limits(client, seeded):
+    items = client.post("/listings/batch", json={"ids": [5, 3, 2]}).json()
+    assert [item["listing"]["title"] for item in items] == ["Listing 5", "Listing 3", "Listing 2"]
+    assert client.get("/listings/batch?ids=1,x").status_code == 400
+    assert client.get("/listings/batch?ids=" + ",".join(map(str, range(101)))).status_code == 400
+    assert client.post("/listings/batch", json={"ids": list(range(101))}).status_code == 200
+    assert client.post("/listings/batch", json={"ids": []}).status_code == 422
+
+def test_cached_listings_skip_the_database(client, seeded):
+    client.get("/listings/batch?ids=1,2,3")
+    response, queries = _count_statements(lambda: client.get("/listings/batch?ids=3,2,1"))
+    assert [item["id"] for item in response.json()] == [3, 2, 1]
+    assert queries == 0
+    _, queries = _count_statements(lambda: client.get("/listings/2"))
+    assert queries == 0
+
+def test_writes_invalidate_cached_listings(client, seeded):
+    payload = {"title": "Renamed", "description": "d", "price_sek": 150, "condition": None, "category_id": None,
+               "city": None, "latitude": None, "longitude": None, "status": "published", "slug": None, "canonical_url": None}
+    client.get("/listings/batch?ids=1,2,3")
+    client.put("/listings/1", json=payload)
+    client.delete("/listings/3")
+    for reporter_id in (1, 2):
+        client.post("/listings/2/reports", json={"reason_code": "scam", "reporter_id": reporter_id})
+    items = client.get("/listings/batch?ids=1,2,3").json()
+    assert items[0]["listing"]["title"] == "Renamed"
+    assert items[1]["listing"]["status"] == "hidden"
+    assert items[2]["found"] is False
+
+def test_sold_listings_are_found_after_archiving(client, seeded):
+    order = Order(buyer_id=2, seller_id=1, listing_id=5, amount_sek=500, delivery_type="pickup", status="created")
+    seeded.add(order)
+    seeded.commit()
+    client.get("/listings/5")
+    client.post("/marketplace/payments/webhook", json={"order_id": order.id, "payment_status": "succeeded"})
+    assert client.get("/listings/5").json()["status"] == "sold"
+    archive_listings(seeded, older_than_days=-1)
+    listing_cache.clear()
+    items = client.get("/listings/batch?ids=5,1").json()
+    assert [(item["id"], item["found"]) for item in items] == [(5, True), (1, True)]
+    assert items[0]["listing"]["status"] == "sold"
+
+def test_cache_evicts_least_recent_and_expired_entries():
+    cache = ListingCache(max_entries=2, ttl=60)
+    cache.put(1, {"id": 1})
+    cache.put(2, {"id": 2})
+    cache.get(1)
+    cache.put(3, {"id": 3})
+    assert set(cache.get_many([1, 2, 3])) == {1, 3}
+
+    expired = ListingCache(ttl=0)
+    expired.put(1, {"id": 1})
+    assert expired.get(1) is None
+    assert len(expired) == 0
@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing, ListingImage
+from backend.database import get_db
+from backend.listing_index import listing_index
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_listing_fields.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+    listing_index.clear()
+
+@pytest.fixture(scope="function")
+def seeded(override_get_db):
+    db = override_get_db
+    db.add(User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller"))
+    db.commit()
+    for i in range(1, 6):
+        db.add(Listing(id=i, user_id=1, title=f"Listing {i}", description="x" * 4000, price_sek=100 * i,
+                       condition="good", city="Lund", status="published"))
+    db.commit()
+    # Listing 1 has two images in reverse insert order; listing 2 has none
+    db.add_all([
+        ListingImage(listing_id=1, url_card="/media/1b.card.jpg", url_thumb="/media/1b.thumb.jpg", sort_order=2),
+        ListingImage(listing_id=1, url_card="/media/1a.card.jpg", url_thumb="/media/1a.thumb.jpg", blurhash="LEHV6n", sort_order=1),
+    ] + [ListingImage(listing_id=i, url_card=f"/media/{i}.card.jpg", sort_order=1) for i in range(3, 6)])
+    db.commit()
+    return db
+
+def test_card_view(client, seeded):
+    cards = client.get("/listings/?view=card").json()
+    assert [card["id"] for card in cards] == [5, 4, 3, 2, 1]
+    assert set(cards[0]) == {"id", "title", "price_sek", "city", "image"}
+    assert cards[-1]["image"] == {"url_card": "/media/1a.card.jpg", "url_thumb": "/media/1a.thumb.jpg", "blurhash": "LEHV6n"}
+    assert cards[-2]["image"] is None
+    assert client.get("/listings/?view=full").json()[0]["description"] == "x" * 4000
+
+def test_fields_projection(client, seeded):
+    rows = client.get("/listings/?fields=title,created_at,images&sort=price_asc&limit=2").json()
+    assert [set(row) for row in rows] == [{"id", "title", "created_at", "images"}] * 2
+    assert [image["url_card"] for image in rows[0]["images"]] == ["/media/1b.card.jpg", "/media/1a.card.jpg"]
+    assert rows[0]["created_at"] == client.get("/listings/1").json()["created_at"]
+
+def test_card_view_does_not_select_description(client, seeded):
+    statements = []
+    capture = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        client.get("/listings/?view=card")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    # The page, then the first image of each listing on it
+    assert len(statements) == 2
+    assert not any("description" in statement for statement in statements)
+
+def test_card_view_with_column_index(client, seeded):
+    pytest.importorskip("numpy")
+    expected = client.get("/listings/?view=card&sort=price_desc").json()
+    listing_index.load(seeded)
+    assert client.get("/listings/?view=card&sort=price_desc").json() == expected
+
+def test_invalid_fields_and_view(client, seeded):
+    assert client.get("/listings/?fields=title,password_hash").status_code == 400
+    assert client.get("/listings/?fields=,").status_code == 400
+    assert client.get("/listings/?view=compact").status_code == 400
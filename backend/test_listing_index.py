@@ -0,0 +1,117 @@
+import random
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Category, Listing
+from backend.database import get_db
+from backend.listing_index import ListingColumnIndex, listing_index
+
+np = pytest.importorskip("numpy")
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_listing_index.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+CONDITIONS = ["new", "like_new", "good", "used", None]
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+    listing_index.clear()
+
+@pytest.fixture(scope="function")
+def seeded(override_get_db):
+    db = override_get_db
+    rng = random.Random(31)
+    user = User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller", city="Uppsala")
+    db.add(user)
+    db.add_all([Category(name=f"Category {i}", slug=f"category-{i}", sort_order=i) for i in range(1, 5)])
+    db.commit()
+    for i in range(400):
+        has_coords = rng.random() > 0.1
+        db.add(Listing(
+            user_id=user.id,
+            title=f"Listing {i}",
+            description="d",
+            # Few distinct prices so ties exercise the id tie-break
+            price_sek=rng.choice([100, 250, 500, 900, 1500, 5000]),
+            condition=rng.choice(CONDITIONS),
+            category_id=rng.choice([1, 2, 3, 4, None]),
+            latitude=59.0 + rng.random() if has_coords else None,
+            longitude=17.5 + rng.random() if has_coords else None,
+            status=rng.choice(["published"] * 4 + ["sold", "draft"]),
+        ))
+    db.commit()
+    return db
+
+QUERIES = [
+    "",
+    "?skip=20&limit=15",
+    "?category_id=2",
+    "?category_id=3&min_price=250&max_price=1500",
+    "?condition=good&sort=price_asc",
+    "?sort=price_desc&limit=50",
+    "?lat=59.5&lon=18.0&radius_km=20",
+    "?lat=59.5&lon=18.0&sort=distance&limit=30",
+    "?lat=59.2&lon=17.6&radius_km=35&sort=distance&category_id=1&skip=3",
+    "?condition=refurbished",
+    "?min_price=100000",
+]
+
+def test_index_matches_sql_path(client, seeded):
+    sql_results = {query: client.get(f"/listings/{query}").json() for query in QUERIES}
+    listing_index.load(seeded)
+    for query in QUERIES:
+        indexed = client.get(f"/listings/{query}").json()
+        assert [row["id"] for row in indexed] == [row["id"] for row in sql_results[query]], query
+    assert any(sql_results[query] for query in QUERIES)
+
+def test_index_follows_listing_writes(client, seeded):
+    listing_index.load(seeded)
+    payload = {"user_id": 1, "title": "Fresh", "description": "d", "price_sek": 7, "condition": "new", "category_id": 4,
+               "city": None, "latitude": None, "longitude": None, "status": "published", "slug": None, "canonical_url": None}
+    created = client.post("/listings/", json=payload).json()
+    assert client.get("/listings/?sort=price_asc&limit=1").json()[0]["id"] == created["id"]
+
+    client.put(f"/listings/{created['id']}", json={**payload, "price_sek": 10 ** 6})
+    assert client.get("/listings/?sort=price_desc&limit=1").json()[0]["id"] == created["id"]
+
+    client.put(f"/listings/{created['id']}", json={**payload, "status": "sold"})
+    assert created["id"] not in listing_index.search(limit=1000)
+
+    client.put(f"/listings/{created['id']}", json={**payload, "status": "published"})
+    client.delete(f"/listings/{created['id']}")
+    assert created["id"] not in listing_index.search(limit=1000)
+
+def test_invalid_sort_and_missing_origin(client):
+    assert client.get("/listings/?sort=cheapest").status_code == 400
+    assert client.get("/listings/?sort=distance").status_code == 400
+    assert client.get("/listings/?radius_km=5").status_code == 400
+
+def test_remove_compacts_tombstones():
+    index = ListingColumnIndex()
+    index.load_rows([(i, i, None, None, None, None) for i in range(1, 3001)])
+    for listing_id in range(1, 2001):
+        index.remove(listing_id)
+    assert len(index) == 1000
+    assert index._size < 3000
+    assert index.search(sort="price_asc", limit=3) == [2001, 2002, 2003]
+    index.upsert((5, 1, None, None, None, None))
+    assert index.search(sort="price_asc", limit=2) == [5, 2001]
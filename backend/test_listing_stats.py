@@ -0,0 +1,142 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Category, Listing, Order
+from backend.database import get_db
+from backend.listing_stats import reconcile_listing_aggregates, price_bucket
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_listing_stats.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def seller(override_get_db):
+    db = override_get_db
+    db.add(User(id=1, email="seller@example.com", password_hash="x", email_verified=True, name="Seller"))
+    db.add_all([Category(id=1, name="Möbler", slug="mobler"), Category(id=2, name="Cyklar", slug="cyklar")])
+    db.commit()
+    return 1
+
+def _payload(title, price, category_id=1, city="Lund", condition="good", status="published"):
+    return {"title": title, "description": f"{title} i fint skick", "price_sek": price, "condition": condition,
+            "category_id": category_id, "city": city, "latitude": None, "longitude": None, "status": status,
+            "slug": None, "canonical_url": None}
+
+def _create(client, seller, *args, **kwargs):
+    response = client.post("/listings/", json={**_payload(*args, **kwargs), "user_id": seller})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def _stats(client, **params):
+    response = client.get("/listings/stats", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+def test_stats_follow_creates_and_edits(client, seller):
+    _create(client, seller, "Soffa", 1200)
+    chair = _create(client, seller, "Stol", 80, city="Malmö", condition="new")
+    _create(client, seller, "Cykel", 3000, category_id=2)
+    _create(client, seller, "Utkast", 50, status="draft")
+
+    furniture = _stats(client, category_id=1)
+    assert (furniture["count"], furniture["min_price"], furniture["max_price"]) == (2, 80, 1200)
+    assert {b["min_price"]: b["count"] for b in furniture["buckets"] if b["count"]} == {0: 1, 1000: 1}
+    overall = _stats(client)
+    assert (overall["dimension"], overall["value"], overall["count"]) == ("all", None, 3)
+    assert _stats(client, city="Lund")["count"] == 2
+    assert _stats(client, condition="new")["max_price"] == 80
+
+    client.put(f"/listings/{chair}", json=_payload("Stol", 400, city="Lund", condition="new"))
+    furniture = _stats(client, category_id=1)
+    assert (furniture["count"], furniture["min_price"]) == (2, 400)
+    assert _stats(client, city="Malmö")["count"] == 0
+    assert _stats(client, city="Lund")["count"] == 3
+
+def test_status_flips_and_deletes_update_the_aggregates(client, seller, override_get_db):
+    sofa = _create(client, seller, "Soffa", 1200)
+    table = _create(client, seller, "Bord", 700)
+    lamp = _create(client, seller, "Lampa", 300)
+
+    client.put(f"/listings/{table}", json=_payload("Bord", 700, status="hidden"))
+    assert _stats(client, category_id=1)["count"] == 2
+    client.put(f"/listings/{table}", json=_payload("Bord", 700))
+    assert _stats(client, category_id=1)["count"] == 3
+    client.delete(f"/listings/{lamp}")
+    assert _stats(client, category_id=1)["count"] == 2
+
+    db = override_get_db
+    db.add(User(id=2, email="buyer@example.com", password_hash="x", name="Buyer"))
+    order = Order(buyer_id=2, seller_id=seller, listing_id=sofa, amount_sek=1200, delivery_type="pickup", status="created")
+    db.add(order)
+    db.commit()
+    client.post("/marketplace/payments/webhook", json={"order_id": order.id, "payment_status": "succeeded"})
+    stats = _stats(client, category_id=1)
+    assert (stats["count"], stats["min_price"], stats["max_price"]) == (1, 700, 700)
+    assert reconcile_listing_aggregates(db) == []
+
+def test_reconcile_repairs_writes_that_bypassed_the_api(client, seller, override_get_db):
+    _create(client, seller, "Soffa", 1200)
+    db = override_get_db
+    db.add(Listing(user_id=seller, title="Import", description="d", price_sek=20_000, category_id=1, status="published"))
+    db.commit()
+
+    drift = reconcile_listing_aggregates(db)
+    assert {(item.dimension, item.bucket) for item in drift} == {("all", price_bucket(20_000)), ("category", price_bucket(20_000))}
+    assert drift[0].stored == [0, 0, 0] and drift[0].actual == [1, 20_000, 20_000]
+    reconcile_listing_aggregates(db, fix=True)
+    assert reconcile_listing_aggregates(db) == []
+    assert _stats(client, category_id=1)["max_price"] == 20_000
+
+def test_stats_are_one_read(client, seller):
+    _create(client, seller, "Soffa", 1200)
+    statements = []
+    capture = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        assert _stats(client, category_id=1)["count"] == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert len(statements) == 1
+
+def test_stats_take_a_single_filter(client):
+    response = client.get("/listings/stats", params={"category_id": 1, "city": "Lund"})
+    assert response.status_code == 400
+    empty = _stats(client, category_id=99)
+    assert (empty["count"], empty["min_price"], empty["max_price"]) == (0, None, None)
+    assert len(empty["buckets"]) == 14
+
+def test_missing_aggregates_are_recounted_not_clamped(client, seller, override_get_db):
+    db = override_get_db
+    # Published listings the aggregates never saw, as when the table is created outside its migration
+    db.add_all([Listing(user_id=seller, title=title, description="d", price_sek=price, category_id=1, city="Lund",
+                        status="published") for title, price in (("Soffa", 1200), ("Bord", 700), ("Lampa", 300))])
+    db.commit()
+    lamp = db.query(Listing).filter_by(title="Lampa").one().id
+    assert _stats(client)["count"] == 0
+
+    client.put(f"/listings/{lamp}", json=_payload("Lampa", 300, status="draft"))
+    assert _stats(client)["count"] == 2
+    client.put(f"/listings/{lamp}", json=_payload("Lampa", 300))
+    assert _stats(client)["count"] == 3
+    assert reconcile_listing_aggregates(db) == []
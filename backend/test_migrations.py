@@ -0,0 +1,79 @@
+from pathlib import Path
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.models import Base
+from backend.listing_stats import reconcile_listing_aggregates
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+def _alembic_config(connection):
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["connection"] = connection
+    return config
+
+def test_migrations_match_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with engine.begin() as connection:
+        command.upgrade(_alembic_config(connection), "head")
+    with engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    assert diff == []
+
+def test_migrations_downgrade_to_base(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with engine.begin() as connection:
+        config = _alembic_config(connection)
+        command.upgrade(config, "head")
+        command.downgrade(config, "base")
+    with engine.connect() as connection:
+        tables = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).scalars().all()
+    assert tables == ["alembic_version"]
+
+def test_aggregates_migration_backfills_published_listings(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with engine.begin() as connection:
+        command.upgrade(_alembic_config(connection), "0010")
+        connection.exec_driver_sql(
+            "INSERT INTO listings (title, description, price_sek, category_id, city, condition, status) VALUES "
+            "('Soffa', 'd', 1200, 1, 'Lund', 'good', 'published'), ('Stol', 'd', 80, 1, 'Malmö', NULL, 'published'), "
+            "('Cykel', 'd', 1000000, NULL, '', 'new', 'published'), ('Lampa', 'd', 300, 1, 'Lund', 'good', 'sold')"
+        )
+    with engine.begin() as connection:
+        command.upgrade(_alembic_config(connection), "0011")
+    with Session(bind=engine) as db:
+        assert db.execute(Base.metadata.tables["listing_aggregates"].select()).all()
+        assert reconcile_listing_aggregates(db) == []
+
+def test_reporter_migration_keeps_one_report_per_reporter(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with engine.begin() as connection:
+        command.upgrade(_alembic_config(connection), "0012")
+        connection.exec_driver_sql(
+            "INSERT INTO listings (id, title, description, price_sek, status) VALUES (1, 'Soffa', 'd', 1200, 'hidden')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO listing_reports (listing_id, reporter_id, reason_code) VALUES "
+            "(1, 7, 'scam'), (1, 7, 'scam'), (1, NULL, 'scam'), (1, NULL, 'other')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO listing_report_counts (listing_id, reason_code, count) VALUES (1, 'scam', 3), (1, 'other', 1)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO listing_report_summaries (listing_id, report_count, score) VALUES (1, 4, 10)"
+        )
+    with engine.begin() as connection:
+        command.upgrade(_alembic_config(connection), "0013")
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM listing_reports").scalar() == 3
+        counts = dict(connection.exec_driver_sql("SELECT reason_code, count FROM listing_report_counts").all())
+        assert counts == {"scam": 2, "other": 1}
+        summary = connection.exec_driver_sql(
+            "SELECT report_count, score, hide_score FROM listing_report_summaries"
+        ).one()
+        assert tuple(summary) == (3, 7, 3)
@@ -0,0 +1,161 @@
+import re
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Category, Listing, ListingImage, ListingReport, Order
+from backend.database import get_db
+from backend.auth import pwd_context
+
+# A file-backed database seeded large enough that a full SCAN would hurt
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_query_plans.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+N_USERS = 2_000
+N_CATEGORIES = 20
+N_LISTINGS = 20_000
+
+# Routes that never touch the database
+NO_SQL_ROUTES = {"GET /", "GET /listings/suggest", "GET /metrics"}
+
+TABLES = set(Base.metadata.tables)
+SCAN_RE = re.compile(r"^SCAN (\w+)$")
+
+@pytest.fixture(scope="module")
+def seeded_db():
+    Base.metadata.create_all(bind=engine)
+    password_hash = pwd_context.hash("password123")
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "email": f"user{i}@example.com", "password_hash": password_hash, "email_verified": True,
+             "name": f"User {i}", "city": "Malmö"}
+            for i in range(1, N_USERS + 1)
+        ])
+        conn.execute(insert(Category), [
+            {"id": i, "name": f"Category {i}", "slug": f"category-{i}", "sort_order": i}
+            for i in range(1, N_CATEGORIES + 1)
+        ])
+        conn.execute(insert(Listing), [
+            {"id": i, "user_id": i % N_USERS + 1, "title": f"Listing {i}", "description": "A thing for sale",
+             "price_sek": 100 + i % 5000, "condition": "good", "category_id": i % N_CATEGORIES + 1,
+             "city": "Malmö", "latitude": 55.6, "longitude": 13.0,
+             "status": "sold" if i % 4 == 0 else "published", "slug": f"listing-{i}"}
+            for i in range(1, N_LISTINGS + 1)
+        ])
+        conn.execute(insert(ListingImage), [
+            {"listing_id": i, "url_full": f"/media/{i}.jpg", "url_card": f"/media/{i}.card.jpg",
+             "url_thumb": f"/media/{i}.thumb.jpg", "sort_order": 1}
+            for i in range(1, N_LISTINGS + 1)
+        ])
+        conn.execute(insert(ListingReport), [
+            {"listing_id": i, "reporter_id": i % N_USERS + 1, "reason_code": "other"}
+            for i in range(1, N_LISTINGS + 1, 10)
+        ])
+        conn.execute(insert(Order), [
+            {"buyer_id": i % N_USERS + 1, "seller_id": (i + 1) % N_USERS + 1, "listing_id": i,
+             "amount_sek": 100, "delivery_type": "pickup", "status": "paid"}
+            for i in range(4, N_LISTINGS + 1, 4)
+        ])
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="module")
+def client(seeded_db):
+    app.dependency_overrides[get_db] = lambda: seeded_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="module")
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(engine, "before_cursor_execute", capture)
+
+def _exercise_routes(client):
+    listing_payload = {
+        "user_id": 1, "title": "Plan test", "description": "Checking plans", "price_sek": 10,
+        "condition": "new", "category_id": 1, "city": "Malmö", "latitude": 55.6, "longitude": 13.0,
+        "status": "published", "slug": "plan-test", "canonical_url": None,
+    }
+    # (route key, method, url, json) - one entry per API route
+    yield "GET /listings/", "get", "/listings/?skip=100&limit=20", None
+    yield "GET /listings/", "get", "/listings/?skip=100&limit=20&view=card", None
+    yield "GET /listings/{listing_id}", "get", "/listings/123", None
+    yield "GET /listings/batch", "get", "/listings/batch?ids=130,4,999999,131", None
+    yield "GET /listings/stats", "get", "/listings/stats?category_id=3", None
+    yield "POST /listings/batch", "post", "/listings/batch", {"ids": list(range(140, 240))}
+    yield "POST /listings/", "post", "/listings/", listing_payload
+    yield "PUT /listings/{listing_id}", "put", "/listings/124", {**listing_payload, "status": "sold"}
+    yield "DELETE /listings/{listing_id}", "delete", "/listings/125", None
+    yield "POST /auth/register", "post", "/auth/register", {
+        "email": "plans@example.com", "password": "password123", "name": "Plans", "city": "Malmö"}
+    yield "POST /auth/login", "post", "/auth/login", {"email": "user7@example.com", "password": "wrong"}
+    yield "POST /auth/verify-email", "post", "/auth/verify-email", {"email": "user7@example.com", "token": "bad"}
+    yield "POST /auth/forgot", "post", "/auth/forgot", {"email": "user7@example.com"}
+    yield "POST /marketplace/checkout", "post", "/marketplace/checkout", {
+        "buyer_id": 9, "listing_id": 201, "delivery_type": "pickup"}
+    yield "POST /marketplace/payments/webhook", "post", "/marketplace/payments/webhook", {
+        "order_id": 10, "payment_status": "succeeded"}
+    yield "GET /marketplace/orders", "get", "/marketplace/orders?buyer_id=17", None
+    yield "GET /marketplace/orders/{order_id}", "get", "/marketplace/orders/10", None
+    yield "POST /listings/{listing_id}/reports", "post", "/listings/301/reports", {"reason_code": "scam"}
+    yield "GET /moderation/queue", "get", "/moderation/queue", None
+    yield "GET /users/{user_id}/stats", "get", "/users/42/stats", None
+    yield "GET /listings/{listing_id}/similar", "get", "/listings/123/similar", None
+    yield "POST /saved-searches/", "post", "/saved-searches/", {"user_id": 5, "keywords": "plan", "max_price": 100}
+    yield "GET /saved-searches/", "get", "/saved-searches/?user_id=5", None
+    yield "GET /saved-searches/alerts", "get", "/saved-searches/alerts?user_id=5", None
+    yield "DELETE /saved-searches/{search_id}", "delete", "/saved-searches/1", None
+    yield "GET /changes", "get", "/changes?since=1&limit=50", None
+
+def _full_scans(connection, statement, parameters):
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        match = SCAN_RE.match(detail)
+        # joinedload aliases tables as <table>_1; subqueries show up as anon_N
+        if match and re.sub(r"_\d+$", "", match.group(1)) in TABLES:
+            problems.append(detail)
+        elif "AUTOMATIC" in detail:
+            problems.append(detail)
+    return problems
+
+def test_every_route_is_exercised():
+    routes = {
+        f"{method.upper()} {path}"
+        for path, operations in app.openapi()["paths"].items()
+        for method in operations
+    }
+    exercised = {key for key, _, _, _ in _exercise_routes(None)}
+    assert routes - NO_SQL_ROUTES == exercised
+
+def test_hot_paths_do_not_scan_tables(client, captured_statements):
+    failures = []
+    for key, method, url, payload in _exercise_routes(client):
+        captured_statements.clear()
+        response = getattr(client, method)(url, json=payload) if payload is not None else getattr(client, method)(url)
+        assert response.status_code < 500, (key, response.text)
+        statements = list(captured_statements)
+        with engine.connect() as connection:
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE")):
+                    continue
+                problems = _full_scans(connection, statement, parameters)
+                if problems:
+                    failures.append(f"{key}: {problems}\n    {statement}")
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, RateLimitBucket
+from backend.database import get_db
+from backend import auth, rate_limit
+from backend.rate_limit import TokenBucketLimiter, prune_shared_buckets
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_rate_limit.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_bucket_refills_and_reports_wait():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter("test", burst=3, rate=0.5, clock=clock)
+    assert [limiter.take("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.take("a") == pytest.approx(2.0)
+    assert limiter.take("b") == 0
+    clock.now += 2
+    assert limiter.take("a") == 0
+    assert limiter.take("a") == pytest.approx(2.0)
+
+def test_least_recent_keys_are_evicted():
+    limiter = TokenBucketLimiter("test", burst=1, rate=0.01, max_keys=2)
+    limiter.take("a")
+    limiter.take("b")
+    limiter.take("a")
+    limiter.take("c")
+    assert len(limiter) == 2
+    assert limiter.take("a") > 0
+    # "b" was evicted and starts again with a full bucket
+    assert limiter.take("b") == 0
+
+def test_login_is_throttled_before_database_work(client, monkeypatch):
+    verifies = []
+    monkeypatch.setattr(auth.pwd_context, "dummy_verify", lambda: verifies.append(1))
+    for _ in range(rate_limit.LOGIN_EMAIL_LIMIT[0]):
+        assert client.post("/auth/login", json={"email": "Victim@example.com", "password": "guess"}).status_code == 401
+    assert len(verifies) == rate_limit.LOGIN_EMAIL_LIMIT[0]
+
+    statements = []
+    capture = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.post("/auth/login", json={"email": "victim@example.com", "password": "guess"})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert statements == []
+    assert len(verifies) == rate_limit.LOGIN_EMAIL_LIMIT[0]
+
+def test_ip_limit_spans_emails(client, monkeypatch):
+    monkeypatch.setattr(auth.pwd_context, "dummy_verify", lambda: None)
+    codes = [
+        client.post("/auth/login", json={"email": f"user{i}@example.com", "password": "guess"}).status_code
+        for i in range(rate_limit.LOGIN_IP_LIMIT[0] + 1)
+    ]
+    assert codes == [401] * rate_limit.LOGIN_IP_LIMIT[0] + [429]
+
+def test_sqlite_buckets_are_shared(override_get_db, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKEND", "sqlite")
+    # Two limiters standing in for the same limiter in two worker processes
+    first = TokenBucketLimiter("login_email", burst=2, rate=1 / 60)
+    second = TokenBucketLimiter("login_email", burst=2, rate=1 / 60)
+    assert first.take("a@example.com", override_get_db) == 0
+    assert second.take("a@example.com", override_get_db) == 0
+    assert first.take("a@example.com", override_get_db) == pytest.approx(60, abs=1)
+    assert second.take("b@example.com", override_get_db) == 0
+
+    bucket = override_get_db.get(RateLimitBucket, "login_email:a@example.com")
+    bucket.updated_at -= 3600
+    override_get_db.commit()
+    assert prune_shared_buckets(override_get_db) == 1
+    assert first.take("a@example.com", override_get_db) == 0
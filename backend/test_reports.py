@@ -0,0 +1,151 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing, ListingReport, ListingReportCount, ListingReportSummary
+from backend.database import get_db
+from backend import reports
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_reports.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def listings(override_get_db):
+    db = override_get_db
+    user = User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller", city="Umeå")
+    db.add(user)
+    db.commit()
+    created = []
+    for i in range(3):
+        listing = Listing(
+            user_id=user.id,
+            title=f"Listing {i}",
+            description=f"Description {i}",
+            price_sek=100 * (i + 1),
+            status="published",
+        )
+        db.add(listing)
+        created.append(listing)
+    db.commit()
+    return [listing.id for listing in created]
+
+def test_create_report_updates_counters(client, override_get_db, listings):
+    listing_id = listings[0]
+    response = client.post(f"/listings/{listing_id}/reports", json={"reason_code": "duplicate", "note": "Posted twice"})
+    assert response.status_code == 201
+    assert response.json()["report_count"] == 1
+    assert response.json()["score"] == reports.REPORT_REASON_WEIGHTS["duplicate"]
+
+    client.post(f"/listings/{listing_id}/reports", json={"reason_code": "duplicate"})
+    client.post(f"/listings/{listing_id}/reports", json={"reason_code": "offensive"})
+
+    db = override_get_db
+    assert db.query(ListingReport).filter(ListingReport.listing_id == listing_id).count() == 3
+    counts = {row.reason_code: row.count for row in db.query(ListingReportCount).filter(ListingReportCount.listing_id == listing_id)}
+    assert counts == {"duplicate": 2, "offensive": 1}
+    summary = db.get(ListingReportSummary, listing_id)
+    assert summary.report_count == 3
+    assert summary.score == 2 * reports.REPORT_REASON_WEIGHTS["duplicate"] + reports.REPORT_REASON_WEIGHTS["offensive"]
+
+def test_create_report_unknown_reason(client, listings):
+    response = client.post(f"/listings/{listings[0]}/reports", json={"reason_code": "boring"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown reason code"
+
+def test_create_report_listing_not_found(client, listings):
+    response = client.post("/listings/9999/reports", json={"reason_code": "scam"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Listing not found"
+
+@pytest.fixture(scope="function")
+def reporters(override_get_db):
+    db = override_get_db
+    users = [User(email=f"reporter{i}@example.com", password_hash="hashed_pw", email_verified=True, name=f"Reporter {i}")
+             for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    return [user.id for user in users]
+
+def test_threshold_hides_listing(client, override_get_db, listings, reporters, monkeypatch):
+    monkeypatch.setattr(reports, "REPORT_AUTO_HIDE_THRESHOLD", 6)
+    listing_id = listings[1]
+    first = client.post(f"/listings/{listing_id}/reports", json={"reason_code": "scam", "reporter_id": reporters[0]})
+    assert first.json()["listing_status"] == "published"
+    second = client.post(f"/listings/{listing_id}/reports", json={"reason_code": "scam", "reporter_id": reporters[1]})
+    assert second.json()["listing_status"] == "hidden"
+
+    db = override_get_db
+    assert db.get(ListingReportSummary, listing_id).auto_hidden_at is not None
+    browse_ids = [listing["id"] for listing in client.get("/listings/").json()]
+    assert listing_id not in browse_ids
+    assert set(browse_ids) == set(listings) - {listing_id}
+
+def test_reporters_count_once_and_anonymous_reports_never_hide(client, override_get_db, listings, reporters):
+    listing_id = listings[0]
+    for _ in range(3):
+        assert client.post(f"/listings/{listing_id}/reports", json={"reason_code": "scam"}).status_code == 201
+    first = client.post(f"/listings/{listing_id}/reports", json={"reason_code": "scam", "reporter_id": reporters[0]})
+    assert first.json()["listing_status"] == "published"
+    repeat = client.post(f"/listings/{listing_id}/reports", json={"reason_code": "prohibited", "reporter_id": reporters[0]})
+    assert repeat.status_code == 409
+
+    db = override_get_db
+    summary = db.get(ListingReportSummary, listing_id, populate_existing=True)
+    assert (summary.report_count, summary.score, summary.hide_score) == (4, 12, 3)
+    assert db.query(ListingReport).filter(ListingReport.listing_id == listing_id).count() == 4
+    assert client.get(f"/listings/{listing_id}").json()["status"] == "published"
+    # The queue still ranks the listing by every report
+    assert client.get("/moderation/queue").json()[0]["listing_id"] == listing_id
+
+def test_moderation_queue_sorted_by_score(client, listings):
+    client.post(f"/listings/{listings[0]}/reports", json={"reason_code": "other"})
+    client.post(f"/listings/{listings[2]}/reports", json={"reason_code": "scam"})
+    client.post(f"/listings/{listings[2]}/reports", json={"reason_code": "duplicate"})
+
+    response = client.get("/moderation/queue")
+    assert response.status_code == 200
+    queue = response.json()
+    assert [item["listing_id"] for item in queue] == [listings[2], listings[0]]
+    assert queue[0]["counts"] == {"scam": 1, "duplicate": 1}
+    assert queue[0]["score"] == 4
+    assert queue[0]["title"] == "Listing 2"
+
+    response = client.get("/moderation/queue?min_score=2")
+    assert [item["listing_id"] for item in response.json()] == [listings[2]]
+
+def test_moderation_queue_pages_by_score_and_id(client, listings):
+    for listing_id in listings[:3]:
+        client.post(f"/listings/{listing_id}/reports", json={"reason_code": "other"})
+    client.post(f"/listings/{listings[0]}/reports", json={"reason_code": "scam"})
+
+    first = client.get("/moderation/queue", params={"limit": 2}).json()
+    assert [item["listing_id"] for item in first] == [listings[0], listings[2]]
+    last = first[-1]
+    rest = client.get("/moderation/queue", params={
+        "limit": 2, "before_score": last["score"], "before_id": last["listing_id"],
+    }).json()
+    assert [item["listing_id"] for item in rest] == [listings[1]]
+
+    assert client.get("/moderation/queue", params={"limit": 201}).status_code == 422
+    assert client.get("/moderation/queue", params={"before_score": 1}).status_code == 400
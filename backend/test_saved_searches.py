@@ -0,0 +1,119 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Category, SavedSearchAnchor, SavedSearchAlert
+from backend.database import get_db
+from backend.saved_searches import percolate_listing
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_saved_searches.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def users(override_get_db):
+    db = override_get_db
+    db.add_all([
+        User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller"),
+        User(email="buyer@example.com", password_hash="hashed_pw", email_verified=True, name="Buyer"),
+    ])
+    db.add(Category(name="Furniture", slug="furniture", sort_order=1))
+    db.commit()
+
+def _listing_payload(**overrides):
+    payload = {"user_id": 1, "title": "Grå soffa", "description": "Tre sits, fint skick", "price_sek": 1500,
+               "condition": "good", "category_id": 1, "city": "Stockholm", "latitude": 59.33, "longitude": 18.06,
+               "status": "published", "slug": None, "canonical_url": None}
+    payload.update(overrides)
+    return payload
+
+def _alert_listing_ids(client, user_id=2):
+    return [alert["listing_id"] for alert in client.get(f"/saved-searches/alerts?user_id={user_id}").json()]
+
+def test_create_saved_search_files_one_anchor(client, override_get_db, users):
+    response = client.post("/saved-searches/", json={
+        "user_id": 2, "name": "Soffa i sthlm", "keywords": "Soffa, grå", "max_price": 2000, "city": "Stockholm"})
+    assert response.status_code == 201
+    data = response.json()
+    assert data["keywords"] == "soffa grå"
+    anchors = override_get_db.query(SavedSearchAnchor.kind, SavedSearchAnchor.value).all()
+    assert anchors == [("kw", "soffa")]
+    assert client.get("/saved-searches/?user_id=2").json()[0]["id"] == data["id"]
+
+def test_invalid_saved_searches(client, users):
+    assert client.post("/saved-searches/", json={"user_id": 2}).status_code == 400
+    assert client.post("/saved-searches/", json={"user_id": 2, "radius_km": 5}).status_code == 400
+    assert client.post("/saved-searches/", json={"user_id": 99, "city": "Lund"}).status_code == 404
+
+def test_new_listing_alerts_matching_searches(client, users):
+    client.post("/saved-searches/", json={"user_id": 2, "name": "cheap sofa", "keywords": "soffa", "max_price": 2000, "city": "stockholm"})
+    client.post("/saved-searches/", json={"user_id": 2, "name": "nearby", "latitude": 59.3, "longitude": 18.1, "radius_km": 10})
+    client.post("/saved-searches/", json={"user_id": 2, "name": "furniture", "category_id": 1, "min_price": 5000})
+    client.post("/saved-searches/", json={"user_id": 2, "name": "gothenburg", "city": "Göteborg"})
+
+    listing = client.post("/listings/", json=_listing_payload()).json()
+    alerts = client.get("/saved-searches/alerts?user_id=2").json()
+    assert sorted(alert["search_name"] for alert in alerts) == ["cheap sofa", "nearby"]
+    assert {alert["listing_id"] for alert in alerts} == {listing["id"]}
+    assert alerts[0]["title"] == "Grå soffa"
+
+    expensive = client.post("/listings/", json=_listing_payload(title="Bord", price_sek=8000, latitude=57.7, longitude=11.9)).json()
+    assert _alert_listing_ids(client).count(expensive["id"]) == 1
+
+def test_edits_do_not_repeat_alerts(client, users):
+    client.post("/saved-searches/", json={"user_id": 2, "keywords": "soffa"})
+    draft = client.post("/listings/", json=_listing_payload(status="draft")).json()
+    assert _alert_listing_ids(client) == []
+    client.put(f"/listings/{draft['id']}", json=_listing_payload())
+    client.put(f"/listings/{draft['id']}", json=_listing_payload(price_sek=1400))
+    assert _alert_listing_ids(client) == [draft["id"]]
+
+def test_own_listings_and_deleted_searches_do_not_alert(client, override_get_db, users):
+    own = client.post("/saved-searches/", json={"user_id": 1, "keywords": "soffa"}).json()
+    client.post("/listings/", json=_listing_payload())
+    assert _alert_listing_ids(client, user_id=1) == []
+
+    search = client.post("/saved-searches/", json={"user_id": 2, "keywords": "soffa"}).json()
+    assert client.delete(f"/saved-searches/{search['id']}").status_code == 204
+    assert client.delete(f"/saved-searches/{search['id']}").status_code == 404
+    client.post("/listings/", json=_listing_payload(title="Soffa igen"))
+    assert _alert_listing_ids(client) == []
+    assert override_get_db.query(SavedSearchAnchor).filter(SavedSearchAnchor.search_id == search["id"]).count() == 0
+    assert own["id"] != search["id"]
+
+def test_percolate_skips_drafts_and_existing_alerts(client, override_get_db, users):
+    for i in range(50):
+        client.post("/saved-searches/", json={"user_id": 2, "keywords": f"unrelated{i}"})
+    client.post("/saved-searches/", json={"user_id": 2, "keywords": "soffa"})
+    listing = client.post("/listings/", json=_listing_payload(status="draft")).json()
+    override_get_db.query(SavedSearchAlert).delete()
+    override_get_db.commit()
+    assert percolate_listing(engine, listing["id"]) == 0  # drafts never alert
+    client.put(f"/listings/{listing['id']}", json=_listing_payload())
+    assert _alert_listing_ids(client) == [listing["id"]]
+    assert percolate_listing(engine, listing["id"]) == 0
+
+def test_alert_pages_are_bounded(client, users):
+    assert client.get("/saved-searches/alerts", params={"user_id": 2, "limit": 200}).status_code == 200
+    assert client.get("/saved-searches/alerts", params={"user_id": 2, "limit": 201}).status_code == 422
+    assert client.get("/saved-searches/alerts", params={"user_id": 2, "limit": 0}).status_code == 422
@@ -0,0 +1,216 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session, sessionmaker
+from backend.main import app
+from backend.models import (
+    Base, User, Listing, ListingImage, ListingReport, ListingReportSummary, ListingChange, ListingAggregate,
+    ListingSignature, ListingSimilar, ArchivedListing,
+)
+from backend.database import get_db
+from backend import dedupe
+from backend.archive import archive_listings
+from backend.listing_stats import reconcile_listing_aggregates
+from backend.sharding import ShardRouter, region_for, shard_for_id, SHARD_ID_SPAN
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_sharding.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def router(tmp_path):
+    Base.metadata.create_all(bind=engine)
+    router = ShardRouter(engine, tmp_path)
+    try:
+        yield router
+    finally:
+        for shard_engine in router.engines.values():
+            if shard_engine is not engine:
+                shard_engine.dispose()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(router):
+    def sharded_db():
+        db = router.session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sharded_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def seller(router):
+    with TestingSessionLocal() as db:
+        db.add(User(id=1, email="seller@example.com", password_hash="x", email_verified=True, name="Seller"))
+        db.commit()
+    return 1
+
+def _create(client, seller, title, price, city=None, latitude=None, longitude=None):
+    response = client.post("/listings/", json={
+        "user_id": seller, "title": title, "description": f"{title} i fint skick", "price_sek": price,
+        "condition": "good", "category_id": None, "city": city, "latitude": latitude, "longitude": longitude,
+        "status": "published", "slug": None, "canonical_url": None,
+    })
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def _stored_ids(router, shard):
+    with Session(bind=router.engines[shard]) as db:
+        return set(db.scalars(select(Listing.id)))
+
+def test_regions_by_city_then_coordinates():
+    assert region_for("Malmö") == "south"
+    assert region_for(" GÖTEBORG ") == region_for("Gothenburg") == "west"
+    assert region_for("Stockholm", 67.8, 20.2) == "east"
+    assert region_for("Abisko", 68.35, 18.8) == "north"
+    assert region_for(None, 58.3, 12.3) == "west"
+    assert region_for(None, 59.3, 18.1) == "east"
+    assert region_for("Okänd") == "east"
+    assert shard_for_id(1) == shard_for_id(SHARD_ID_SPAN) == "main"
+    assert shard_for_id(SHARD_ID_SPAN + 1) == "south"
+    assert shard_for_id(4 * SHARD_ID_SPAN + 7) == "north"
+
+def test_listings_live_on_their_region_shard(client, router, seller):
+    lund = _create(client, seller, "Soffa", 1200, city="Lund")
+    kiruna = _create(client, seller, "Skidor", 900, latitude=67.85, longitude=20.2)
+    stockholm = _create(client, seller, "Cykel", 3000, city="Stockholm")
+    assert (shard_for_id(lund), shard_for_id(kiruna), shard_for_id(stockholm)) == ("south", "north", "east")
+    assert _stored_ids(router, "south") == {lund}
+    assert _stored_ids(router, "north") == {kiruna}
+    assert _stored_ids(router, "main") == set()
+
+    # The change feed and aggregates stay in the main database
+    with TestingSessionLocal() as db:
+        assert {change.listing_id for change in db.query(ListingChange)} == {lund, kiruna, stockholm}
+        assert sum(aggregate.count for aggregate in db.query(ListingAggregate).filter_by(dimension="all")) == 3
+
+    assert client.get(f"/listings/{kiruna}").json()["title"] == "Skidor"
+    assert client.post(f"/listings/{kiruna}/reports", json={"reason_code": "scam"}).status_code == 201
+    # Reports and their counters stay with the listing they are about
+    with Session(bind=router.engines["north"]) as db:
+        assert db.scalar(select(func.count()).select_from(ListingReport)) == 1
+        assert db.get(ListingReportSummary, kiruna).report_count == 1
+    # Moving city does not move the listing; its id keeps pointing at the shard it was created on
+    update = client.put(f"/listings/{lund}", json={
+        "title": "Soffa", "description": "Soffa", "price_sek": 1000, "condition": "good", "category_id": None,
+        "city": "Umeå", "latitude": None, "longitude": None, "status": "published", "slug": None, "canonical_url": None,
+    })
+    assert update.json()["city"] == "Umeå"
+    assert _stored_ids(router, "south") == {lund}
+    assert client.delete(f"/listings/{stockholm}").status_code == 204
+    assert _stored_ids(router, "east") == set()
+    assert client.get(f"/listings/{stockholm}").status_code == 404
+
+def test_browse_merges_every_shard_in_order(client, router, seller):
+    with TestingSessionLocal() as db:
+        db.add(Listing(id=5, user_id=seller, title="Gammal", description="d", price_sek=450, status="published"))
+        db.commit()
+    prices = {"Malmö": 300, "Göteborg": 100, "Uppsala": 700, "Luleå": 200, "Lund": 600, "Borås": 500}
+    ids = {city: _create(client, seller, f"Sak i {city}", price, city=city) for city, price in prices.items()}
+    with Session(bind=router.engines["south"]) as db:
+        db.add(ListingImage(listing_id=ids["Malmö"], url_card="/media/malmo.card.jpg", sort_order=0))
+        db.commit()
+
+    page = client.get("/listings/", params={"sort": "price_asc", "skip": 1, "limit": 3}).json()
+    assert [listing["price_sek"] for listing in page] == [200, 300, 450]
+    assert page[1]["images"][0]["url_card"] == "/media/malmo.card.jpg"
+    under_550 = client.get("/listings/", params={"sort": "price_desc", "limit": 2, "max_price": 550}).json()
+    assert [listing["id"] for listing in under_550] == [ids["Borås"], 5]
+    cards = client.get("/listings/", params={"view": "card", "sort": "price_asc", "limit": 2}).json()
+    assert [card["id"] for card in cards] == [ids["Göteborg"], ids["Luleå"]]
+    newest = client.get("/listings/", params={"limit": 100}).json()
+    assert sorted(listing["id"] for listing in newest) == sorted([5, *ids.values()])
+
+def test_batch_reads_only_the_shards_it_names(client, router, seller):
+    malmo = _create(client, seller, "Lampa", 150, city="Malmö")
+    umea = _create(client, seller, "Kajak", 4000, city="Umeå")
+    statements = {name: [] for name in router.engines}
+    listeners = []
+    for name, shard_engine in router.engines.items():
+        capture = lambda conn, cursor, statement, *args, name=name: statements[name].append(statement)
+        event.listen(shard_engine, "before_cursor_execute", capture)
+        listeners.append((shard_engine, capture))
+    try:
+        items = client.get("/listings/batch", params={"ids": f"{umea},{malmo},999"}).json()
+    finally:
+        for shard_engine, capture in listeners:
+            event.remove(shard_engine, "before_cursor_execute", capture)
+    assert [item["found"] for item in items] == [True, True, False]
+    assert statements["west"] == [] and statements["east"] == []
+    assert statements["south"] and statements["north"]
+
+def test_per_listing_rows_follow_their_listing(client, router, seller, monkeypatch):
+    monkeypatch.setattr(dedupe, "DUPLICATE_ACTION", "reject")
+    lund = _create(client, seller, "Ekbord med sex stolar", 2500, city="Lund")
+    with Session(bind=router.engines["south"]) as db:
+        assert db.get(ListingSignature, lund) is not None
+    # The duplicate check joins signatures to listings, on every shard
+    duplicate = client.post("/listings/", json={
+        "user_id": seller, "title": "Ekbord med sex stolar", "description": "Ekbord med sex stolar i fint skick",
+        "price_sek": 2500, "condition": "good", "category_id": None, "city": "Umeå", "latitude": None,
+        "longitude": None, "status": "published", "slug": None, "canonical_url": None,
+    })
+    assert duplicate.status_code == 409
+
+    umea = _create(client, seller, "Kanot", 5000, city="Umeå")
+    with TestingSessionLocal() as db:
+        db.add_all([User(id=user_id, email=f"user{user_id}@example.com", password_hash="x", email_verified=True,
+                         name=f"User {user_id}") for user_id in (2, 3)])
+        db.commit()
+    for reporter_id in (2, 3):
+        client.post(f"/listings/{lund}/reports", json={"reason_code": "scam", "reporter_id": reporter_id})
+    client.post(f"/listings/{umea}/reports", json={"reason_code": "other"})
+    assert client.get(f"/listings/{lund}").json()["status"] == "hidden"
+    queue = client.get("/moderation/queue").json()
+    assert [(item["listing_id"], item["score"]) for item in queue] == [(lund, 6), (umea, 1)]
+    assert queue[0]["counts"] == {"scam": 2} and queue[0]["listing_status"] == "hidden"
+    rest = client.get("/moderation/queue", params={"limit": 1, "before_score": 6, "before_id": lund}).json()
+    assert [item["listing_id"] for item in rest] == [umea]
+
+def test_similar_neighbours_on_other_shards(client, router, seller):
+    lund = _create(client, seller, "Soffa", 1200, city="Lund")
+    umea = _create(client, seller, "Soffa grå", 1500, city="Umeå")
+    with Session(bind=router.engines["south"]) as db:
+        db.add(ListingSimilar(listing_id=lund, rank=1, neighbor_id=umea, score=0.8))
+        db.commit()
+    similar = client.get(f"/listings/{lund}/similar").json()
+    assert [(item["id"], item["title"]) for item in similar] == [(umea, "Soffa grå")]
+
+def test_alerts_and_background_tasks_reach_the_shards(client, router, seller):
+    with TestingSessionLocal() as db:
+        db.add(User(id=2, email="buyer@example.com", password_hash="x", email_verified=True, name="Buyer"))
+        db.commit()
+    client.post("/saved-searches/", json={"user_id": 2, "keywords": "cykel"})
+    malmo = _create(client, seller, "Cykel", 900, city="Malmö")
+    alerts = client.get("/saved-searches/alerts", params={"user_id": 2}).json()
+    assert [(alert["listing_id"], alert["title"], alert["price_sek"]) for alert in alerts] == [(malmo, "Cykel", 900)]
+
+def test_maintenance_jobs_cover_every_shard(client, router, seller):
+    sold = _create(client, seller, "Skåp", 700, city="Göteborg")
+    live = _create(client, seller, "Hylla", 300, city="Luleå")
+    client.put(f"/listings/{sold}", json={
+        "title": "Skåp", "description": "Skåp", "price_sek": 700, "condition": "good", "category_id": None,
+        "city": "Göteborg", "latitude": None, "longitude": None, "status": "sold", "slug": None, "canonical_url": None,
+    })
+    with router.session() as db:
+        assert archive_listings(db, older_than_days=-1) == 1
+        assert db.get(ArchivedListing, sold).title == "Skåp"
+        assert reconcile_listing_aggregates(db) == []
+    assert _stored_ids(router, "west") == set()
+    assert client.get(f"/listings/{sold}").json()["status"] == "sold"
+    assert client.get(f"/listings/{live}").json()["status"] == "published"
+
+    with Session(bind=router.engines["north"]) as db:
+        db.query(ListingSignature).delete()
+        db.commit()
+    with router.session() as db:
+        assert dedupe.backfill_signatures(db, batch_size=1) == 1
+    with Session(bind=router.engines["north"]) as db:
+        assert db.get(ListingSignature, live) is not None
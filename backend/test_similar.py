@@ -0,0 +1,101 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Category, Listing, ListingSimilar
+from backend.database import get_db
+from backend import similar
+from backend.similar import build_similar
+
+pytest.importorskip("scipy")
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_similar.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+    similar.set_model(None)
+
+@pytest.fixture(scope="function")
+def listings(override_get_db):
+    db = override_get_db
+    user = User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller", city="Umeå")
+    db.add(user)
+    db.add_all([Category(name="Electronics", slug="electronics", sort_order=1),
+                Category(name="Furniture", slug="furniture", sort_order=2)])
+    db.commit()
+    rows = {
+        "iphone13": ("iPhone 13 Pro 128GB", "Fint skick, laddare ingår", 1, 6000),
+        "iphone12": ("iPhone 12 128GB", "Laddare ingår, repig baksida", 1, 4500),
+        "iphone_case": ("Skal till iPhone 13", "Silikonskal", 1, 100),
+        "sofa": ("Grå soffa tre sits", "Bäddsoffa från Ikea i fint skick", 2, 2500),
+        "sofa2": ("Soffa tre sits", "Manchester, grå", 2, 3000),
+        "table": ("Soffbord ek", "Massiv ek", 2, 800),
+    }
+    listings = {}
+    for name, (title, description, category_id, price) in rows.items():
+        listings[name] = Listing(user_id=user.id, title=title, description=description, category_id=category_id,
+                                 price_sek=price, status="published")
+    db.add_all(listings.values())
+    db.commit()
+    return {name: listing.id for name, listing in listings.items()}
+
+def _listing_payload(**overrides):
+    payload = {"user_id": 1, "title": "iPhone 13 mini", "description": "Laddare ingår", "price_sek": 5000,
+               "condition": None, "category_id": 1, "city": None, "latitude": None, "longitude": None,
+               "status": "published", "slug": None, "canonical_url": None}
+    payload.update(overrides)
+    return payload
+
+def test_build_ranks_text_category_and_price(client, override_get_db, listings, tmp_path):
+    assert build_similar(override_get_db, model_path=str(tmp_path / "model.npz")) == len(listings)
+    response = client.get(f"/listings/{listings['iphone13']}/similar")
+    assert response.status_code == 200
+    ids = [item["id"] for item in response.json()]
+    # Same words, category and price band beat a cheap accessory that only shares words
+    assert ids[:2] == [listings["iphone12"], listings["iphone_case"]]
+    assert listings["table"] not in ids
+    assert [item["id"] for item in client.get(f"/listings/{listings['sofa']}/similar").json()][0] == listings["sofa2"]
+    assert (tmp_path / "model.npz").exists()
+
+def test_sold_neighbours_are_hidden(client, override_get_db, listings, tmp_path):
+    db = override_get_db
+    build_similar(db, model_path=None)
+    db.query(Listing).filter(Listing.id == listings["iphone12"]).update({"status": "sold"})
+    db.commit()
+    ids = [item["id"] for item in client.get(f"/listings/{listings['iphone13']}/similar").json()]
+    assert listings["iphone12"] not in ids
+
+    build_similar(db, model_path=None)
+    assert db.query(ListingSimilar).filter(ListingSimilar.listing_id == listings["iphone12"]).count() == 0
+
+def test_new_listing_is_added_incrementally(client, override_get_db, listings, tmp_path, monkeypatch):
+    monkeypatch.setattr(similar, "SIMILAR_MODEL_PATH", str(tmp_path / "model.npz"))
+    build_similar(override_get_db)
+    similar.set_model(None)  # the API process picks the model up from disk
+    created = client.post("/listings/", json=_listing_payload()).json()
+    own = [item["id"] for item in client.get(f"/listings/{created['id']}/similar").json()]
+    assert own[0] in (listings["iphone13"], listings["iphone12"])
+    neighbour = [item["id"] for item in client.get(f"/listings/{listings['iphone12']}/similar").json()]
+    assert created["id"] in neighbour
+
+def test_similar_unknown_listing(client):
+    assert client.get("/listings/999/similar").status_code == 404
@@ -0,0 +1,58 @@
+import shutil
+from pathlib import Path
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, event, inspect
+from backend.models import Base, SCHEMA_REVISION
+from backend.database import ensure_schema
+from backend.bench_startup import measure_startup, DATABASE, IMPORT_BUDGET_MS, FIRST_REQUEST_BUDGET_MS
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+def test_schema_revision_is_the_migration_head():
+    head = ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+    assert SCHEMA_REVISION == head
+
+def test_current_schema_skips_ddl(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    assert ensure_schema(engine, Base.metadata, SCHEMA_REVISION)
+    assert set(inspect(engine).get_table_names()) >= set(Base.metadata.tables)
+
+    statements = []
+    capture = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        assert not ensure_schema(engine, Base.metadata, SCHEMA_REVISION)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert len(statements) == 2 and "alembic_version" in statements[1]
+    # A database alembic has at another revision needs the migrations, not create_all
+    with pytest.raises(RuntimeError, match="upgrade head"):
+        ensure_schema(engine, Base.metadata, "9999")
+
+def test_unmigrated_database_is_refused(tmp_path):
+    database = tmp_path / "marketplace.db"
+    shutil.copyfile(DATABASE, database)
+    engine = create_engine(f"sqlite:///{database}")
+    before = set(inspect(engine).get_table_names())
+    with pytest.raises(RuntimeError, match="stamp 0001"):
+        ensure_schema(engine, Base.metadata, SCHEMA_REVISION)
+    assert set(inspect(engine).get_table_names()) == before
+
+    # The README's steps then bring it to the revision startup expects
+    with engine.begin() as connection:
+        config = Config(str(ALEMBIC_INI))
+        config.attributes["connection"] = connection
+        command.stamp(config, "0001")
+        command.upgrade(config, "head")
+    assert not ensure_schema(engine, Base.metadata, SCHEMA_REVISION)
+
+def test_startup_within_budget():
+    before = DATABASE.read_bytes()
+    runs = [measure_startup() for _ in range(3)]
+    assert runs[0]["deferred_loaded"] == []
+    assert min(run["import_ms"] for run in runs) < IMPORT_BUDGET_MS
+    assert min(run["first_request_ms"] for run in runs) < FIRST_REQUEST_BUDGET_MS
+    assert DATABASE.read_bytes() == before
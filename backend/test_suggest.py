@@ -0,0 +1,97 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing
+from backend.database import get_db
+from backend.suggest import TitlePrefixIndex, title_suggest, title_terms
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_suggest.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+    title_suggest.clear()
+
+@pytest.fixture(scope="function")
+def seeded(client, override_get_db):
+    db = override_get_db
+    user = User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller", city="Lund")
+    db.add(user)
+    db.commit()
+    titles = ["iPhone 13 Pro", "iPhone 12", "iPad Air", "Ikea soffa", "Soffbord i ek", "iPhone laddare"]
+    db.add_all([Listing(user_id=user.id, title=title, description="d", price_sek=100, status="published") for title in titles])
+    db.add(Listing(user_id=user.id, title="iPod classic", description="d", price_sek=100, status="sold"))
+    db.commit()
+    title_suggest.load(db)
+    return db
+
+def _listing_payload(**overrides):
+    payload = {"user_id": 1, "title": "Ipod nano", "description": "d", "price_sek": 5, "condition": None,
+               "category_id": None, "city": None, "latitude": None, "longitude": None, "status": "published",
+               "slug": None, "canonical_url": None}
+    payload.update(overrides)
+    return payload
+
+def test_suggest_ranks_by_frequency(client, seeded):
+    response = client.get("/listings/suggest?prefix=Ip")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"text": "iphone", "count": 3},
+        {"text": "ipad", "count": 1},
+    ]
+    assert [s["text"] for s in client.get("/listings/suggest?prefix=sof").json()] == ["soffa", "soffbord"]
+
+def test_suggest_completes_last_word(client, seeded):
+    assert client.get("/listings/suggest?prefix=iPhone 1").json() == [
+        {"text": "iPhone 12", "count": 1},
+        {"text": "iPhone 13", "count": 1},
+    ]
+    assert client.get("/listings/suggest?prefix=iphone ").json() == []
+    assert client.get("/listings/suggest?prefix=").status_code == 422
+
+def test_suggest_follows_listing_writes(client, seeded):
+    created = client.post("/listings/", json=_listing_payload()).json()
+    assert client.get("/listings/suggest?prefix=ipo").json() == [{"text": "ipod", "count": 1}]
+
+    client.put(f"/listings/{created['id']}", json=_listing_payload(title="Ipad mini"))
+    assert client.get("/listings/suggest?prefix=ipo").json() == []
+    assert client.get("/listings/suggest?prefix=ipa").json() == [{"text": "ipad", "count": 2}]
+
+    client.put(f"/listings/{created['id']}", json=_listing_payload(title="Ipad mini", status="sold"))
+    assert client.get("/listings/suggest?prefix=ipa").json() == [{"text": "ipad", "count": 1}]
+
+    client.put(f"/listings/{created['id']}", json=_listing_payload(title="Ipad mini"))
+    client.delete(f"/listings/{created['id']}")
+    assert client.get("/listings/suggest?prefix=mi").json() == []
+
+def test_title_terms_normalize():
+    assert title_terms("Fåtölj FÅTÖLJ, 2 st i ek!") == {"fåtölj", "st", "ek"}
+
+def test_memory_budget_evicts_rare_terms():
+    index = TitlePrefixIndex(memory_budget=10_000)
+    index.load_titles(["common word"] * 50 + [f"rare{i}" for i in range(200)])
+    assert index.memory_bytes <= 10_000
+    assert index.evicted > 0
+    assert index.suggest("com") == [("common", 50)]
+    index.update(None, "rare199 common")
+    assert index.memory_bytes <= 10_000
+    assert index.suggest("common") == [("common", 51)]
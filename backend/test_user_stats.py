@@ -0,0 +1,141 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, Listing, Order, UserStats
+from backend.database import get_db
+from backend.listing_stats import reconcile_listing_aggregates
+from backend.user_stats import reconcile_user_stats
+from datetime import datetime, timezone
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_user_stats.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+@pytest.fixture(scope="function")
+def marketplace(override_get_db):
+    db = override_get_db
+    seller = User(email="seller@example.com", password_hash="hashed_pw", email_verified=True, name="Seller", city="Lund")
+    buyer = User(email="buyer@example.com", password_hash="hashed_pw", email_verified=True, name="Buyer", city="Lund")
+    db.add_all([seller, buyer])
+    db.commit()
+    listing = Listing(user_id=seller.id, title="Bike", description="Red bike", price_sek=1200, status="published")
+    db.add(listing)
+    db.commit()
+    return {"seller_id": seller.id, "buyer_id": buyer.id, "listing_id": listing.id}
+
+def _pay(client, db, marketplace, amount=1200):
+    order = Order(
+        buyer_id=marketplace["buyer_id"],
+        seller_id=marketplace["seller_id"],
+        listing_id=marketplace["listing_id"],
+        amount_sek=amount,
+        delivery_type="pickup",
+        status="created",
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(order)
+    db.commit()
+    response = client.post("/marketplace/payments/webhook", json={"order_id": order.id, "payment_status": "succeeded"})
+    assert response.status_code == 200
+    return order.id
+
+def test_stats_for_user_without_activity(client, marketplace):
+    response = client.get(f"/users/{marketplace['seller_id']}/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["items_sold"] == 0
+    assert data["revenue_sek"] == 0
+    assert data["member_since"] is not None
+
+def test_stats_user_not_found(client):
+    response = client.get("/users/9999/stats")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "User not found"
+
+def test_register_creates_stats_row(client, override_get_db):
+    client.post(
+        "/auth/register",
+        json={"email": "new@example.com", "password": "password123", "name": "New User", "city": "Kiruna"}
+    )
+    db = override_get_db
+    user = db.query(User).filter(User.email == "new@example.com").first()
+    stats = db.get(UserStats, user.id)
+    assert stats is not None
+    assert stats.member_since is not None
+
+def test_paid_order_updates_seller_and_buyer(client, override_get_db, marketplace):
+    order_id = _pay(client, override_get_db, marketplace)
+    # A repeated webhook delivery must not count the sale twice
+    client.post("/marketplace/payments/webhook", json={"order_id": order_id, "payment_status": "succeeded"})
+
+    seller = client.get(f"/users/{marketplace['seller_id']}/stats").json()
+    assert seller["items_sold"] == 1
+    assert seller["revenue_sek"] == 1200
+    buyer = client.get(f"/users/{marketplace['buyer_id']}/stats").json()
+    assert buyer["items_bought"] == 1
+    assert buyer["spent_sek"] == 1200
+    assert reconcile_user_stats(override_get_db) == []
+
+def test_failed_after_paid_reverses_order_stats(client, override_get_db, marketplace):
+    order_id = _pay(client, override_get_db, marketplace)
+    client.post("/marketplace/payments/webhook", json={"order_id": order_id, "payment_status": "failed"})
+    seller = client.get(f"/users/{marketplace['seller_id']}/stats").json()
+    buyer = client.get(f"/users/{marketplace['buyer_id']}/stats").json()
+    assert (seller["items_sold"], seller["revenue_sek"]) == (0, 0)
+    assert (buyer["items_bought"], buyer["spent_sek"]) == (0, 0)
+    assert client.get(f"/listings/{marketplace['listing_id']}").json()["status"] == "published"
+    assert reconcile_user_stats(override_get_db) == []
+    assert reconcile_listing_aggregates(override_get_db) == []
+
+    # A later success counts the order once again, not twice
+    client.post("/marketplace/payments/webhook", json={"order_id": order_id, "payment_status": "succeeded"})
+    seller = client.get(f"/users/{marketplace['seller_id']}/stats").json()
+    buyer = client.get(f"/users/{marketplace['buyer_id']}/stats").json()
+    assert (seller["items_sold"], seller["revenue_sek"]) == (1, 1200)
+    assert (buyer["items_bought"], buyer["spent_sek"]) == (1, 1200)
+    assert reconcile_user_stats(override_get_db) == []
+
+def test_listing_status_updates_items_sold(client, override_get_db, marketplace):
+    payload = {"title": "Bike", "description": "Red bike", "price_sek": 1200, "condition": None, "category_id": None,
+               "city": None, "latitude": None, "longitude": None, "slug": None, "canonical_url": None}
+    client.put(f"/listings/{marketplace['listing_id']}", json={**payload, "status": "sold"})
+    assert client.get(f"/users/{marketplace['seller_id']}/stats").json()["items_sold"] == 1
+    client.put(f"/listings/{marketplace['listing_id']}", json={**payload, "status": "published"})
+    assert client.get(f"/users/{marketplace['seller_id']}/stats").json()["items_sold"] == 0
+    assert reconcile_user_stats(override_get_db) == []
+
+def test_reconcile_reports_and_fixes_drift(client, override_get_db, marketplace):
+    _pay(client, override_get_db, marketplace)
+    db = override_get_db
+    stats = db.get(UserStats, marketplace["seller_id"])
+    stats.revenue_sek = 5
+    db.commit()
+
+    drift = reconcile_user_stats(db)
+    assert [(d.user_id, d.field, d.stored, d.actual) for d in drift] == [(marketplace["seller_id"], "revenue_sek", 5, 1200)]
+    assert db.get(UserStats, marketplace["seller_id"]).revenue_sek == 5
+
+    reconcile_user_stats(db, fix=True)
+    assert reconcile_user_stats(db) == []
+    assert client.get(f"/users/{marketplace['seller_id']}/stats").json()["revenue_sek"] == 1200
@@ -0,0 +1,99 @@
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from backend.main import app
+from backend.models import Base, User, ListingChange
+from backend.database import get_db
+from backend import write_coalescer
+from backend.write_coalescer import WriteCoalescer
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_write_coalescer.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function")
+def override_get_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def client(override_get_db, monkeypatch):
+    monkeypatch.setattr(write_coalescer, "WRITE_COALESCER_ENABLED", True)
+    app.dependency_overrides[get_db] = lambda: override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides = {}
+
+def _insert_change(listing_id):
+    def unit(session):
+        change = ListingChange(listing_id=listing_id, op="create", status="published")
+        session.add(change)
+        session.flush()
+        return change.seq
+    return unit
+
+def test_concurrent_units_share_commits(override_get_db):
+    coalescer = WriteCoalescer(engine, max_batch=16, max_delay=0.01)
+    results = {}
+    start = threading.Barrier(40)
+
+    def worker(listing_id):
+        start.wait()
+        results[listing_id] = coalescer.run(_insert_change(listing_id))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coalescer.close()
+
+    assert sorted(results.values()) == list(range(1, 41))
+    assert override_get_db.query(ListingChange).count() == 40
+    assert coalescer.units == 40
+    assert coalescer.batches < 40
+
+def test_failing_unit_rolls_back_alone(override_get_db):
+    override_get_db.add(User(id=1, email="taken@example.com", password_hash="x"))
+    override_get_db.commit()
+    coalescer = WriteCoalescer(engine, max_delay=0.05)
+    ok_before = coalescer.submit(_insert_change(1))
+    duplicate = coalescer.submit(lambda session: session.add(User(email="taken@example.com", password_hash="x")) or session.flush())
+    ok_after = coalescer.submit(_insert_change(2))
+
+    assert (ok_before.result(), ok_after.result()) == (1, 2)
+    with pytest.raises(IntegrityError):
+        duplicate.result()
+    coalescer.close()
+    assert override_get_db.query(User).count() == 1
+    assert override_get_db.query(ListingChange).count() == 2
+
+def test_write_endpoints_through_coalescer(client, override_get_db):
+    assert client.post("/auth/register", json={"email": "a@example.com", "password": "password123",
+                                               "name": "A", "city": "Lund"}).status_code == 200
+    client.post("/auth/register", json={"email": "b@example.com", "password": "password123", "name": "B", "city": "Lund"})
+    payload = {"user_id": 1, "title": "Cykel", "description": "Röd", "price_sek": 500, "condition": "good",
+               "category_id": None, "city": "Lund", "latitude": None, "longitude": None, "status": "published",
+               "slug": None, "canonical_url": None}
+    created = client.post("/listings/", json=payload)
+    assert created.status_code == 201
+    listing_id = created.json()["id"]
+    assert client.put(f"/listings/{listing_id}", json={**payload, "price_sek": 450}).json()["price_sek"] == 450
+    assert client.put("/listings/999", json=payload).status_code == 404
+
+    order = client.post("/marketplace/checkout", json={"buyer_id": 2, "listing_id": listing_id, "delivery_type": "pickup"})
+    assert order.status_code == 201
+    paid = client.post("/marketplace/payments/webhook", json={"order_id": order.json()["order_id"], "payment_status": "succeeded"})
+    assert "paid" in paid.json()["message"]
+    assert client.get(f"/listings/{listing_id}").json()["status"] == "sold"
+    assert [change.op for change in override_get_db.query(ListingChange).order_by(ListingChange.seq)] == ["create", "update", "update"]
@@ -0,0 +1,144 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, List, Optional
+import argparse
+
+from backend.models import User, Listing, ArchivedListing, Order, UserStats
+from backend.database import get_db
+
+router = APIRouter(prefix="/users", tags=["users"])
+
+STAT_FIELDS = ("items_sold", "revenue_sek", "items_bought", "spent_sek")
+
+class UserStatsOut(BaseModel):
+    user_id: int
+    member_since: Optional[datetime] = None
+    items_sold: int = 0
+    revenue_sek: int = 0
+    items_bought: int = 0
+    spent_sek: int = 0
+
+    class Config:
+        from_attributes = True
+
+class StatsDrift(BaseModel):
+    user_id: int
+    field: str
+    stored: int
+    actual: int
+
+def _bump(db: Session, user_id: int, **deltas: int) -> None:
+    # Upsert so users created before user_stats existed get their row on first change
+    member_since = select(User.created_at).where(User.id == user_id).scalar_subquery()
+    insert_values = {field: max(deltas.get(field, 0), 0) for field in STAT_FIELDS}
+    db.execute(
+        sqlite_insert(UserStats)
+        .values(user_id=user_id, member_since=member_since, **insert_values)
+        .on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={field: getattr(UserStats, field) + delta for field, delta in deltas.items()},
+        )
+    )
+
+def init_user_stats(db: Session, user: User) -> None:
+    """Create the stats row alongside a new (flushed) user."""
+    db.add(UserStats(user_id=user.id, member_since=user.created_at or func.now()))
+
+def apply_order_paid(db: Session, order: Order) -> None:
+    """Call once, in the transaction that moves an order to 'paid'."""
+    amount = order.amount_sek or 0
+    _bump(db, order.seller_id, revenue_sek=amount)
+    _bump(db, order.buyer_id, items_bought=1, spent_sek=amount)
+
+def apply_order_unpaid(db: Session, order: Order) -> None:
+    """Undo apply_order_paid, in the transaction that moves a paid order out of 'paid'."""
+    amount = order.amount_sek or 0
+    _bump(db, order.seller_id, revenue_sek=-amount)
+    _bump(db, order.buyer_id, items_bought=-1, spent_sek=-amount)
+
+def apply_listing_status_change(db: Session, user_id: Optional[int], old_status: Optional[str],
+                                new_status: Optional[str]) -> None:
+    """Call in the transaction that changes (or deletes, new_status=None) a listing's status."""
+    if user_id is None or old_status == new_status:
+        return
+    if new_status == "sold":
+        _bump(db, user_id, items_sold=1)
+    elif old_status == "sold":
+        _bump(db, user_id, items_sold=-1)
+
+def compute_user_stats(db: Session) -> Dict[int, Dict[str, int]]:
+    """Recompute every user's stats from listings and orders."""
+    actual: Dict[int, Dict[str, int]] = {}
+
+    def row(user_id):
+        return actual.setdefault(user_id, dict.fromkeys(STAT_FIELDS, 0))
+
+    for model in (Listing, ArchivedListing):
+        sold = db.query(model.user_id, func.count()).filter(model.status == "sold").group_by(model.user_id)
+        for user_id, count in sold:
+            row(user_id)["items_sold"] += count
+    paid = Order.status == "paid"
+    for user_id, total in db.query(Order.seller_id, func.sum(Order.amount_sek)).filter(paid).group_by(Order.seller_id):
+        row(user_id)["revenue_sek"] = total or 0
+    bought = db.query(Order.buyer_id, func.count(), func.sum(Order.amount_sek)).filter(paid).group_by(Order.buyer_id)
+    for user_id, count, total in bought:
+        row(user_id)["items_bought"] = count
+        row(user_id)["spent_sek"] = total or 0
+    actual.pop(None, None)
+    return actual
+
+def reconcile_user_stats(db: Session, fix: bool = False) -> List[StatsDrift]:
+    """Compare stored stats with a full recomputation; optionally overwrite drifted rows."""
+    actual = compute_user_stats(db)
+    stored = {stats.user_id: stats for stats in db.query(UserStats).populate_existing()}
+    drift: List[StatsDrift] = []
+    for user_id, created_at in db.query(User.id, User.created_at):
+        expected = actual.get(user_id, dict.fromkeys(STAT_FIELDS, 0))
+        stats = stored.get(user_id)
+        for field in STAT_FIELDS:
+            current = getattr(stats, field) if stats is not None else 0
+            if current != expected[field]:
+                drift.append(StatsDrift(user_id=user_id, field=field, stored=current, actual=expected[field]))
+        if fix:
+            if stats is None:
+                stats = UserStats(user_id=user_id, member_since=created_at)
+                db.add(stats)
+            for field in STAT_FIELDS:
+                setattr(stats, field, expected[field])
+    if fix:
+        db.commit()
+    return drift
+
+@router.get("/{user_id}/stats", response_model=UserStatsOut)
+def read_user_stats(user_id: int, db: Session = Depends(get_db)):
+    stats = db.get(UserStats, user_id, populate_existing=True)
+    if stats is not None:
+        return stats
+    # No row yet means no sales or purchases have been recorded for this user
+    user = db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return UserStatsOut(user_id=user.id, member_since=user.created_at)
+
+def main():
+    from backend.database import open_session
+
+    parser = argparse.ArgumentParser(description="Recompute user stats and report drift.")
+    parser.add_argument("--fix", action="store_true", help="overwrite drifted rows with recomputed values")
+    args = parser.parse_args()
+
+    db = open_session()
+    try:
+        drift = reconcile_user_stats(db, fix=args.fix)
+    finally:
+        db.close()
+    for item in drift:
+        print(f"user {item.user_id}: {item.field} stored={item.stored} actual={item.actual}")
+    print(f"{len(drift)} drifted value(s){' fixed' if args.fix and drift else ''}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from backend import sharding
+
+# Off by default: request handlers then commit in their own session as before
+WRITE_COALESCER_ENABLED = False
+COALESCE_MAX_BATCH = 64
+# How long the writer waits for more units once a batch has started
+COALESCE_MAX_DELAY = 0.002
+
+def _writer_engine(bind):
+    """A private engine whose transactions begin explicitly, so each unit's SAVEPOINT nests inside the batch.
+
+    pysqlite defers BEGIN to the first DML statement; a SAVEPOINT issued before that opens and commits
+    a transaction of its own, which would cost one fsync per unit again.
+    """
+    engine = create_engine(bind.url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    return engine
+
+class WriteCoalescer:
+    """Group commit for SQLite: one writer thread applies queued write units in shared transactions.
+
+    A write unit is a callable taking a Session. Each runs inside its own SAVEPOINT, so a failing unit
+    rolls back alone and its caller gets the exception while the rest of the batch commits. Units
+    return plain values (ids, tuples), not ORM objects, since those belong to the writer's session.
+    """
+
+    def __init__(self, bind, max_batch: int = COALESCE_MAX_BATCH, max_delay: float = COALESCE_MAX_DELAY):
+        self.engine = _writer_engine(bind)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="write-coalescer", daemon=True)
+        self._thread.start()
+        self.batches = 0
+        self.units = 0
+
+    def submit(self, unit: Callable[[Session], object]) -> Future:
+        future = Future()
+        self._queue.put((unit, future))
+        return future
+
+    def run(self, unit: Callable[[Session], object]):
+        """Submit a unit and block until its batch has committed; re-raises the unit's own error."""
+        return self.submit(unit).result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        self.engine.dispose()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                # Whatever queued up during the last commit is taken without waiting
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        with Session(bind=self.engine, expire_on_commit=False) as db:
+            while True:
+                batch = self._collect()
+                if batch is None:
+                    return
+                self._apply(db, batch)
+
+    def _apply(self, db: Session, batch) -> None:
+        outcomes = []
+        for unit, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with db.begin_nested():
+                    result = unit(db)
+            except Exception as exc:
+                outcomes.append((future, None, exc))
+            else:
+                outcomes.append((future, result, None))
+        try:
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            for future, _, _ in outcomes:
+                future.set_exception(exc)
+            return
+        finally:
+            db.expunge_all()
+        self.batches += 1
+        self.units += len(outcomes)
+        for future, result, exc in outcomes:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+_coalescers = {}
+_coalescers_lock = threading.Lock()
+
+def get_coalescer(bind) -> WriteCoalescer:
+    with _coalescers_lock:
+        if bind not in _coalescers:
+            _coalescers[bind] = WriteCoalescer(bind)
+        return _coalescers[bind]
+
+def write_unit(db: Session, unit: Callable[[Session], object]):
+    """Apply unit and commit it: through the coalescer when enabled, otherwise in the caller's session."""
+    # The coalescer batches into a single database; a sharded session commits on each shard it wrote to
+    if not WRITE_COALESCER_ENABLED or sharding.router_for(db) is not None:
+        result = unit(db)
+        db.commit()
+        return result
+    return get_coalescer(db.get_bind()).run(unit)
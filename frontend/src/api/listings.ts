@@ -31,11 +31,67 @@ export async function getListings(): Promise<Listing[]> {
   return res.data;
 }
 
+// Grid cards: GET /listings/?view=card returns only what a card renders
+export interface ListingCard {
+  id: number;
+  title: string;
+  price_sek: number;
+  city?: string;
+  image: Omit<ListingImage, "url_full"> | null;
+}
+
+export async function getListingCards(skip = 0, limit = 20): Promise<ListingCard[]> {
+  const res = await axios.get<ListingCard[]>(API_URL, { params: { view: "card", skip, limit } });
+  return res.data;
+}
+
 export async function getListing(id: number): Promise<Listing> {
   const res = await axios.get<Listing>(`${API_URL}${id}`);
   return res.data;
 }
 
+export interface ListingBatchItem {
+  id: number;
+  found: boolean;
+  listing: Listing | null;
+}
+
+// One request for many ids, in the order given; unknown ids come back with found: false
+export async function getListingsBatch(ids: number[]): Promise<ListingBatchItem[]> {
+  if (ids.length === 0) {
+    return [];
+  }
+  if (ids.length > 100) {
+    const res = await axios.post<ListingBatchItem[]>(`${API_URL}batch`, { ids });
+    return res.data;
+  }
+  const res = await axios.get<ListingBatchItem[]>(`${API_URL}batch`, { params: { ids: ids.join(",") } });
+  return res.data;
+}
+
+export interface PriceBucket {
+  min_price: number;
+  max_price: number | null;
+  count: number;
+}
+
+export interface ListingStats {
+  dimension: "all" | "category" | "city" | "condition";
+  value: string | null;
+  count: number;
+  min_price: number | null;
+  max_price: number | null;
+  buckets: PriceBucket[];
+}
+
+// Price range and histogram of published listings for the filter UI; pass at most one filter
+export async function getListingStats(
+  filter: { category_id?: number; city?: string; condition?: string } = {}
+): Promise<ListingStats> {
+  const res = await axios.get<ListingStats>(`${API_URL}stats`, { params: filter });
+  return res.data;
+}
+
 export async function createListing(data: Omit<Listing, "id">): Promise<Listing> {
   const res = await axios.post<Listing>(API_URL, data);
   return res.data;